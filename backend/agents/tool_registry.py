@@ -3,9 +3,10 @@ Tool registry for agent runtime
 """
 
 import json
-from typing import Dict, Any, Callable, List
+from typing import Dict, Any, Callable, List, Optional
 from pydantic import BaseModel, Field
 import inspect
+from services.model_router import DEFAULT_TIER, model_router
 
 class ToolParameter(BaseModel):
     name: str
@@ -19,15 +20,26 @@ class ToolSchema(BaseModel):
     description: str
     parameters: List[ToolParameter]
     returns: str
+    tier: str = DEFAULT_TIER
 
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Callable] = {}
         self.schemas: Dict[str, ToolSchema] = {}
     
-    def register(self, func: Callable) -> None:
-        """Register a function as a tool"""
+    def register(
+        self, func: Optional[Callable] = None, *, tier: str = DEFAULT_TIER
+    ) -> Callable:
+        """Register a function as a tool
+
+        Use bare (``@tool_registry.register``) or with the model tier the
+        tool's LLM calls should run on (``@tool_registry.register(tier="fast")``).
+        """
+        if func is None:
+            return lambda f: self.register(f, tier=tier)
+
         tool_name = func.__name__
+        model_router.declare(tool_name, tier)
         self.tools[tool_name] = func
         
         # Generate schema from function signature
@@ -75,8 +87,10 @@ class ToolRegistry:
             name=tool_name,
             description=func.__doc__ or f"Tool {tool_name}",
             parameters=parameters,
-            returns=return_type
+            returns=return_type,
+            tier=tier,
         )
+        return func
     
     def get_tool(self, name: str) -> Callable:
         """Get a tool by name"""
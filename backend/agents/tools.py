@@ -7,12 +7,29 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from agents.tool_registry import tool_registry
 from services.llm_service import LLMService
+from services.llm_client import run_sync
+from services.prompt_budget import prompt_budget
 from config import settings
 
 # Initialize LLM service
 llm_service = LLMService()
 
-@tool_registry.register
+TOOL_SYSTEM_PROMPT = (
+    "You are an AI assistant for a B2B growth team. "
+    "Follow the requested output format exactly."
+)
+
+
+def _complete(prompt: str, temperature: float, template: str) -> str:
+    """Run a tool prompt from synchronous job code on the tool's model tier"""
+    return run_sync(
+        llm_service.generate_completion(
+            TOOL_SYSTEM_PROMPT, prompt, temperature=temperature, template=template
+        )
+    )
+
+
+@tool_registry.register(tier="fast")
 def classify_intent(email_text: str) -> Dict[str, Any]:
     """
     Classify the intent of an email to determine response type and urgency
@@ -45,7 +62,7 @@ def classify_intent(email_text: str) -> Dict[str, Any]:
         - key_topics: list of main topics mentioned
         """
         
-        response = llm_service.generate_completion(prompt, temperature=0.1)
+        response = _complete(prompt, temperature=0.1, template="classify_intent")
         
         # Try to parse JSON response
         try:
@@ -101,7 +118,7 @@ def draft_email(context: Dict[str, Any], style: str = "professional") -> Dict[st
         - call_to_action: The main CTA
         """
         
-        response = llm_service.generate_completion(prompt, temperature=0.7)
+        response = _complete(prompt, temperature=0.7, template="draft_email")
         
         try:
             return json.loads(response)
@@ -251,7 +268,8 @@ def enrich_person(name: str, company: str) -> Dict[str, Any]:
         "summary": f"Experienced professional at {company}"
     }
 
-@tool_registry.register
+
+@tool_registry.register(tier="balanced")
 def analyze_transcript(transcript_text: str) -> Dict[str, List[str]]:
     """
     Analyze call transcript for insights
@@ -285,6 +303,9 @@ def analyze_transcript(transcript_text: str) -> Dict[str, List[str]]:
         }
     
     try:
+        transcript_text = prompt_budget.compact_transcript(
+            transcript_text, prompt_budget.budget_for("analyze_transcript")
+        )
         prompt = f"""
         Analyze this call transcript and extract key insights:
         
@@ -297,7 +318,7 @@ def analyze_transcript(transcript_text: str) -> Dict[str, List[str]]:
         - coaching: List of coaching recommendations
         """
         
-        response = llm_service.generate_completion(prompt, temperature=0.3)
+        response = _complete(prompt, temperature=0.3, template="analyze_transcript")
         
         try:
             return json.loads(response)
@@ -373,7 +394,7 @@ This report analyzes the market opportunity for {', '.join(keywords)} in the {re
         Format as detailed markdown report.
         """
         
-        response = llm_service.generate_completion(prompt, temperature=0.5)
+        response = _complete(prompt, temperature=0.5, template="generate_niche_report")
         return response
     
     except Exception as e:
@@ -446,7 +467,7 @@ def generate_growth_plan(inputs_json: Dict[str, Any]) -> Dict[str, Any]:
         6. Success metrics and KPIs
         """
         
-        response = llm_service.generate_completion(prompt, temperature=0.6)
+        response = _complete(prompt, temperature=0.6, template="generate_growth_plan")
         
         try:
             return json.loads(response)
@@ -13,9 +13,231 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # Background jobs
+    job_enqueue_batch_size: int = int(os.getenv("JOB_ENQUEUE_BATCH_SIZE", "1000"))
+    job_dedupe_ttl_seconds: int = int(os.getenv("JOB_DEDUPE_TTL_SECONDS", "3600"))
+    job_state_ttl_seconds: int = int(os.getenv("JOB_STATE_TTL_SECONDS", "86400"))
+    job_state_flush_interval_seconds: float = float(
+        os.getenv("JOB_STATE_FLUSH_INTERVAL_SECONDS", "2")
+    )
+    job_state_flush_batch_size: int = int(
+        os.getenv("JOB_STATE_FLUSH_BATCH_SIZE", "500")
+    )
+    job_result_ttl_seconds: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", "604800"))
+    job_result_max_bytes: int = int(
+        os.getenv("JOB_RESULT_MAX_BYTES", "262144")
+    )  # compressed
+    job_stats_retention_minutes: int = int(
+        os.getenv("JOB_STATS_RETENTION_MINUTES", "1440")
+    )
+    job_stats_reconcile_interval_seconds: float = float(
+        os.getenv("JOB_STATS_RECONCILE_INTERVAL_SECONDS", "300")
+    )
+    job_retry_base_delay_seconds: float = float(
+        os.getenv("JOB_RETRY_BASE_DELAY_SECONDS", "5")
+    )
+    job_retry_max_delay_seconds: float = float(
+        os.getenv("JOB_RETRY_MAX_DELAY_SECONDS", "600")
+    )
+    job_retry_max_elapsed_seconds: float = float(
+        os.getenv("JOB_RETRY_MAX_ELAPSED_SECONDS", "3600")
+    )
+    job_retry_policies: str = os.getenv(
+        "JOB_RETRY_POLICIES", ""
+    )  # JSON: {"job_type": {"max_retries": 5, ...}}
+    job_retry_pump_interval_seconds: float = float(
+        os.getenv("JOB_RETRY_PUMP_INTERVAL_SECONDS", "1")
+    )
+    job_wheel_resolution_seconds: float = float(
+        os.getenv("JOB_WHEEL_RESOLUTION_SECONDS", "5")
+    )
+    job_wheel_fire_batch_size: int = int(os.getenv("JOB_WHEEL_FIRE_BATCH_SIZE", "500"))
+    job_wheel_pump_interval_seconds: float = float(
+        os.getenv("JOB_WHEEL_PUMP_INTERVAL_SECONDS", "1")
+    )
+    job_wheel_claim_timeout_seconds: float = float(
+        os.getenv("JOB_WHEEL_CLAIM_TIMEOUT_SECONDS", "300")
+    )
+    job_wheel_retry_delay_seconds: float = float(
+        os.getenv("JOB_WHEEL_RETRY_DELAY_SECONDS", "30")
+    )
+    job_pipeline_ttl_seconds: int = int(os.getenv("JOB_PIPELINE_TTL_SECONDS", "604800"))
+    job_fair_scheduling_enabled: bool = (
+        os.getenv("JOB_FAIR_SCHEDULING_ENABLED", "true").lower() == "true"
+    )
+    job_fair_max_in_flight: int = int(
+        os.getenv("JOB_FAIR_MAX_IN_FLIGHT", "8")
+    )  # per workspace, 0 for no cap
+    job_fair_workspace_weights: str = os.getenv(
+        "JOB_FAIR_WORKSPACE_WEIGHTS", ""
+    )  # JSON: {"workspace_id": weight}
+    job_fair_reconcile_interval_seconds: float = float(
+        os.getenv("JOB_FAIR_RECONCILE_INTERVAL_SECONDS", "15")
+    )
+    worker_mode: str = os.getenv("WORKER_MODE", "fork")  # fork, async or pool
+    worker_pool_size: int = int(os.getenv("WORKER_POOL_SIZE", "4"))
+    worker_max_jobs: int = int(
+        os.getenv("WORKER_MAX_JOBS", "1000")
+    )  # per pool process, 0 for no limit
+    worker_max_memory_mb: float = float(
+        os.getenv("WORKER_MAX_MEMORY_MB", "512")
+    )  # per pool process, 0 for no limit
+    async_worker_concurrency: str = os.getenv(
+        "ASYNC_WORKER_CONCURRENCY", '{"high": 8, "default": 16, "low": 16}'
+    )
+    async_worker_default_concurrency: int = int(
+        os.getenv("ASYNC_WORKER_DEFAULT_CONCURRENCY", "8")
+    )
+
     # OpenAI
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
-    
+
+    # LLM transport (shared async client and connection pool)
+    llm_request_timeout_seconds: float = float(
+        os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60")
+    )
+    llm_connect_timeout_seconds: float = float(
+        os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5")
+    )
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    llm_max_keepalive_connections: int = int(
+        os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    llm_keepalive_expiry_seconds: float = float(
+        os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30")
+    )
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+    # LLM transport mode: live, record, replay or stub
+    llm_transport_mode: str = os.getenv("LLM_TRANSPORT_MODE", "live")
+    llm_fixture_dir: str = os.getenv("LLM_FIXTURE_DIR", "fixtures/llm")
+    llm_simulated_latency: str = os.getenv(
+        "LLM_SIMULATED_LATENCY", "synthetic"
+    )  # synthetic, recorded or none
+    llm_synthetic_ttft_median_ms: float = float(
+        os.getenv("LLM_SYNTHETIC_TTFT_MEDIAN_MS", "800")
+    )
+    llm_synthetic_ttft_sigma: float = float(
+        os.getenv("LLM_SYNTHETIC_TTFT_SIGMA", "0.5")
+    )
+    llm_synthetic_tps_mean: float = float(
+        os.getenv("LLM_SYNTHETIC_TOKENS_PER_SECOND_MEAN", "40")
+    )
+    llm_synthetic_tps_stddev: float = float(
+        os.getenv("LLM_SYNTHETIC_TOKENS_PER_SECOND_STDDEV", "10")
+    )
+    llm_synthetic_seed: int = int(os.getenv("LLM_SYNTHETIC_SEED", "0"))
+
+    # LLM circuit breaker, hedging and stale-serve
+    llm_breaker_enabled: bool = (
+        os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+    )
+    llm_breaker_window_seconds: float = float(
+        os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60")
+    )
+    llm_breaker_min_calls: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+    llm_breaker_error_rate: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    llm_breaker_p95_slo_seconds: float = float(
+        os.getenv("LLM_BREAKER_P95_SLO_SECONDS", "30")
+    )
+    llm_breaker_cooldown_seconds: float = float(
+        os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")
+    )
+    llm_hedge_delay_seconds: float = float(
+        os.getenv("LLM_HEDGE_DELAY_SECONDS", "8")
+    )  # 0 = no hedging
+    llm_hedge_max_temperature: float = float(
+        os.getenv("LLM_HEDGE_MAX_TEMPERATURE", "0.3")
+    )
+    llm_stale_ttl_seconds: int = int(
+        os.getenv("LLM_STALE_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+    ai_service_timeout_seconds: float = float(
+        os.getenv("AI_SERVICE_TIMEOUT_SECONDS", "10")
+    )
+
+    # LLM response cache
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+    llm_cache_default_ttl_seconds: int = int(
+        os.getenv("LLM_CACHE_DEFAULT_TTL_SECONDS", "3600")
+    )
+    llm_cache_max_temperature: float = float(
+        os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3")
+    )
+
+    # LLM single-flight coalescing
+    llm_single_flight_distributed: bool = (
+        os.getenv("LLM_SINGLE_FLIGHT_DISTRIBUTED", "true").lower() == "true"
+    )
+    llm_single_flight_lock_ttl_seconds: int = int(
+        os.getenv("LLM_SINGLE_FLIGHT_LOCK_TTL_SECONDS", "180")
+    )
+    llm_single_flight_result_ttl_seconds: int = int(
+        os.getenv("LLM_SINGLE_FLIGHT_RESULT_TTL_SECONDS", "30")
+    )
+
+    # Model tiers and routing
+    # (table is JSON: {"template": "fast" | "balanced" | "quality" | "<model>"})
+    llm_model_fast: str = os.getenv("LLM_MODEL_FAST", "gpt-3.5-turbo")
+    llm_model_balanced: str = os.getenv("LLM_MODEL_BALANCED", "gpt-4-1106-preview")
+    llm_model_quality: str = os.getenv("LLM_MODEL_QUALITY", "gpt-4")
+    llm_routing_table: str = os.getenv("LLM_ROUTING_TABLE", "")
+
+    # Default input token budget for templates without their own
+    llm_prompt_token_budget: int = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "6000"))
+
+    # Cluster-wide LLM governor (shared by API processes and RQ workers through Redis)
+    llm_governor_enabled: bool = (
+        os.getenv("LLM_GOVERNOR_ENABLED", "true").lower() == "true"
+    )
+    llm_governor_max_in_flight: int = int(os.getenv("LLM_GOVERNOR_MAX_IN_FLIGHT", "32"))
+    llm_governor_tokens_per_minute: int = int(
+        os.getenv("LLM_GOVERNOR_TOKENS_PER_MINUTE", "150000")
+    )  # 0 = unlimited
+    llm_governor_batch_share: float = float(
+        os.getenv("LLM_GOVERNOR_BATCH_SHARE", "0.5")
+    )
+    llm_governor_lease_ttl_seconds: int = int(
+        os.getenv("LLM_GOVERNOR_LEASE_TTL_SECONDS", "180")
+    )
+    llm_governor_wait_timeout_seconds: float = float(
+        os.getenv("LLM_GOVERNOR_WAIT_TIMEOUT_SECONDS", "120")
+    )
+    llm_governor_workspace_weights: str = os.getenv(
+        "LLM_GOVERNOR_WORKSPACE_WEIGHTS", ""
+    )  # JSON: {"workspace_id": weight}
+    llm_governor_default_priority: str = os.getenv(
+        "LLM_GOVERNOR_DEFAULT_PRIORITY", "interactive"
+    )
+    llm_governor_completion_tokens_estimate: int = int(
+        os.getenv("LLM_GOVERNOR_COMPLETION_TOKENS_ESTIMATE", "500")
+    )
+
+    # LLM call telemetry
+    llm_telemetry_enabled: bool = (
+        os.getenv("LLM_TELEMETRY_ENABLED", "true").lower() == "true"
+    )
+    llm_telemetry_flush_interval_seconds: float = float(
+        os.getenv("LLM_TELEMETRY_FLUSH_INTERVAL_SECONDS", "60")
+    )
+    llm_telemetry_flush_batch_size: int = int(
+        os.getenv("LLM_TELEMETRY_FLUSH_BATCH_SIZE", "500")
+    )
+
+    # LLM parallel fan-out
+    llm_fanout_max_concurrency: int = int(os.getenv("LLM_FANOUT_MAX_CONCURRENCY", "16"))
+    llm_fanout_workspace_concurrency: int = int(
+        os.getenv("LLM_FANOUT_WORKSPACE_CONCURRENCY", "4")
+    )
+
+    # Request input cleaning
+    input_llm_escalation_enabled: bool = (
+        os.getenv("INPUT_LLM_ESCALATION_ENABLED", "true").lower() == "true"
+    )
+    input_cache_ttl_seconds: int = int(os.getenv("INPUT_CACHE_TTL_SECONDS", "86400"))
+    input_cache_max_entries: int = int(os.getenv("INPUT_CACHE_MAX_ENTRIES", "1000"))
+
     # JWT
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")
     jwt_algorithm: str = "HS256"
@@ -33,6 +255,13 @@ class Settings(BaseSettings):
     
     # Vector embeddings
     embedding_dimension: int = 1536  # OpenAI ada-002 dimension
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    embedding_concurrency: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    # 0 = no expiry
+    embedding_cache_ttl_seconds: int = int(
+        os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "0")
+    )
     
     # CORS
     cors_origins: list = ["http://localhost:3000", "http://localhost:8000"]
@@ -2,7 +2,22 @@
 Database models and configuration for Inno Supps
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Enum as SQLEnum
+from sqlalchemy import (
+    create_engine,
+    Column,
+    Integer,
+    String,
+    Text,
+    DateTime,
+    Boolean,
+    JSON,
+    Float,
+    LargeBinary,
+    ForeignKey,
+    Index,
+    text,
+    Enum as SQLEnum,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -331,15 +346,63 @@ class Job(Base):
     workspace_id = uuid_foreign_key("workspaces")
     type = Column(String(100), nullable=False)
     payload_json = Column(JSON)
+    dedupe_key = Column(String(64))
     status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED)
     attempts = Column(Integer, default=0)
     last_error = Column(Text)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    result = Column(LargeBinary)  # zlib-compressed JSON return value
+    result_size = Column(Integer)  # uncompressed bytes
+    result_expires_at = Column(DateTime)
+    profile = Column(JSON)  # execution profile of the last attempt
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     workspace = relationship("Workspace", back_populates="jobs")
 
+    # At most one queued or running job per workspace and dedupe key; SQLEnum
+    # stores enum names ("QUEUED"), not values ("queued")
+    __table_args__ = (
+        Index(
+            "uq_jobs_active_dedupe_key",
+            "workspace_id",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text(
+                f"status IN ('{JobStatus.QUEUED.name}', '{JobStatus.RUNNING.name}')"
+            ),
+            sqlite_where=text(
+                f"status IN ('{JobStatus.QUEUED.name}', '{JobStatus.RUNNING.name}')"
+            ),
+        ),
+        # Newest-first workspace listing
+        Index("ix_jobs_workspace_created", "workspace_id", "created_at"),
+    )
+
+
+class DeadLetterJob(Base):
+    __tablename__ = "dead_letter_jobs"
+
+    id = uuid_column()
+    job_id = uuid_foreign_key("jobs")
+    workspace_id = uuid_foreign_key("workspaces")
+    type = Column(String(100), nullable=False)
+    func_path = Column(String(255), nullable=False)
+    queue_name = Column(String(100), nullable=False)
+    payload_json = Column(JSON)  # args and kwargs to replay with
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    reason = Column(String(50), nullable=False)  # exhausted, not_retryable, expired
+    replay_job_id = Column(String(36))
+    replayed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_dead_letter_jobs_workspace_created", "workspace_id", "created_at"),
+    )
+
 class AuditEvent(Base):
     __tablename__ = "audit_events"
     
@@ -383,6 +446,17 @@ class MetricDaily(Base):
     # Relationships
     workspace = relationship("Workspace", back_populates="metric_dailies")
 
+    # One row per workspace, metric and day; writers add onto it
+    __table_args__ = (
+        Index(
+            "uq_metric_dailies_workspace_metric_day",
+            "workspace_id",
+            "metric_name",
+            "recorded_on",
+            unique=True,
+        ),
+    )
+
 # Database functions
 def get_db():
     db = SessionLocal()
@@ -2,10 +2,12 @@
 Email-related background jobs
 """
 
-from typing import Dict, Any
-from services.job_service import job
+from datetime import timedelta
+from typing import Dict, Any, List
+from services.job_service import job, job_service
+from services.job_pipeline import JobPipeline
 from agents.tools import classify_intent, draft_email
-from database import Thread, Message, MessageDirection, get_db
+from database import Campaign, SequenceStep, Thread, Message, MessageDirection, get_db
 from services.rate_limiter import email_rate_limiter
 from services.llm_service import LLMService
 from sqlalchemy.orm import Session
@@ -64,10 +66,12 @@ def ingest_email(workspace_id: str, email_data: Dict[str, Any]) -> Dict[str, Any
             db.add(message)
             db.commit()
             
-            # If positive intent, trigger SDR reply job
-            if intent_result.get("reply_type") == "positive":
-                sdr_reply.delay(workspace_id, str(thread.id), intent_result)
-            
+            # A reply ends the prospect's sequence: drop their pending follow-ups
+            if from_email:
+                job_service.cancel_delayed(
+                    workspace_id, from_email, reason="Prospect replied"
+                )
+
             return {
                 "status": "success",
                 "thread_id": str(thread.id),
@@ -123,10 +127,6 @@ def sdr_reply(workspace_id: str, thread_id: str, intent_data: Dict[str, Any]) ->
             # Draft reply email
             reply_data = draft_email(context, "professional")
             
-            # If they want to book a meeting, schedule auto-booking
-            if intent_data.get("book_meeting", False):
-                auto_book_meeting.delay(workspace_id, latest_message.from_email)
-            
             return {
                 "status": "success",
                 "suggested_reply": reply_data,
@@ -177,3 +177,81 @@ def send_email(workspace_id: str, prospect_email: str, email_data: Dict[str, Any
             "status": "error",
             "error": str(e)
         }
+
+
+def inbound_reply_pipeline(
+    workspace_id: str, email_data: Dict[str, Any]
+) -> JobPipeline:
+    """Ingest an inbound email, reply if positive and book if they asked to meet"""
+    from jobs.calendar_jobs import auto_book_meeting
+
+    pipeline = job_service.pipeline("inbound_reply", workspace_id)
+    pipeline.stage("ingest", ingest_email, workspace_id, email_data)
+    pipeline.stage(
+        "reply",
+        sdr_reply,
+        workspace_id,
+        pipeline.ref("ingest", "thread_id"),
+        pipeline.ref("ingest", "intent"),
+        after=["ingest"],
+        when={"ingest.status": "success", "ingest.intent.reply_type": "positive"},
+    )
+    pipeline.stage(
+        "book",
+        auto_book_meeting,
+        workspace_id,
+        email_data.get("from_email", ""),
+        after=["ingest", "reply"],
+        when={"reply.status": "success", "ingest.intent.book_meeting": True},
+    )
+    return pipeline
+
+
+def enroll_in_sequence(
+    workspace_id: str, campaign_id: str, prospect_emails: List[str]
+) -> Dict[int, List[str]]:
+    """
+    Schedule a campaign's email steps for prospects, each wait_hours after the last
+
+    Pending steps are cancelled when the prospect replies. Returns the job ids
+    per step order.
+    """
+    db = next(get_db())
+    try:
+        campaign = (
+            db.query(Campaign)
+            .filter(Campaign.workspace_id == workspace_id, Campaign.id == campaign_id)
+            .first()
+        )
+        if not campaign:
+            raise ValueError("Campaign not found")
+        steps = (
+            db.query(SequenceStep)
+            .filter(SequenceStep.campaign_id == campaign_id)
+            .order_by(SequenceStep.order)
+            .all()
+        )
+    finally:
+        db.close()
+
+    scheduled = {}
+    wait_hours = 0
+    for step in steps:
+        wait_hours += step.wait_hours or 0
+        if step.channel != "email":
+            continue
+        email_data = {
+            "campaign_id": campaign_id,
+            "step": step.order,
+            "template_ref": step.template_ref,
+        }
+        scheduled[step.order] = send_email.enqueue_many(
+            [
+                ((workspace_id, prospect_email, email_data), {})
+                for prospect_email in prospect_emails
+            ],
+            workspace_id=workspace_id,
+            delay=timedelta(hours=wait_hours),
+            cancel_keys=prospect_emails,
+        )
+    return scheduled
@@ -2,12 +2,17 @@
 Research-related background jobs
 """
 
+import json
 from typing import Dict, Any
 from services.job_service import job
 from agents.tools import generate_niche_report, generate_growth_plan
-from database import ResearchBrief, GrowthPlan, get_db
+from database import ResearchBrief, GrowthPlan, Prospect, get_db
+from services.llm_client import run_sync
+from services.llm_service import LLMService
 from sqlalchemy.orm import Session
 
+llm_service = LLMService()
+
 @job(queue_name="low", timeout=1800)  # 30 minutes for research
 def run_niche_research(workspace_id: str, research_inputs: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -156,3 +161,66 @@ def enrich_prospect_data(workspace_id: str, prospect_id: str) -> Dict[str, Any]:
             "status": "error",
             "error": str(e)
         }
+
+
+def prospect_summary_text(prospect: Prospect) -> str:
+    """Text embedded into Prospect.summary_embedding"""
+    name = " ".join(filter(None, [prospect.first_name, prospect.last_name]))
+    parts = [name, prospect.title, prospect.company]
+    enrichment = prospect.enrichment_json or {}
+    parts.extend(
+        str(enrichment[key])
+        for key in ("industry", "company_size", "summary")
+        if enrichment.get(key)
+    )
+    return " | ".join(part for part in parts if part) or prospect.email
+
+
+@job(queue_name="low", timeout=3600)
+def backfill_prospect_embeddings(
+    workspace_id: str, page_size: int = 1000
+) -> Dict[str, Any]:
+    """
+    Backfill missing prospect summary embeddings in batches
+
+    Args:
+        workspace_id: Workspace ID
+        page_size: Prospects embedded and committed per page
+    """
+    try:
+        embedded = 0
+        last_id = ""
+        db = next(get_db())
+        try:
+            while True:
+                # Keyset pagination so each page is an index range scan
+                prospects = (
+                    db.query(Prospect)
+                    .filter(
+                        Prospect.workspace_id == workspace_id,
+                        Prospect.summary_embedding.is_(None),
+                        Prospect.id > last_id,
+                    )
+                    .order_by(Prospect.id)
+                    .limit(page_size)
+                    .all()
+                )
+
+                if not prospects:
+                    break
+
+                texts = [prospect_summary_text(prospect) for prospect in prospects]
+                vectors = run_sync(llm_service.embed_many(texts))
+                for prospect, vector in zip(prospects, vectors):
+                    prospect.summary_embedding = json.dumps(vector)
+                db.commit()
+
+                embedded += len(prospects)
+                last_id = prospects[-1].id
+
+            return {"status": "success", "embedded": embedded}
+        finally:
+            db.close()
+
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
@@ -8,7 +8,9 @@ from contextlib import asynccontextmanager
 from database import get_db, init_db
 from routes import auth, generations, templates, workflows, compliance, slack, ai_agents, jobs, integrations
 from services.llm_service import LLMService
-from services.redis_service import RedisService
+from services.llm_client import close_async_client
+from services.redis_service import RedisService, close_async_redis
+from services.llm_telemetry import llm_telemetry
 from config import settings
 from services.redis_cache import cache
 
@@ -25,9 +27,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️  Database initialization failed: {e}")
         print("🔄 Running in mock mode - database features disabled")
+    llm_telemetry.start_flusher()
     yield
     # Shutdown
-    pass
+    llm_telemetry.flush()
+    await close_async_client()
+    await close_async_redis()
 
 app = FastAPI(
     title="Inno Supps PromptOps API",
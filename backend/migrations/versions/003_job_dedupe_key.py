@@ -0,0 +1,63 @@
+"""Add indexed dedupe key to jobs
+
+Revision ID: 003
+Revises: 328b74ab430a
+Create Date: 2025-09-20 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "003"
+down_revision = "328b74ab430a"
+branch_labels = None
+depends_on = None
+
+# SQLEnum(JobStatus) stores enum names, so these are JobStatus.QUEUED.name and
+# JobStatus.RUNNING.name, not their lowercase values; spelled out so the
+# migration does not change if the model does
+ACTIVE_JOBS = "status IN ('QUEUED', 'RUNNING')"
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("dedupe_key", sa.String(length=64), nullable=True))
+
+    # Backfill from the payload; system jobs were never deduped
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "UPDATE jobs SET dedupe_key = payload_json->>'dedupe_key' "
+            "WHERE workspace_id <> 'system'"
+        )
+    else:
+        op.execute(
+            "UPDATE jobs SET dedupe_key = json_extract(payload_json, '$.dedupe_key') "
+            "WHERE workspace_id <> 'system'"
+        )
+
+    # Keep the newest active job when older duplicates slipped through
+    op.execute(f"""
+        UPDATE jobs SET dedupe_key = NULL
+        WHERE {ACTIVE_JOBS} AND dedupe_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM jobs newer
+            WHERE newer.workspace_id = jobs.workspace_id
+              AND newer.dedupe_key = jobs.dedupe_key
+              AND newer.{ACTIVE_JOBS}
+              AND newer.created_at > jobs.created_at
+        )
+    """)
+
+    op.create_index(
+        "uq_jobs_active_dedupe_key",
+        "jobs",
+        ["workspace_id", "dedupe_key"],
+        unique=True,
+        postgresql_where=sa.text(ACTIVE_JOBS),
+        sqlite_where=sa.text(ACTIVE_JOBS),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_jobs_active_dedupe_key", table_name="jobs")
+    op.drop_column("jobs", "dedupe_key")
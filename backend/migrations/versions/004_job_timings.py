@@ -0,0 +1,26 @@
+"""Add job start and finish times
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-09-21 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("started_at", sa.DateTime(), nullable=True))
+    op.add_column("jobs", sa.Column("finished_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("jobs", "finished_at")
+    op.drop_column("jobs", "started_at")
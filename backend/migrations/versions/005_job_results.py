@@ -0,0 +1,30 @@
+"""Store job results and index workspace job listings
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-09-22 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("result", sa.LargeBinary(), nullable=True))
+    op.add_column("jobs", sa.Column("result_size", sa.Integer(), nullable=True))
+    op.add_column("jobs", sa.Column("result_expires_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_jobs_workspace_created", "jobs", ["workspace_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_jobs_workspace_created", table_name="jobs")
+    op.drop_column("jobs", "result_expires_at")
+    op.drop_column("jobs", "result_size")
+    op.drop_column("jobs", "result")
@@ -0,0 +1,56 @@
+"""Add dead-lettered jobs
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-09-23 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "dead_letter_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("job_id", sa.String(length=36), nullable=False),
+        sa.Column("workspace_id", sa.String(length=36), nullable=False),
+        sa.Column("type", sa.String(length=100), nullable=False),
+        sa.Column("func_path", sa.String(length=255), nullable=False),
+        sa.Column("queue_name", sa.String(length=100), nullable=False),
+        sa.Column("payload_json", sa.JSON(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("reason", sa.String(length=50), nullable=False),
+        sa.Column("replay_job_id", sa.String(length=36), nullable=True),
+        sa.Column("replayed_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["job_id"],
+            ["jobs.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["workspace_id"],
+            ["workspaces.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_dead_letter_jobs_workspace_created",
+        "dead_letter_jobs",
+        ["workspace_id", "created_at"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_dead_letter_jobs_workspace_created", table_name="dead_letter_jobs"
+    )
+    op.drop_table("dead_letter_jobs")
@@ -0,0 +1,24 @@
+"""Add job execution profiles
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-09-24 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("profile", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("jobs", "profile")
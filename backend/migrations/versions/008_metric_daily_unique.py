@@ -0,0 +1,50 @@
+"""Make daily metrics unique per workspace, metric and day
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-09-25 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+SAME_DAY = """
+    other.workspace_id = metric_dailies.workspace_id
+    AND other.metric_name = metric_dailies.metric_name
+    AND other.recorded_on = metric_dailies.recorded_on
+"""
+
+
+def upgrade():
+    # Fold duplicate rows written by concurrent flushes into one of them
+    op.execute(f"""
+        UPDATE metric_dailies SET value = (
+            SELECT SUM(other.value) FROM metric_dailies other WHERE {SAME_DAY}
+        )
+        WHERE id = (
+            SELECT MIN(other.id) FROM metric_dailies other WHERE {SAME_DAY}
+        )
+    """)
+    op.execute(f"""
+        DELETE FROM metric_dailies
+        WHERE id <> (
+            SELECT MIN(other.id) FROM metric_dailies other WHERE {SAME_DAY}
+        )
+    """)
+
+    op.create_index(
+        "uq_metric_dailies_workspace_metric_day",
+        "metric_dailies",
+        ["workspace_id", "metric_name", "recorded_on"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_metric_dailies_workspace_metric_day", table_name="metric_dailies")
@@ -2,17 +2,29 @@
 AI Agents routes for Inno Supps
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
+import asyncio
+import time
 import requests
-import openai
-import os
+from config import settings
+from services.circuit_breaker import CircuitBreaker
+from services.llm_service import LLMService
+from services.ai_agents import AIAgentsService
+from services.input_normalizer import input_normalizer
+from services.llm_streaming import SSE_HEADERS, sse_json_stream
+from routes.auth import get_optional_workspace
 
 router = APIRouter(prefix="/api/agents", tags=["ai-agents"])
+llm_service = LLMService()
+ai_agents_service = AIAgentsService()
 
-# Initialize OpenAI client
-openai.api_key = os.getenv("OPENAI_API_KEY", "")
+AI_SERVICE_URL = "http://localhost:8001"
+ai_service_breaker = CircuitBreaker(
+    "ai_service", p95_slo_seconds=settings.ai_service_timeout_seconds, min_calls=3
+)
 
 # Request/Response models
 class ColdEmailRequest(BaseModel):
@@ -45,6 +57,7 @@ class EmailSequenceRequest(BaseModel):
     value_proposition: str
     sequence_length: Optional[int] = 5
     industry: Optional[str] = None
+    orchestration: Optional[str] = "single"  # single, parallel
 
 class EmailSequenceResponse(BaseModel):
     sequence: List[Dict[str, Any]]
@@ -98,169 +111,182 @@ class NicheResearchResponse(BaseModel):
     implementation_strategy: List[str]
     risk_assessment: Dict[str, Any]
 
-async def clean_and_improve_input(request: ColdEmailRequest) -> Dict[str, Any]:
-    """Clean and improve user input using GPT before generating email"""
-    try:
-        # Create a prompt to clean and improve the input
-        prompt = f"""
-        Please clean and improve the following prospect information for a professional cold email:
-        
-        Original Input:
-        - Name: {request.prospect_name}
-        - Company: {request.company}
-        - Role: {request.role}
-        - Pain Points: {', '.join(request.pain_points)}
-        - Value Proposition: {request.value_proposition}
-        
-        Please provide cleaned and improved versions that:
-        1. Fix any spelling, grammar, or formatting errors
-        2. Make the language more professional and clear
-        3. Ensure proper capitalization and punctuation
-        4. Improve the value proposition to be more compelling
-        5. Make pain points more specific and actionable
-        6. Ensure the role is properly formatted (e.g., "VP of Marketing" not "vp marketing")
-        
-        Return the response in this exact JSON format:
-        {{
-            "prospect_name": "cleaned name",
-            "company": "cleaned company name",
-            "role": "cleaned role title",
-            "pain_points": ["cleaned pain point 1", "cleaned pain point 2"],
-            "value_proposition": "improved value proposition"
-        }}
-        """
-        
-        client = openai.OpenAI(api_key=openai.api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a professional business communication expert. Clean and improve user input for cold email generation."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3
-        )
-        
-        # Parse the cleaned response
-        cleaned_text = response.choices[0].message.content.strip()
-        
-        # Extract JSON from the response
-        import json
-        import re
-        
-        # Find JSON in the response
-        json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-        if json_match:
-            cleaned_data = json.loads(json_match.group())
-            return cleaned_data
-        else:
-            # Fallback if JSON parsing fails
-            return {
-                "prospect_name": request.prospect_name.title(),
-                "company": request.company.title(),
-                "role": request.role.title(),
-                "pain_points": [point.strip().title() for point in request.pain_points],
-                "value_proposition": request.value_proposition
-            }
-            
-    except Exception as e:
-        print(f"Error cleaning input: {e}")
-        # Fallback to basic cleaning
-        return {
-            "prospect_name": request.prospect_name.title(),
-            "company": request.company.title(),
-            "role": request.role.title(),
-            "pain_points": [point.strip().title() for point in request.pain_points],
-            "value_proposition": request.value_proposition
-        }
 
-async def clean_and_improve_niche_input(request: NicheResearchRequest) -> Dict[str, Any]:
-    """Clean and improve niche research input using GPT"""
+async def call_ai_service(path: str, payload: Dict[str, Any]) -> requests.Response:
+    """POST to the AI service off the event loop, failing fast while it is down
+
+    Raises a RequestException when the circuit is open so callers drop
+    straight into their mock fallback instead of waiting for a timeout.
+    """
+    if not ai_service_breaker.allow():
+        raise requests.exceptions.ConnectionError("AI service circuit open")
+    started = time.monotonic()
     try:
-        # Create a prompt to clean and improve the niche research input
-        prompt = f"""
-        Please clean and improve the following niche research information:
-        
-        Original Input:
-        - Skills: {', '.join(request.skills)}
-        - Interests: {', '.join(request.interests)}
-        - Experience Level: {request.experience_level}
-        
-        Please provide cleaned and improved versions that:
-        1. Fix any spelling, grammar, or formatting errors
-        2. Make the language more professional and clear
-        3. Ensure proper capitalization and punctuation
-        4. Make skills more specific and actionable
-        5. Make interests more focused and business-relevant
-        6. Standardize experience level (e.g., "Beginner", "Intermediate", "Advanced")
-        
-        Return the response in this exact JSON format:
-        {{
-            "skills": ["cleaned skill 1", "cleaned skill 2"],
-            "interests": ["cleaned interest 1", "cleaned interest 2"],
-            "experience_level": "cleaned experience level"
-        }}
-        """
-        
-        client = openai.OpenAI(api_key=openai.api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a professional business consultant. Clean and improve user input for niche research analysis."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0.3
+        response = await asyncio.to_thread(
+            requests.post,
+            f"{AI_SERVICE_URL}{path}",
+            json=payload,
+            timeout=settings.ai_service_timeout_seconds,
         )
-        
-        # Parse the cleaned response
-        cleaned_text = response.choices[0].message.content.strip()
-        
-        # Extract JSON from the response
-        import json
-        import re
-        
-        # Find JSON in the response
-        json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-        if json_match:
-            cleaned_data = json.loads(json_match.group())
-            return cleaned_data
-        else:
-            # Fallback if JSON parsing fails
-            return {
-                "skills": [skill.strip().title() for skill in request.skills],
-                "interests": [interest.strip().title() for interest in request.interests],
-                "experience_level": request.experience_level.title()
+    except requests.exceptions.RequestException:
+        ai_service_breaker.record(time.monotonic() - started, ok=False)
+        raise
+    ai_service_breaker.record(time.monotonic() - started, ok=response.status_code < 500)
+    return response
+
+
+async def clean_and_improve_input(
+    request: ColdEmailRequest, workspace_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Clean and improve user input before generating email
+
+    Cleaning is local; the LLM is only consulted when the input looks rough.
+    """
+    return await input_normalizer.clean_prospect(
+        request.dict(
+            include={
+                "prospect_name",
+                "company",
+                "role",
+                "pain_points",
+                "value_proposition",
             }
-            
-    except Exception as e:
-        print(f"Error cleaning niche input: {e}")
-        # Fallback to basic cleaning
-        return {
-            "skills": [skill.strip().title() for skill in request.skills],
-            "interests": [interest.strip().title() for interest in request.interests],
-            "experience_level": request.experience_level.title()
-        }
+        ),
+        workspace_id=workspace_id,
+    )
+
+
+async def clean_and_improve_niche_input(
+    request: NicheResearchRequest, workspace_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Clean and improve niche research input"""
+    return await input_normalizer.clean_niche(
+        request.dict(include={"skills", "interests", "experience_level"}),
+        workspace_id=workspace_id,
+    )
+
+
+def build_cold_email_messages(
+    cleaned_input: Dict[str, Any], email_type: str
+) -> List[Dict[str, str]]:
+    """Prompt for a single cold email, shaped like ColdEmailResponse"""
+    prompt = f"""
+    Write a {email_type} cold email for:
+    - Prospect: {cleaned_input['prospect_name']}
+    - Company: {cleaned_input['company']}
+    - Role: {cleaned_input['role']}
+    - Pain Points: {', '.join(cleaned_input['pain_points'])}
+    - Value Proposition: {cleaned_input['value_proposition']}
+    
+    Return only a JSON object with these fields, in this order:
+    - subject: Subject line under 60 characters
+    - email_body: The email body, under 150 words
+    - personalization_score: Integer from 0-100
+    - call_to_action: The main call to action
+    - follow_up_suggestions: Array of 2-3 short follow-up ideas
+    """
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an expert cold email copywriter. "
+                "Write concise, personalized B2B emails that get replies."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def build_email_sequence_messages(
+    cleaned_input: Dict[str, Any], sequence_length: int, industry: Optional[str]
+) -> List[Dict[str, str]]:
+    """Prompt for a follow-up sequence, shaped like EmailSequenceResponse"""
+    prompt = f"""
+    Write a {sequence_length}-email cold outreach sequence for:
+    - Prospect: {cleaned_input['prospect_name']}
+    - Company: {cleaned_input['company']}
+    - Role: {cleaned_input['role']}
+    - Industry: {industry or 'Unknown'}
+    - Pain Points: {', '.join(cleaned_input['pain_points'])}
+    - Value Proposition: {cleaned_input['value_proposition']}
+    
+    Return only a JSON object with these fields, in this order:
+    - sequence: Array of emails, each with step, day, subject, email_body,
+      personalization_score (0-100), call_to_action and wait_days
+    - total_emails: Number of emails
+    - estimated_duration_days: Days from first to last email
+    - success_metrics: Object with expected_open_rate, expected_reply_rate and
+      expected_meeting_rate
+    """
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an expert cold email copywriter "
+                "who designs multi-step outreach sequences."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def build_niche_research_messages(
+    cleaned_input: Dict[str, Any], budget: int, time_commitment: Optional[str]
+) -> List[Dict[str, str]]:
+    """Prompt for niche research, shaped like NicheResearchResponse"""
+    prompt = f"""
+    Recommend profitable B2B niches for someone with:
+    - Skills: {', '.join(cleaned_input['skills'])}
+    - Interests: {', '.join(cleaned_input['interests'])}
+    - Experience Level: {cleaned_input['experience_level']}
+    - Budget: ${budget}
+    - Time Commitment: {time_commitment}
+    
+    Return only a JSON object with these fields, in this order:
+    - recommended_niches: Array of objects with name, profitability_score (0-100),
+      market_size, competition_level, entry_barrier and description
+    - market_analysis: Object with total_addressable_market, growth_rate and key_trends
+    - implementation_strategy: Array of concrete steps
+    - risk_assessment: Object with market_risk, competition_risk and technical_risk
+    """
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an expert market researcher specializing in B2B niches."
+            ),
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def sse_response(tokens: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap a token stream as a server-sent-event response"""
+    return StreamingResponse(
+        sse_json_stream(tokens), media_type="text/event-stream", headers=SSE_HEADERS
+    )
 
 @router.post("/cold-email-writer/generate", response_model=ColdEmailResponse)
-async def generate_cold_email(request: ColdEmailRequest):
+async def generate_cold_email(
+    request: ColdEmailRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
     """Generate a personalized cold email"""
     try:
         # First, clean and improve the user input using GPT
-        cleaned_input = await clean_and_improve_input(request)
+        cleaned_input = await clean_and_improve_input(request, workspace_id)
         
         # Call the simple AI API with cleaned input
-        ai_response = requests.post(
-            "http://localhost:8001/generate_cold_email",
-            json={
+        ai_response = await call_ai_service(
+            "/generate_cold_email",
+            {
                 "prospect_name": cleaned_input["prospect_name"],
                 "company": cleaned_input["company"],
                 "role": cleaned_input["role"],
                 "pain_points": cleaned_input["pain_points"],
                 "value_proposition": cleaned_input["value_proposition"],
                 "email_type": request.email_type
-            },
-            timeout=30
+            }
         )
         
         if ai_response.status_code == 200:
@@ -277,7 +303,7 @@ async def generate_cold_email(request: ColdEmailRequest):
             
     except requests.exceptions.RequestException:
         # Fallback to mock data if AI service is down, using cleaned input
-        cleaned_input = await clean_and_improve_input(request)
+        cleaned_input = await clean_and_improve_input(request, workspace_id)
         return ColdEmailResponse(
             subject=f"Quick question about {cleaned_input['company']}'s growth strategy",
             email_body=f"""Hi {cleaned_input['prospect_name']},
@@ -297,8 +323,30 @@ Best regards,
             follow_up_suggestions=["Follow up in 3 days", "Send case study", "Connect on LinkedIn"]
         )
 
+
+@router.post("/cold-email-writer/generate/stream")
+async def generate_cold_email_stream(
+    request: ColdEmailRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
+    """Stream a personalized cold email as server-sent events"""
+
+    async def tokens() -> AsyncIterator[str]:
+        cleaned_input = await clean_and_improve_input(request, workspace_id)
+        async for delta in llm_service.stream_chat(
+            build_cold_email_messages(cleaned_input, request.email_type),
+            max_tokens=800,
+            template="cold_email_writer",
+        ):
+            yield delta
+
+    return sse_response(tokens())
+
 @router.post("/cold-email-writer/sequence", response_model=EmailSequenceResponse)
-async def generate_email_sequence(request: EmailSequenceRequest):
+async def generate_email_sequence(
+    request: EmailSequenceRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
     """Generate a complete email follow-up sequence"""
     try:
         # First, clean and improve the user input
@@ -308,12 +356,17 @@ async def generate_email_sequence(request: EmailSequenceRequest):
             role=request.role,
             pain_points=request.pain_points,
             value_proposition=request.value_proposition
-        ))
+        ), workspace_id)
         
+        if request.orchestration == "parallel":
+            return await generate_email_sequence_parallel(
+                request, cleaned_input, workspace_id
+            )
+
         # Call the AI service for sequence generation with cleaned input
-        ai_response = requests.post(
-            "http://localhost:8001/generate_email_sequence",
-            json={
+        ai_response = await call_ai_service(
+            "/generate_email_sequence",
+            {
                 "prospect_name": cleaned_input["prospect_name"],
                 "company": cleaned_input["company"],
                 "role": cleaned_input["role"],
@@ -321,8 +374,7 @@ async def generate_email_sequence(request: EmailSequenceRequest):
                 "value_proposition": cleaned_input["value_proposition"],
                 "sequence_length": request.sequence_length,
                 "industry": request.industry
-            },
-            timeout=30
+            }
         )
         
         if ai_response.status_code == 200:
@@ -350,6 +402,61 @@ async def generate_email_sequence(request: EmailSequenceRequest):
             }
         )
 
+
+async def generate_email_sequence_parallel(
+    request: EmailSequenceRequest,
+    cleaned_input: Dict[str, Any],
+    workspace_id: Optional[str] = None,
+) -> EmailSequenceResponse:
+    """Write each sequence step as its own concurrent completion"""
+    try:
+        sequence = await ai_agents_service.generate_email_sequence(
+            {**cleaned_input, "industry": request.industry},
+            sequence_length=request.sequence_length,
+            workspace_id=workspace_id,
+        )
+    except Exception as e:
+        print(f"Parallel sequence generation failed: {e}")
+        sequence = generate_mock_email_sequence(request, cleaned_input)
+
+    return EmailSequenceResponse(
+        sequence=sequence,
+        total_emails=len(sequence),
+        estimated_duration_days=sequence[-1]["day"] if sequence else 0,
+        success_metrics={
+            "expected_open_rate": "25-35%",
+            "expected_reply_rate": "8-12%",
+            "expected_meeting_rate": "2-5%",
+        },
+    )
+
+
+@router.post("/cold-email-writer/sequence/stream")
+async def generate_email_sequence_stream(
+    request: EmailSequenceRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
+    """Stream an email follow-up sequence as server-sent events, one step at a time"""
+
+    async def tokens() -> AsyncIterator[str]:
+        cleaned_input = await clean_and_improve_input(ColdEmailRequest(
+            prospect_name=request.prospect_name,
+            company=request.company,
+            role=request.role,
+            pain_points=request.pain_points,
+            value_proposition=request.value_proposition
+        ), workspace_id)
+        async for delta in llm_service.stream_chat(
+            build_email_sequence_messages(
+                cleaned_input, request.sequence_length, request.industry
+            ),
+            max_tokens=3000,
+            template="email_sequence",
+        ):
+            yield delta
+
+    return sse_response(tokens())
+
 def generate_mock_email_sequence(request: EmailSequenceRequest, cleaned_input: Dict[str, Any] = None):
     """Generate a mock email sequence for fallback"""
     sequence = []
@@ -780,23 +887,25 @@ def get_mock_ab_tests():
     ]
 
 @router.post("/niche-researcher/analyze", response_model=NicheResearchResponse)
-async def analyze_niche(request: NicheResearchRequest):
+async def analyze_niche(
+    request: NicheResearchRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
     """Analyze and recommend profitable niches"""
     try:
         # Clean and improve the input
-        cleaned_input = await clean_and_improve_niche_input(request)
+        cleaned_input = await clean_and_improve_niche_input(request, workspace_id)
         
         # Call the simple AI API with cleaned input
-        ai_response = requests.post(
-            "http://localhost:8001/analyze_niche",
-            json={
+        ai_response = await call_ai_service(
+            "/analyze_niche",
+            {
                 "skills": cleaned_input["skills"],
                 "interests": cleaned_input["interests"],
                 "budget": request.budget,
                 "experience_level": cleaned_input["experience_level"],
                 "time_commitment": request.time_commitment
-            },
-            timeout=30
+            }
         )
         
         if ai_response.status_code == 200:
@@ -850,6 +959,27 @@ async def analyze_niche(request: NicheResearchRequest):
             }
         )
 
+
+@router.post("/niche-researcher/analyze/stream")
+async def analyze_niche_stream(
+    request: NicheResearchRequest,
+    workspace_id: Optional[str] = Depends(get_optional_workspace),
+):
+    """Stream niche recommendations as server-sent events"""
+
+    async def tokens() -> AsyncIterator[str]:
+        cleaned_input = await clean_and_improve_niche_input(request, workspace_id)
+        async for delta in llm_service.stream_chat(
+            build_niche_research_messages(
+                cleaned_input, request.budget, request.time_commitment
+            ),
+            max_tokens=2000,
+            template="niche_research",
+        ):
+            yield delta
+
+    return sse_response(tokens())
+
 @router.get("/health")
 async def health_check():
     """Health check for AI agents"""
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Request/Response models
 class SignupRequest(BaseModel):
@@ -79,6 +80,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     finally:
         db.close()
 
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Optional[User]:
+    """Get current user when the request carries a token"""
+    if credentials is None:
+        return None
+    return await get_current_user(credentials)
+
 # Dependency to get current workspace
 async def get_current_workspace(
     request: Request,
@@ -106,6 +116,20 @@ async def get_current_workspace(
     
     return str(workspaces[0].id)
 
+
+async def get_optional_workspace(
+    request: Request, current_user: Optional[User] = Depends(get_optional_user)
+) -> Optional[str]:
+    """Get current workspace for signed-in users; None for anonymous requests"""
+    if current_user is None:
+        return None
+    try:
+        return await get_current_workspace(request, current_user)
+    except HTTPException as e:
+        if e.status_code == status.HTTP_404_NOT_FOUND:
+            return None
+        raise
+
 @router.post("/signup", response_model=TokenResponse)
 async def signup(request: SignupRequest, response: Response):
     """Sign up a new user and create workspace"""
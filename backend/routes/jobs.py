@@ -3,8 +3,9 @@ Job management routes for Inno Supps
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from services.job_service import job_service
+from services.llm_telemetry import llm_telemetry
 from services.auth_service import auth_service
 from routes.auth import get_current_user
 from database import User
@@ -26,9 +27,11 @@ async def get_job_status(job_id: str, current_user: User = Depends(get_current_u
 async def get_workspace_jobs(
     workspace_id: str,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_results: bool = False,
     current_user: User = Depends(get_current_user)
 ):
-    """Get all jobs for a workspace"""
+    """Get a page of a workspace's jobs, newest first; pass next_cursor to continue"""
     # Verify user has access to workspace
     if not auth_service.can_read(current_user.id, workspace_id):
         raise HTTPException(
@@ -36,8 +39,81 @@ async def get_workspace_jobs(
             detail="Access denied to workspace"
         )
     
-    jobs = job_service.get_workspace_jobs(workspace_id, limit)
-    return {"jobs": jobs}
+    try:
+        return job_service.get_workspace_jobs(
+            workspace_id, limit, cursor, include_results
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/backlog")
+async def get_workspace_backlog(
+    workspace_id: str, current_user: User = Depends(get_current_user)
+):
+    """Get a workspace's waiting and running jobs per queue"""
+    if not auth_service.can_read(current_user.id, workspace_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+
+    return {"backlog": job_service.get_workspace_backlog(workspace_id)}
+
+
+@router.get("/dead-letter")
+async def get_dead_letters(
+    workspace_id: str,
+    job_type: Optional[str] = None,
+    include_replayed: bool = False,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+):
+    """Get a workspace's jobs that failed for good, newest first"""
+    if not auth_service.can_read(current_user.id, workspace_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+
+    return {
+        "jobs": job_service.get_dead_letters(
+            workspace_id, job_type, include_replayed, limit
+        )
+    }
+
+
+@router.post("/dead-letter/replay")
+async def replay_dead_letters(
+    workspace_id: str,
+    ids: Optional[List[str]] = None,
+    job_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Enqueue dead-lettered jobs again: the given ids, or all of a type or workspace"""
+    if not auth_service.can_write(current_user.id, workspace_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+
+    return job_service.replay_dead_letters(workspace_id, ids, job_type)
+
+
+@router.get("/pipelines/{pipeline_id}")
+async def get_pipeline_status(
+    pipeline_id: str, current_user: User = Depends(get_current_user)
+):
+    """Get a pipeline's status, overall latency and stages"""
+    pipeline = job_service.get_pipeline_status(pipeline_id)
+    if not pipeline:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline not found"
+        )
+    if pipeline["workspace_id"] and not auth_service.can_read(
+        current_user.id, pipeline["workspace_id"]
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+    return pipeline
 
 @router.post("/cancel/{job_id}")
 async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)):
@@ -51,10 +127,26 @@ async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)
     return {"message": "Job cancelled successfully"}
 
 @router.get("/queue-stats")
-async def get_queue_stats(current_user: User = Depends(get_current_user)):
-    """Get queue statistics"""
-    stats = job_service.get_queue_stats()
-    return {"queue_stats": stats}
+async def get_queue_stats(
+    minutes: int = 60, current_user: User = Depends(get_current_user)
+):
+    """Get queue counters and per-minute throughput for the last minutes"""
+    return {
+        "queue_stats": job_service.get_queue_stats(),
+        "throughput": job_service.get_queue_throughput(minutes),
+    }
+
+
+@router.get("/profiles")
+async def get_job_profiles(current_user: User = Depends(get_current_user)):
+    """Get the average execution profile per job type and what bounds it"""
+    return {"profiles": job_service.get_job_profiles()}
+
+
+@router.get("/llm-stats")
+async def get_llm_stats(current_user: User = Depends(get_current_user)):
+    """Get LLM latency histograms and token usage for this process"""
+    return {"llm_stats": llm_telemetry.snapshot()}
 
 @router.post("/email/ingest")
 async def trigger_email_ingest(
@@ -70,16 +162,76 @@ async def trigger_email_ingest(
             detail="Access denied to workspace"
         )
     
-    from jobs.email_jobs import ingest_email
-    job_id = job_service.enqueue_job(
-        "ingest_email",
-        ingest_email,
-        (workspace_id, email_data),
-        {},
-        workspace_id=workspace_id
-    )
+    from jobs.email_jobs import inbound_reply_pipeline
+
+    pipeline = inbound_reply_pipeline(workspace_id, email_data)
+    pipeline_id = pipeline.enqueue()
     
-    return {"job_id": job_id, "message": "Email ingestion job queued"}
+    return {
+        "job_id": pipeline.job_ids.get("ingest"),
+        "pipeline_id": pipeline_id,
+        "message": "Email ingestion job queued",
+    }
+
+
+@router.post("/email/send-batch")
+async def trigger_email_batch(
+    workspace_id: str,
+    emails: List[Dict[str, Any]],
+    current_user: User = Depends(get_current_user),
+):
+    """Queue one send job per prospect email in bulk"""
+    # Verify user has access to workspace
+    if not auth_service.can_write(current_user.id, workspace_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+
+    from jobs.email_jobs import send_email
+
+    job_ids = send_email.enqueue_many(
+        [
+            ((workspace_id, email["prospect_email"], email.get("email_data", {})), {})
+            for email in emails
+        ],
+        workspace_id=workspace_id,
+    )
+
+    return {
+        "job_ids": job_ids,
+        "queued": sum(1 for job_id in job_ids if job_id),
+        "message": "Email send jobs queued",
+    }
+
+
+@router.post("/campaigns/{campaign_id}/enroll")
+async def enroll_in_campaign(
+    campaign_id: str,
+    workspace_id: str,
+    prospect_emails: List[str],
+    current_user: User = Depends(get_current_user),
+):
+    """Schedule a campaign's sequence steps for prospects"""
+    # Verify user has access to workspace
+    if not auth_service.can_write(current_user.id, workspace_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to workspace"
+        )
+
+    from jobs.email_jobs import enroll_in_sequence
+
+    try:
+        scheduled = enroll_in_sequence(workspace_id, campaign_id, prospect_emails)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    return {
+        "job_ids": scheduled,
+        "scheduled": sum(
+            1 for job_ids in scheduled.values() for job_id in job_ids if job_id
+        ),
+        "message": "Sequence steps scheduled",
+    }
 
 @router.post("/research/niche")
 async def trigger_niche_research(
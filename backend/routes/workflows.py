@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from pydantic import BaseModel
 from typing import Dict, Any
 from services.llm_service import LLMService
+from services.llm_streaming import SSE_HEADERS, sse_json_stream
 import httpx
 import os
 
@@ -38,6 +40,16 @@ async def generate_workflow(request: WorkflowRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow generation failed: {str(e)}")
 
+
+@router.post("/generate/stream")
+async def stream_workflow(request: WorkflowRequest):
+    """Stream n8n workflow generation as server-sent events"""
+    return StreamingResponse(
+        sse_json_stream(llm_service.stream_workflow(request.description)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 @router.post("/import", response_model=ImportResponse)
 async def import_workflow(request: ImportRequest):
     """Import workflow to n8n instance"""
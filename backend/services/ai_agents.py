@@ -2,13 +2,14 @@
 AI Agents Service - Complete implementation matching AI Clients functionality
 """
 
-import os
 import json
 import asyncio
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
-import openai
 from dataclasses import dataclass
+from services.llm_service import LLMService
+from services.fanout import fanout_limiter
+from services.prompt_budget import HISTORY_SHARE, prompt_budget
 
 @dataclass
 class NicheAnalysis:
@@ -50,9 +51,73 @@ class GrowthPlan:
     kpis: List[str]
     resources_needed: List[str]
 
+# Angles used when ad variants are generated as independent completions
+AD_ANGLES = {
+    "proof_based": "Proof-based (testimonials, results, data)",
+    "transformation": "Transformation (before/after, lifestyle change)",
+    "social_proof": "Social proof (popularity, reviews, user count)",
+    "urgency": "Urgency (limited time, scarcity, deadlines)",
+    "curiosity": "Curiosity (mystery, questions, intrigue)",
+}
+
+# (angle, brief, days to wait before the next step) for each sequence step
+SEQUENCE_ANGLES = [
+    (
+        "initial_outreach",
+        "Initial outreach with a personalized hook and a low-commitment ask",
+        3,
+    ),
+    ("case_study", "Follow-up with a short case study and concrete results", 4),
+    ("industry_insights", "Industry insights that show expertise in their space", 5),
+    ("urgency", "Gentle urgency with a time-bound reason to talk now", 3),
+]
+FOLLOW_UP_ANGLE = (
+    "follow_up",
+    "Short, friendly follow-up that adds one new piece of value",
+    4,
+)
+BREAKUP_ANGLE = ("breakup", "Final breakup email that leaves the door open", 0)
+
+
+def sequence_plan(length: int) -> List[Dict[str, Any]]:
+    """Step numbers, send days and angles for a sequence of the given length"""
+    if length <= 1:
+        angles = SEQUENCE_ANGLES[:1]
+    else:
+        middle = SEQUENCE_ANGLES[: length - 1]
+        middle += [FOLLOW_UP_ANGLE] * (length - 1 - len(middle))
+        angles = middle + [BREAKUP_ANGLE]
+
+    plan = []
+    day = 0
+    for step, (angle, brief, wait_days) in enumerate(angles, start=1):
+        wait_days = 0 if step == len(angles) else wait_days
+        plan.append(
+            {
+                "step": step,
+                "day": day,
+                "angle": angle,
+                "brief": brief,
+                "wait_days": wait_days,
+            }
+        )
+        day += wait_days
+    return plan
+
 class AIAgentsService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm = LLMService()
+
+    async def _complete(
+        self, prompt: str, temperature: float, template: str, tier: Optional[str] = None
+    ) -> str:
+        """Send a single-message chat request through the shared async client"""
+        return await self.llm.chat(
+            [{"role": "user", "content": prompt}],
+            temperature=temperature,
+            template=template,
+            tier=tier,
+        )
     
     # 1. AI Niche Researcher
     async def analyze_niche(self, skills: str, interests: str, budget: str, experience: str) -> NicheAnalysis:
@@ -83,13 +148,11 @@ class AIAgentsService:
         Return as JSON with specific data points and actionable insights.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        content = await self._complete(
+            prompt, temperature=0.7, template="analyze_niche"
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         return NicheAnalysis(
             market_size=result.get("market_size", "$2.4B"),
@@ -136,13 +199,11 @@ class AIAgentsService:
         Return as JSON with all components.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.8
+        content = await self._complete(
+            prompt, temperature=0.8, template="generate_cold_email"
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         return ColdEmail(
             subject=result.get("subject", ""),
@@ -156,16 +217,29 @@ class AIAgentsService:
     
     # 3. AI SDR - Reply & Booking Agent
     async def handle_reply(self, prospect_reply: str, conversation_history: List[Dict], user_profile: Dict) -> Dict[str, Any]:
-        """Handle prospect replies and book meetings"""
+        """Handle prospect replies and book meetings
+
+        Long threads keep their latest messages and condense the rest so the
+        prompt stays inside the handle_reply token budget.
+        """
+        budget = prompt_budget.budget_for("handle_reply")
+        history_budget = int(budget * HISTORY_SHARE)
+        history, earlier = prompt_budget.fit_history(
+            conversation_history, history_budget
+        )
+        profile = prompt_budget.compact_json(user_profile, budget - history_budget)
+        earlier_section = f"Earlier in the thread: {earlier}" if earlier else ""
         
         prompt = f"""
         As an AI SDR, handle this prospect reply and continue the conversation:
         
         Prospect Reply: {prospect_reply}
         
-        Conversation History: {json.dumps(conversation_history)}
+        {earlier_section}
+        
+        Conversation History: {json.dumps(history)}
         
-        User Profile: {json.dumps(user_profile)}
+        User Profile: {profile}
         
         Your goals:
         1. Respond within 1-2 minutes (simulate real-time)
@@ -190,17 +264,36 @@ class AIAgentsService:
         - confidence_level (0-100)
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.6
+        content = await self._complete(
+            prompt, temperature=0.6, template="handle_reply", tier="balanced"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     
     # 4. AI Ad Writer
-    async def generate_ad_variants(self, product_info: Dict[str, Any], channel: str, audience: str) -> AdVariants:
-        """Generate multiple ad variants for different platforms"""
+    async def generate_ad_variants(
+        self,
+        product_info: Dict[str, Any],
+        channel: str,
+        audience: str,
+        parallel: bool = False,
+        workspace_id: Optional[str] = None,
+    ) -> AdVariants:
+        """Generate multiple ad variants for different platforms
+
+        With parallel=True each angle is its own concurrent completion.
+        """
+        if parallel:
+            variants = await fanout_limiter.run(
+                [
+                    lambda angle=angle: self.generate_ad_variant(
+                        product_info, channel, audience, angle
+                    )
+                    for angle in AD_ANGLES
+                ],
+                workspace_id=workspace_id,
+            )
+            return AdVariants(**dict(zip(AD_ANGLES, variants)))
         
         prompt = f"""
         As an expert ad copywriter, create 5 different ad variants for:
@@ -231,13 +324,11 @@ class AIAgentsService:
         Return as JSON with all variants.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.8
+        content = await self._complete(
+            prompt, temperature=0.8, template="generate_ad_variants"
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         return AdVariants(
             proof_based=result.get("proof_based", {}),
@@ -247,9 +338,36 @@ class AIAgentsService:
             curiosity=result.get("curiosity", {})
         )
     
+    async def generate_ad_variant(
+        self, product_info: Dict[str, Any], channel: str, audience: str, angle: str
+    ) -> Dict[str, Any]:
+        """Generate one ad variant for a single psychological angle"""
+
+        prompt = f"""
+        As an expert ad copywriter, create one {AD_ANGLES[angle]} ad variant for:
+        
+        Product: {product_info.get('name', 'Unknown')}
+        Description: {product_info.get('description', 'Unknown')}
+        Benefits: {product_info.get('benefits', 'Unknown')}
+        Target Audience: {audience}
+        Channel: {channel}
+        
+        Ensure compliance with supplement advertising regulations.
+        
+        Return as JSON with: headline, subheadline, body, cta, visual_suggestions,
+        targeting.
+        """
+
+        content = await self._complete(prompt, temperature=0.8, template="ad_variant")
+
+        return json.loads(content)
+
     # 5. AI Sales Call Analyzer
     async def analyze_sales_call(self, call_transcript: str, call_type: str = "discovery") -> Dict[str, Any]:
         """Analyze sales calls and provide coaching insights"""
+        call_transcript = prompt_budget.compact_transcript(
+            call_transcript, prompt_budget.budget_for("analyze_sales_call")
+        )
         
         prompt = f"""
         As an expert sales coach, analyze this sales call transcript:
@@ -285,13 +403,11 @@ class AIAgentsService:
         Return as JSON with detailed analysis.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
+        content = await self._complete(
+            prompt, temperature=0.5, template="analyze_sales_call"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     
     # 6. AI Growth Consultant
     async def provide_growth_advice(self, business_profile: Dict[str, Any], question: str) -> Dict[str, Any]:
@@ -324,13 +440,11 @@ class AIAgentsService:
         Return as JSON with comprehensive advice.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.6
+        content = await self._complete(
+            prompt, temperature=0.6, template="provide_growth_advice"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     
     # 7. AI Growth Plan Creator
     async def create_growth_plan(self, business_goals: Dict[str, Any], timeline: int = 90) -> GrowthPlan:
@@ -365,13 +479,11 @@ class AIAgentsService:
         Return as JSON with complete plan details.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        content = await self._complete(
+            prompt, temperature=0.7, template="create_growth_plan"
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         return GrowthPlan(
             title=result.get("title", f"{timeline}-Day Growth Plan"),
@@ -384,8 +496,19 @@ class AIAgentsService:
         )
     
     # 8. AI Cold Email Campaign Agent
-    async def create_campaign(self, campaign_params: Dict[str, Any]) -> Dict[str, Any]:
-        """Create and manage cold email campaigns"""
+    async def create_campaign(
+        self,
+        campaign_params: Dict[str, Any],
+        parallel: bool = False,
+        workspace_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Create and manage cold email campaigns
+
+        With parallel=True the strategy and each sequence email are generated
+        as concurrent completions and assembled afterwards.
+        """
+        if parallel:
+            return await self._create_campaign_parallel(campaign_params, workspace_id)
         
         prompt = f"""
         As an expert email marketing strategist, create a cold email campaign for:
@@ -413,14 +536,55 @@ class AIAgentsService:
         Return as JSON with complete campaign details.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        content = await self._complete(
+            prompt, temperature=0.7, template="create_campaign"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     
+    async def _create_campaign_parallel(
+        self, campaign_params: Dict[str, Any], workspace_id: Optional[str]
+    ) -> Dict[str, Any]:
+        prompt = f"""
+        As an expert email marketing strategist, design the strategy for a cold email
+        campaign:
+        
+        Campaign Parameters: {json.dumps(campaign_params)}
+        
+        Cover:
+        1. Campaign Strategy
+        2. Target Audience Segmentation
+        3. A/B Testing Variations
+        4. Personalization Rules
+        5. Timing and Frequency
+        6. Performance Tracking
+        7. Optimization Recommendations
+        
+        Do not write the emails themselves.
+        
+        Return as JSON with the campaign strategy details.
+        """
+
+        plan = sequence_plan(campaign_params.get("sequence_length", 5))
+        tasks = [
+            lambda: self._complete(
+                prompt, temperature=0.7, template="campaign_strategy"
+            )
+        ]
+        tasks += [
+            lambda item=item: self.generate_sequence_step(
+                campaign_params, item, len(plan)
+            )
+            for item in plan
+        ]
+        strategy_content, *steps = await fanout_limiter.run(
+            tasks, workspace_id=workspace_id
+        )
+
+        result = json.loads(strategy_content)
+        result["email_sequence"] = steps
+        return result
+
     # 9. AI Compliance Checker
     async def check_compliance(self, content: str, content_type: str = "email") -> Dict[str, Any]:
         """Check content for FDA/FTC compliance"""
@@ -450,13 +614,11 @@ class AIAgentsService:
         Return as JSON with detailed compliance analysis.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
+        content = await self._complete(
+            prompt, temperature=0.3, template="check_compliance", tier="balanced"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     
     # 10. AI Content Scorer
     async def score_content(self, content: str, content_type: str = "email") -> Dict[str, Any]:
@@ -486,10 +648,60 @@ class AIAgentsService:
         Return as JSON with detailed scoring.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
+        content = await self._complete(
+            prompt, temperature=0.5, template="score_content", tier="fast"
         )
         
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
+
+    # 11. Parallel Email Sequence Writer
+    async def generate_sequence_step(
+        self, prospect_info: Dict[str, Any], plan_item: Dict[str, Any], total_steps: int
+    ) -> Dict[str, Any]:
+        """Write one email of a sequence independently of the others"""
+
+        prompt = f"""
+        As an expert cold email copywriter, write email {plan_item['step']} of a
+        {total_steps}-email sequence.
+        
+        Prospect Info: {json.dumps(prospect_info)}
+        
+        This email's job: {plan_item['brief']}
+        It is sent on day {plan_item['day']} of the sequence.
+        
+        Return as JSON with: subject, email_body, personalization_score (0-100),
+        call_to_action.
+        """
+
+        content = await self._complete(
+            prompt, temperature=0.7, template="sequence_step"
+        )
+
+        step = json.loads(content)
+        step.update(
+            {
+                "step": plan_item["step"],
+                "day": plan_item["day"],
+                "angle": plan_item["angle"],
+                "wait_days": plan_item["wait_days"],
+            }
+        )
+        return step
+
+    async def generate_email_sequence(
+        self,
+        prospect_info: Dict[str, Any],
+        sequence_length: int = 5,
+        workspace_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Generate every email of a sequence concurrently and assemble them in order"""
+        plan = sequence_plan(sequence_length)
+        return await fanout_limiter.run(
+            [
+                lambda item=item: self.generate_sequence_step(
+                    prospect_info, item, len(plan)
+                )
+                for item in plan
+            ],
+            workspace_id=workspace_id,
+        )
@@ -0,0 +1,165 @@
+"""
+Asyncio RQ worker that runs many I/O-bound jobs per process
+"""
+
+import asyncio
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from rq import Queue, SimpleWorker
+from rq.exceptions import DequeueTimeout
+from rq.job import Job
+from rq.timeouts import TimerDeathPenalty
+
+from config import settings
+from services.fair_queue import FairQueues, base_queue_name, mark_dequeued
+
+
+def parse_concurrency(raw: str) -> Dict[str, int]:
+    """Parse a JSON object of queue name -> concurrent jobs"""
+    if not raw:
+        return {}
+    try:
+        return {str(queue): int(limit) for queue, limit in json.loads(raw).items()}
+    except Exception as e:
+        print(f"Invalid async worker concurrency: {e}")
+        return {}
+
+
+class AsyncWorker(SimpleWorker):
+    """Run up to N jobs per queue at once from a single process
+
+    An event loop dequeues from the same queues, in the same order, but
+    only from queues with a free slot, and hands each job to RQ's own
+    ``perform_job`` on a thread pool, so success, failure, retry and
+    registry handling (and the ``JobService`` status updates inside the job)
+    are exactly those of the forking worker. Jobs are synchronous and wait
+    on LLM or provider I/O, so threads overlap them well. Timeouts use
+    RQ's timer death penalty because SIGALRM only works on the main thread.
+    """
+
+    death_penalty_class = TimerDeathPenalty
+
+    def __init__(
+        self,
+        queues: List[Queue],
+        concurrency: Optional[Dict[str, int]] = None,
+        fair_queues: Optional[FairQueues] = None,
+        **kwargs,
+    ):
+        super().__init__(queues, **kwargs)
+        self.fair_queues = fair_queues
+        limits = (
+            concurrency
+            if concurrency is not None
+            else parse_concurrency(settings.async_worker_concurrency)
+        )
+        self.concurrency = {
+            queue.name: max(
+                1, limits.get(queue.name, settings.async_worker_default_concurrency)
+            )
+            for queue in self.queues
+        }
+        self.running = {name: 0 for name in self.concurrency}
+        self.poll_timeout = 1
+        # Well inside worker_ttl, so a worker with every slot busy stays registered
+        self.heartbeat_interval = max(1, self.worker_ttl // 4)
+        self._stopping = False
+
+    def work_async(self) -> None:
+        """Work until SIGINT or SIGTERM, then finish the running jobs"""
+        asyncio.run(self._run())
+
+    def request_stop_async(self) -> None:
+        self.log.info("Warm shut down requested, finishing running jobs")
+        self._stopping = True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop_async)
+
+        executor = ThreadPoolExecutor(
+            max_workers=sum(self.concurrency.values()), thread_name_prefix="rq-job"
+        )
+        slot_freed = asyncio.Event()
+        tasks = set()
+        self.register_birth()
+        self.log.info("Async worker started with concurrency %s", self.concurrency)
+        try:
+            while not self._stopping:
+                self.heartbeat()
+                available = [
+                    queue
+                    for queue in self.queues
+                    if self.running[queue.name] < self.concurrency[queue.name]
+                ]
+                if not available:
+                    slot_freed.clear()
+                    try:
+                        await asyncio.wait_for(
+                            slot_freed.wait(), self.heartbeat_interval
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                dequeued = await loop.run_in_executor(None, self._dequeue, available)
+                if dequeued is None:
+                    continue
+                job, queue = dequeued
+                # Workspace sub-queue jobs count against their shared queue
+                self.running[base_queue_name(queue.name)] += 1
+                task = asyncio.create_task(
+                    self._perform(executor, job, queue, slot_freed)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            while tasks:
+                self.heartbeat()
+                await asyncio.wait(set(tasks), timeout=self.heartbeat_interval)
+        finally:
+            executor.shutdown(wait=True)
+            self.register_death()
+
+    def _dequeue(self, queues: List[Queue]) -> Optional[Tuple[Job, Queue]]:
+        if self.fair_queues is not None and self.fair_queues.enabled:
+            result = self.fair_queues.dequeue(
+                queues, self.job_class, self.serializer, self.death_penalty_class
+            )
+            if result is None:
+                self.fair_queues.wait(self.poll_timeout)
+            return result
+        try:
+            result = Queue.dequeue_any(
+                queues,
+                self.poll_timeout,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+        except DequeueTimeout:
+            return None
+        if result is not None:
+            mark_dequeued(result[0])
+        return result
+
+    async def _perform(
+        self,
+        executor: ThreadPoolExecutor,
+        job: Job,
+        queue: Queue,
+        slot_freed: asyncio.Event,
+    ) -> None:
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self.perform_job, job, queue
+            )
+        except Exception as e:
+            print(f"Async worker error for job {job.id}: {e}")
+        finally:
+            self.running[base_queue_name(queue.name)] -= 1
+            slot_freed.set()
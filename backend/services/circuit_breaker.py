@@ -0,0 +1,134 @@
+"""
+Latency- and error-aware circuit breaker for upstream calls
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be unhealthy"""
+
+
+class CircuitBreaker:
+    """Trip when the recent error rate or p95 latency breaks its SLO
+
+    Outcomes are kept for a rolling window. Once tripped, calls fail fast
+    for the cooldown; then a single probe is let through and its outcome
+    decides whether the circuit closes again. Calls that started before the
+    probe and finish while it is in flight do not count.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = settings.llm_breaker_window_seconds,
+        min_calls: int = settings.llm_breaker_min_calls,
+        error_rate_threshold: float = settings.llm_breaker_error_rate,
+        p95_slo_seconds: float = settings.llm_breaker_p95_slo_seconds,
+        cooldown_seconds: float = settings.llm_breaker_cooldown_seconds,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.p95_slo_seconds = p95_slo_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes: Deque[Tuple[float, float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self._state = HALF_OPEN
+                self._half_opened_at = now
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record one upstream outcome"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if self._is_late(now, latency):
+                    return
+                self._probing = False
+                if ok and latency <= self.p95_slo_seconds:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip(now)
+                return
+
+            self._outcomes.append((now, latency, ok))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                if (
+                    self._error_rate() > self.error_rate_threshold
+                    or self._p95() > self.p95_slo_seconds
+                ):
+                    self._trip(now)
+
+    def abandon(self, latency: float = 0.0) -> None:
+        """Forget a cancelled call, or one failing for its own reasons, after latency"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN and not self._is_late(now, latency):
+                self._probing = False
+
+    def _is_late(self, now: float, latency: float) -> bool:
+        # Started before the circuit half-opened, so it is not the probe
+        return now - latency < self._half_opened_at
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self.stats["opened"] += 1
+
+    def _error_rate(self) -> float:
+        return sum(1 for _, _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def _p95(self) -> float:
+        latencies = sorted(latency for _, latency, ok in self._outcomes if ok)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and window metrics"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._state,
+                "calls": len(self._outcomes),
+                "error_rate": self._error_rate() if self._outcomes else 0.0,
+                "p95_seconds": self._p95(),
+                **self.stats,
+            }
@@ -0,0 +1,87 @@
+"""
+Persistent embedding store keyed by content hash, with vectors packed as float32
+"""
+
+import hashlib
+import struct
+from typing import Dict, List, Optional
+
+import redis
+
+from config import settings
+from services.job_profile import instrument_redis
+
+
+class EmbeddingStore:
+    """Redis-backed embedding cache shared by every worker and across restarts
+
+    Keys are ``embedding:<model>:<sha256(text)>`` so they are stable between
+    processes, and values are little-endian float32 bytes: a 1536-dimension
+    vector takes 6 KB instead of ~30 KB of JSON.
+    """
+
+    def __init__(
+        self, redis_client: Optional[redis.Redis] = None, ttl: Optional[int] = None
+    ):
+        # Binary values, so this client must not decode responses
+        self.redis_client = redis_client or instrument_redis(
+            redis.from_url(settings.redis_url)
+        )
+        self.ttl = ttl if ttl is not None else settings.embedding_cache_ttl_seconds
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """Stable key for a text under an embedding model"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"embedding:{model}:{digest}"
+
+    @staticmethod
+    def pack(vector: List[float]) -> bytes:
+        """Pack a vector as little-endian float32"""
+        return struct.pack(f"<{len(vector)}f", *vector)
+
+    @staticmethod
+    def unpack(data: bytes) -> List[float]:
+        """Unpack little-endian float32 bytes into a vector"""
+        return list(struct.unpack(f"<{len(data) // 4}f", data))
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Look up vectors for texts in one round trip"""
+        if not texts:
+            return []
+        try:
+            values = self.redis_client.mget(
+                [self.make_key(text, model) for text in texts]
+            )
+            return [self.unpack(value) if value else None for value in values]
+        except Exception as e:
+            print(f"Embedding store get error: {e}")
+            return [None] * len(texts)
+
+    def set_many(self, vectors: Dict[str, List[float]], model: str) -> bool:
+        """Store vectors for texts in one pipelined round trip"""
+        if not vectors:
+            return True
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for text, vector in vectors.items():
+                pipe.set(
+                    self.make_key(text, model), self.pack(vector), ex=self.ttl or None
+                )
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Embedding store set error: {e}")
+            return False
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Look up the vector for one text"""
+        return self.get_many([text], model)[0]
+
+    def set(self, text: str, vector: List[float], model: str) -> bool:
+        """Store the vector for one text"""
+        return self.set_many({text: vector}, model)
+
+
+# Global embedding store instance
+embedding_store = EmbeddingStore()
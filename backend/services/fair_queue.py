@@ -0,0 +1,357 @@
+"""
+Per-workspace job sub-queues with deficit round robin dequeueing
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from rq import Queue, Worker
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from rq.registry import clean_registries
+from rq.worker import WorkerStatus
+
+from config import settings
+
+# Sub-queue for jobs enqueued without a workspace, matching their job rows
+SYSTEM_WORKSPACE = "system"
+
+# Join a base queue's ring once its workspace has jobs waiting.
+# KEYS: ring, members
+# ARGV: workspace
+_ACTIVATE = """
+if redis.call("sadd", KEYS[2], ARGV[1]) == 1 then
+    redis.call("rpush", KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# Pop the next job by deficit round robin over a base queue's workspaces.
+# The ring's head keeps the turn while its deficit lasts: a new turn adds
+# the workspace weight and each job spends one. Empty workspaces leave the
+# ring, workspaces at their in-flight cap pass their turn.
+# KEYS: ring, members, deficits
+# ARGV: sub-queue key prefix, weights json, default weight, max in flight, now,
+#       started registry key prefixes...
+_DEQUEUE = """
+local weights = cjson.decode(ARGV[2])
+local cap = tonumber(ARGV[4])
+local now = tonumber(ARGV[5])
+for i = 1, redis.call("llen", KEYS[1]) do
+    local workspace = redis.call("lindex", KEYS[1], 0)
+    local queue = ARGV[1] .. workspace
+    if redis.call("llen", queue) == 0 then
+        redis.call("lpop", KEYS[1])
+        redis.call("srem", KEYS[2], workspace)
+        redis.call("hdel", KEYS[3], workspace)
+    else
+        local busy = 0
+        if cap > 0 then
+            for j = 6, #ARGV do
+                busy = busy + redis.call("zcount", ARGV[j] .. workspace, now, "+inf")
+            end
+        end
+        if cap > 0 and busy >= cap then
+            redis.call("rpush", KEYS[1], redis.call("lpop", KEYS[1]))
+            redis.call("hdel", KEYS[3], workspace)
+        else
+            local deficit = tonumber(redis.call("hget", KEYS[3], workspace) or "0")
+            if deficit < 1 then
+                deficit = deficit + (tonumber(weights[workspace]) or tonumber(ARGV[3]))
+            end
+            if deficit >= 1 then
+                deficit = deficit - 1
+                if deficit < 1 then
+                    redis.call("rpush", KEYS[1], redis.call("lpop", KEYS[1]))
+                end
+                redis.call("hset", KEYS[3], workspace, deficit)
+                return {workspace, redis.call("lpop", queue)}
+            end
+            redis.call("hset", KEYS[3], workspace, deficit)
+            redis.call("rpush", KEYS[1], redis.call("lpop", KEYS[1]))
+        end
+    end
+end
+return nil
+"""
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def base_queue_name(queue_name: str) -> str:
+    """Shared queue a workspace sub-queue belongs to"""
+    return queue_name.partition(":")[0]
+
+
+def mark_dequeued(job: Job) -> Job:
+    """Note when a worker took a job, to measure its startup overhead when it runs"""
+    job.dequeued_at = time.monotonic()
+    return job
+
+
+def parse_weights(raw: str) -> Dict[str, float]:
+    """Parse a JSON object of workspace id -> dequeue weight"""
+    if not raw:
+        return {}
+    try:
+        return {
+            str(workspace): float(weight)
+            for workspace, weight in json.loads(raw).items()
+        }
+    except Exception as e:
+        print(f"Invalid job workspace weights: {e}")
+        return {}
+
+
+def sub_queues(connection, queue: Queue) -> List[Queue]:
+    """Workspace sub-queues RQ knows about for a shared queue"""
+    prefix = f"{queue.key}:"
+    return [
+        Queue.from_queue_key(key, connection=connection)
+        for key in sorted(
+            _text(key) for key in connection.smembers(Queue.redis_queues_keys)
+        )
+        if key.startswith(prefix)
+    ]
+
+
+class FairQueues:
+    """Fair sharing of the job queues between workspaces
+
+    Each workspace's jobs go to its own RQ sub-queue (``default:<id>``), so
+    one tenant's bulk sends queue behind each other rather than in front
+    of everyone else's work. Workers still serve the shared queues in
+    priority order, but within one they take jobs from the workspaces with
+    a backlog in turn, ``weight`` jobs per turn, skipping workspaces that
+    already have ``max_in_flight`` jobs running. Jobs cost one unit each,
+    so deficit round robin reduces to weighted round robin. Selection runs
+    in one Lua script, so all workers share the same turn order.
+    """
+
+    def __init__(
+        self,
+        redis,
+        prefix: str = "job:fair",
+        enabled: bool = settings.job_fair_scheduling_enabled,
+        max_in_flight: int = settings.job_fair_max_in_flight,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.weights = (
+            weights
+            if weights is not None
+            else parse_weights(settings.job_fair_workspace_weights)
+        )
+        self.wakeup_key = f"{prefix}:wakeup"
+
+    def _key(self, queue_name: str, name: str) -> str:
+        return f"{self.prefix}:{queue_name}:{name}"
+
+    def queue_for(self, queue: Queue, workspace_id: Optional[str]) -> Queue:
+        """Sub-queue of a shared queue for a workspace's jobs"""
+        if not self.enabled:
+            return queue
+        return Queue(
+            f"{queue.name}:{workspace_id or SYSTEM_WORKSPACE}",
+            connection=queue.connection,
+        )
+
+    def activate(self, queue: Queue, pipeline=None) -> None:
+        """Put a sub-queue that just got jobs in its shared queue's turn order"""
+        base, _, workspace = queue.name.partition(":")
+        if not workspace:
+            return
+        try:
+            pipe = (
+                pipeline
+                if pipeline is not None
+                else self.redis.pipeline(transaction=False)
+            )
+            pipe.eval(
+                _ACTIVATE,
+                2,
+                self._key(base, "ring"),
+                self._key(base, "members"),
+                workspace,
+            )
+            # Wake an idle worker; a few stale tokens only cost an empty pass
+            pipe.lpush(self.wakeup_key, 1)
+            pipe.ltrim(self.wakeup_key, 0, 63)
+            if pipeline is None:
+                pipe.execute()
+        except Exception as e:
+            print(f"Redis fair queue activate error: {e}")
+
+    def dequeue(
+        self,
+        queues: List[Queue],
+        job_class=Job,
+        serializer=None,
+        death_penalty_class=None,
+    ) -> Optional[Tuple[Job, Queue]]:
+        """Take the next job from the queues by priority, fairly between workspaces"""
+        weights = json.dumps(self.weights)
+        registries = [f"{queue.started_job_registry.key}:" for queue in queues]
+        for queue in queues:
+            while True:
+                result = self.redis.eval(
+                    _DEQUEUE,
+                    3,
+                    self._key(queue.name, "ring"),
+                    self._key(queue.name, "members"),
+                    self._key(queue.name, "deficits"),
+                    f"{queue.key}:",
+                    weights,
+                    1,
+                    self.max_in_flight,
+                    int(time.time()),
+                    *registries,
+                )
+                if not result:
+                    break
+                workspace, job_id = (_text(value) for value in result)
+                sub_queue = Queue(
+                    f"{queue.name}:{workspace}",
+                    connection=self.redis,
+                    job_class=job_class,
+                    serializer=serializer,
+                    death_penalty_class=death_penalty_class,
+                )
+                try:
+                    job = job_class.fetch(
+                        job_id, connection=self.redis, serializer=serializer
+                    )
+                except NoSuchJobError:
+                    continue
+                except Exception as e:
+                    e.job_id = job_id
+                    e.queue = sub_queue
+                    raise e
+                return mark_dequeued(job), sub_queue
+
+        # Jobs enqueued on the shared queues themselves, before sub-queues
+        result = Queue.dequeue_any(
+            queues,
+            None,
+            connection=self.redis,
+            job_class=job_class,
+            serializer=serializer,
+            death_penalty_class=death_penalty_class,
+        )
+        if result is not None:
+            mark_dequeued(result[0])
+        return result
+
+    def wait(self, timeout: int) -> None:
+        """Block until a job is enqueued or the timeout passes"""
+        self.redis.blpop(self.wakeup_key, timeout)
+
+    def backlog(self, workspace_id: str, queues: List[Queue]) -> Dict[str, Any]:
+        """A workspace's waiting and running jobs per shared queue"""
+        now = int(time.time())
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for queue in queues:
+                sub_queue = self.queue_for(queue, workspace_id)
+                pipe.llen(sub_queue.key)
+                pipe.zcount(sub_queue.started_job_registry.key, now, "+inf")
+            counts = pipe.execute()
+        except Exception as e:
+            print(f"Redis fair queue backlog error: {e}")
+            return {}
+        return {
+            "queues": {
+                queue.name: {"queued": counts[2 * i], "in_flight": counts[2 * i + 1]}
+                for i, queue in enumerate(queues)
+            },
+            "max_in_flight": self.max_in_flight,
+            "weight": self.weights.get(workspace_id, 1.0),
+        }
+
+    def reconcile(self, queues: List[Queue]) -> None:
+        """Return sub-queues that got jobs behind our back to the turn order
+
+        Retried jobs and scheduled jobs land in their sub-queue directly,
+        possibly after it left the ring. Also cleans the sub-queues'
+        registries, which workers only do for the shared queues.
+        """
+        try:
+            for queue in queues:
+                for sub_queue in sub_queues(self.redis, queue):
+                    clean_registries(sub_queue)
+                    if len(sub_queue):
+                        self.activate(sub_queue)
+        except Exception as e:
+            print(f"Redis fair queue reconcile error: {e}")
+
+    def start_reconciler(
+        self,
+        queues: List[Queue],
+        interval: float = settings.job_fair_reconcile_interval_seconds,
+    ) -> threading.Thread:
+        """Reconcile the turn order from a daemon thread every interval"""
+
+        def run():
+            while True:
+                self.reconcile(queues)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="fair-queue-reconciler", daemon=True)
+        thread.start()
+        return thread
+
+
+class FairWorker(Worker):
+    """Forking worker that takes jobs from workspace sub-queues in turn"""
+
+    def __init__(self, queues: List[Queue], fair_queues: FairQueues, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.fair_queues = fair_queues
+
+    def dequeue_job_and_maintain_ttl(
+        self, timeout: Optional[int], max_idle_time: Optional[int] = None
+    ):
+        self.set_state(WorkerStatus.IDLE)
+        self.procline("Listening on " + ",".join(self.queue_names()))
+        idle_since = time.monotonic()
+        while True:
+            try:
+                self.heartbeat()
+                if self.should_run_maintenance_tasks:
+                    self.run_maintenance_tasks()
+
+                result = self.fair_queues.dequeue(
+                    self.queues,
+                    self.job_class,
+                    self.serializer,
+                    self.death_penalty_class,
+                )
+                if result is not None:
+                    job, queue = result
+                    job.redis_server_version = self.get_redis_server_version()
+                    self.log.info("%s: %s", queue.name, job.id)
+                    self.heartbeat()
+                    return result
+
+                # Burst mode, or idle for too long
+                if timeout is None:
+                    return None
+                if (
+                    max_idle_time is not None
+                    and time.monotonic() - idle_since >= max_idle_time
+                ):
+                    return None
+                self.fair_queues.wait(1)
+            except redis.exceptions.ConnectionError as e:
+                self.log.error(
+                    "Could not connect to Redis instance: %s Retrying in 1 second...", e
+                )
+                time.sleep(1)
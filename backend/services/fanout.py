@@ -0,0 +1,90 @@
+"""
+Bounded parallel fan-out for multi-step LLM pipelines
+"""
+
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from config import settings
+from services.llm_governor import llm_governor
+
+T = TypeVar("T")
+
+
+class FanOutLimiter:
+    """Run independent sub-completions concurrently under global and per-workspace caps
+
+    A pipeline such as an email sequence is split into small completions that
+    run at the same time, so wall-clock time tracks the slowest step rather
+    than one large generation. The per-workspace cap keeps one tenant's fan-out
+    from taking every slot in the process.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.llm_fanout_max_concurrency,
+        workspace_concurrency: int = settings.llm_fanout_workspace_concurrency,
+        workspace_overrides: Optional[Dict[str, int]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.workspace_concurrency = workspace_concurrency
+        self.workspace_overrides = workspace_overrides or {}
+        # Semaphores bind to the loop they are first used on; each counts its users
+        self._loops: (
+            "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, List[Any]]]"
+        ) = weakref.WeakKeyDictionary()
+
+    def _acquire_semaphore(self, name: str, limit: int) -> asyncio.Semaphore:
+        semaphores = self._loops.setdefault(asyncio.get_running_loop(), {})
+        entry = semaphores.setdefault(name, [asyncio.Semaphore(limit), 0])
+        entry[1] += 1
+        return entry[0]
+
+    def _release_semaphore(self, name: str) -> None:
+        semaphores = self._loops.get(asyncio.get_running_loop(), {})
+        entry = semaphores.get(name)
+        if entry is not None:
+            entry[1] -= 1
+            # No run holds or waits on it: drop it so one-off workspaces do not pile up
+            if not entry[1]:
+                del semaphores[name]
+
+    def workspace_limit(self, workspace_id: str) -> int:
+        """Concurrency cap for a workspace"""
+        return self.workspace_overrides.get(workspace_id, self.workspace_concurrency)
+
+    async def run(
+        self,
+        tasks: Sequence[Callable[[], Awaitable[T]]],
+        workspace_id: Optional[str] = None,
+    ) -> List[T]:
+        """Run task factories concurrently and return their results in order"""
+        names = ["*"]
+        global_slots = self._acquire_semaphore("*", self.max_concurrency)
+        workspace_slots = None
+        if workspace_id:
+            names.append(f"workspace:{workspace_id}")
+            workspace_slots = self._acquire_semaphore(
+                names[-1], self.workspace_limit(workspace_id)
+            )
+
+        async def guarded(task: Callable[[], Awaitable[T]]) -> T:
+            # Take the workspace slot first so waiting tenants do not hold global slots
+            if workspace_slots is None:
+                async with global_slots:
+                    return await task()
+            with llm_governor.context(workspace_id=workspace_id):
+                async with workspace_slots:
+                    async with global_slots:
+                        return await task()
+
+        try:
+            return list(await asyncio.gather(*(guarded(task) for task in tasks)))
+        finally:
+            for name in names:
+                self._release_semaphore(name)
+
+
+# Global fan-out limiter instance
+fanout_limiter = FanOutLimiter()
@@ -0,0 +1,637 @@
+"""
+Local normalizer for prospect and niche research inputs, with LLM escalation
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services.llm_service import LLMService
+from services.llm_governor import llm_governor
+from services.redis_cache import RedisCache, cache
+
+# Canonical titles for common role spellings (keys are lowercased, punctuation stripped)
+ROLE_CANONICAL: Dict[str, str] = {
+    "ceo": "CEO",
+    "chief executive officer": "CEO",
+    "cto": "CTO",
+    "chief technology officer": "CTO",
+    "cmo": "CMO",
+    "chief marketing officer": "CMO",
+    "cfo": "CFO",
+    "chief financial officer": "CFO",
+    "coo": "COO",
+    "chief operating officer": "COO",
+    "cro": "CRO",
+    "chief revenue officer": "CRO",
+    "founder": "Founder",
+    "cofounder": "Co-Founder",
+    "co founder": "Co-Founder",
+    "founder ceo": "Founder & CEO",
+    "founder and ceo": "Founder & CEO",
+    "owner": "Owner",
+    "president": "President",
+    "vp marketing": "VP of Marketing",
+    "vp sales": "VP of Sales",
+    "vp growth": "VP of Growth",
+    "vp engineering": "VP of Engineering",
+    "vp eng": "VP of Engineering",
+    "vp product": "VP of Product",
+    "vp ops": "VP of Operations",
+    "vp operations": "VP of Operations",
+    "head of growth": "Head of Growth",
+    "head of marketing": "Head of Marketing",
+    "head of sales": "Head of Sales",
+    "marketing manager": "Marketing Manager",
+    "marketing mgr": "Marketing Manager",
+    "sales manager": "Sales Manager",
+    "growth marketer": "Growth Marketer",
+    "ecommerce manager": "E-commerce Manager",
+    "e commerce manager": "E-commerce Manager",
+}
+
+# Abbreviations expanded or upper-cased when a role is not in the table
+ROLE_WORDS: Dict[str, str] = {
+    "vp": "VP",
+    "svp": "SVP",
+    "evp": "EVP",
+    "avp": "AVP",
+    "sr": "Senior",
+    "jr": "Junior",
+    "mgr": "Manager",
+    "dir": "Director",
+    "eng": "Engineering",
+    "mktg": "Marketing",
+    "ops": "Operations",
+    "bizdev": "Business Development",
+    "bd": "Business Development",
+}
+
+# Common misspellings seen in prospect and niche inputs
+TYPO_FIXES: Dict[str, str] = {
+    "teh": "the",
+    "adn": "and",
+    "recieve": "receive",
+    "acheive": "achieve",
+    "buisness": "business",
+    "busines": "business",
+    "bussiness": "business",
+    "compnay": "company",
+    "comapny": "company",
+    "marketting": "marketing",
+    "markting": "marketing",
+    "managment": "management",
+    "manger": "manager",
+    "seperate": "separate",
+    "definately": "definitely",
+    "wich": "which",
+    "untill": "until",
+    "occured": "occurred",
+    "sucess": "success",
+    "sucessful": "successful",
+    "succesful": "successful",
+    "revenu": "revenue",
+    "reveune": "revenue",
+    "growht": "growth",
+    "grwoth": "growth",
+    "cusomer": "customer",
+    "custmer": "customer",
+    "costumer": "customer",
+    "retension": "retention",
+    "conversoin": "conversion",
+    "convertion": "conversion",
+    "effecient": "efficient",
+    "efficency": "efficiency",
+    "strategey": "strategy",
+    "stratagy": "strategy",
+    "experiance": "experience",
+    "acquistion": "acquisition",
+    "aquisition": "acquisition",
+    "generaton": "generation",
+    "begginer": "beginner",
+    "beginer": "beginner",
+    "intermidiate": "intermediate",
+    "advaced": "advanced",
+}
+
+# Words with a fixed spelling wherever they appear
+ACRONYMS: Dict[str, str] = {
+    word: word.upper()
+    for word in (
+        "ai",
+        "api",
+        "b2b",
+        "b2c",
+        "cac",
+        "crm",
+        "d2c",
+        "dtc",
+        "erp",
+        "hr",
+        "it",
+        "kpi",
+        "ltv",
+        "ml",
+        "ppc",
+        "roas",
+        "roi",
+        "seo",
+        "sms",
+        "ui",
+        "uk",
+        "ux",
+        "usa",
+    )
+}
+ACRONYMS.update(
+    {
+        "saas": "SaaS",
+        "paas": "PaaS",
+        "ecommerce": "E-commerce",
+        "linkedin": "LinkedIn",
+        "youtube": "YouTube",
+    }
+)
+
+# Acronyms that are also ordinary words, so they are left alone in sentences
+AMBIGUOUS_ACRONYMS = {"it"}
+
+COMPANY_SUFFIXES: Dict[str, str] = {
+    "inc": "Inc.",
+    "llc": "LLC",
+    "ltd": "Ltd.",
+    "corp": "Corp.",
+    "co": "Co.",
+    "gmbh": "GmbH",
+    "plc": "PLC",
+}
+
+# Lower-cased inside titles unless they start the title
+SMALL_WORDS = {
+    "a",
+    "an",
+    "and",
+    "as",
+    "at",
+    "but",
+    "by",
+    "for",
+    "in",
+    "of",
+    "on",
+    "or",
+    "the",
+    "to",
+    "via",
+    "with",
+}
+
+EXPERIENCE_LEVELS: Dict[str, str] = {
+    "beginner": "Beginner",
+    "novice": "Beginner",
+    "entry": "Beginner",
+    "entry level": "Beginner",
+    "new": "Beginner",
+    "none": "Beginner",
+    "intermediate": "Intermediate",
+    "mid": "Intermediate",
+    "mid level": "Intermediate",
+    "medium": "Intermediate",
+    "some": "Intermediate",
+    "advanced": "Advanced",
+    "expert": "Advanced",
+    "senior": "Advanced",
+    "pro": "Advanced",
+    "professional": "Advanced",
+}
+
+# Years of experience needed for each level, checked from the top
+EXPERIENCE_YEARS = ((5, "Advanced"), (2, "Intermediate"), (0, "Beginner"))
+
+PROSPECT_CLEANING_SYSTEM_PROMPT = (
+    "You are a professional business communication expert. "
+    "Clean and improve user input for cold email generation."
+)
+
+NICHE_CLEANING_SYSTEM_PROMPT = (
+    "You are a professional business consultant. "
+    "Clean and improve user input for niche research analysis."
+)
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z']*")
+_VOWELS = re.compile(r"[aeiouy]", re.IGNORECASE)
+_EXPERIENCE_SPAN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(?:\+|(?:-|to)\s*\d+(?:\.\d+)?)?\s*"
+    r"(years?|yrs?|months?|mos?)\b",
+    re.IGNORECASE,
+)
+
+
+def clean_whitespace(text: str) -> str:
+    """Collapse whitespace and tidy spacing around punctuation"""
+    text = re.sub(r"\s+", " ", (text or "").strip())
+    text = re.sub(r"\s+([,.;:!?])", r"\1", text)
+    text = re.sub(r"([,;:])(?=[^\s\d])", r"\1 ", text)
+    text = re.sub(r"([!?,;:])\1+", r"\1", text)
+    return text.strip(" ,;:")
+
+
+def fix_typos(text: str) -> str:
+    """Replace known misspellings, keeping a leading capital"""
+
+    def replace(match: re.Match) -> str:
+        word = match.group(0)
+        fixed = TYPO_FIXES.get(word.lower())
+        if not fixed:
+            return word
+        return fixed.capitalize() if word[0].isupper() else fixed
+
+    return _WORD.sub(replace, text)
+
+
+def fix_acronyms(text: str) -> str:
+    """Give acronyms and brand names their fixed spelling inside free text"""
+
+    def replace(match: re.Match) -> str:
+        word = match.group(0)
+        lower = word.lower()
+        if lower in AMBIGUOUS_ACRONYMS:
+            return word
+        return ACRONYMS.get(lower, word)
+
+    return re.sub(r"[A-Za-z0-9]+", replace, text)
+
+
+def _title_word(word: str, first: bool) -> str:
+    lower = word.lower()
+    if lower in ACRONYMS:
+        return ACRONYMS[lower]
+    if not first and lower in SMALL_WORDS:
+        return lower
+    # Deliberate mixed case such as "iPhone" or "McKinsey" is kept as typed
+    if word[1:] != word[1:].lower() and not word.isupper():
+        return word
+    return "-".join(part[:1].upper() + part[1:].lower() for part in word.split("-"))
+
+
+def title_case(text: str) -> str:
+    """Title-case a short phrase, respecting acronyms and small words"""
+    words = clean_whitespace(text).split(" ")
+    return " ".join(_title_word(word, i == 0) for i, word in enumerate(words) if word)
+
+
+def sentence_case(text: str) -> str:
+    """Fix typos and spacing and capitalize the first letter"""
+    text = fix_acronyms(fix_typos(clean_whitespace(text)))
+    if text and text[0].islower():
+        text = text[0].upper() + text[1:]
+    return text
+
+
+def normalize_name(name: str) -> str:
+    """Capitalize each part of a person's name, including O'Brien and Smith-Jones"""
+    parts = []
+    for word in clean_whitespace(name).split(" "):
+        if word[1:] != word[1:].lower() and not word.isupper():
+            parts.append(word)
+            continue
+        word = "-".join(part.capitalize() for part in word.lower().split("-"))
+        parts.append(re.sub(r"'([a-z])", lambda m: "'" + m.group(1).upper(), word))
+    return " ".join(part for part in parts if part)
+
+
+def normalize_company(company: str) -> str:
+    """Title-case a company name and canonicalize legal suffixes"""
+    words = title_case(fix_typos(company)).split(" ")
+    if len(words) > 1:
+        suffix = words[-1].lower().rstrip(".")
+        if suffix in COMPANY_SUFFIXES:
+            words[-1] = COMPANY_SUFFIXES[suffix]
+    return " ".join(words)
+
+
+def normalize_role(role: str) -> str:
+    """Canonicalize a job title, e.g. "vp marketing" -> "VP of Marketing" """
+    role = fix_typos(clean_whitespace(role))
+    lookup = re.sub(r"[^a-z0-9 ]", " ", role.lower())
+    lookup = re.sub(r"\s+", " ", lookup).strip()
+    if lookup in ROLE_CANONICAL:
+        return ROLE_CANONICAL[lookup]
+    words = [ROLE_WORDS.get(word.lower().rstrip("."), word) for word in role.split(" ")]
+    role = title_case(" ".join(words))
+    return re.sub(
+        r"^((?:Senior |Junior )?(?:(?:S|E|A)?VP|Head|Director))\s+(?!of\b|&)",
+        r"\1 of ",
+        role,
+    )
+
+
+def normalize_list(items: List[str], normalize=sentence_case) -> List[str]:
+    """Normalize list items, dropping blanks and case-insensitive duplicates"""
+    cleaned: List[str] = []
+    seen = set()
+    for item in items or []:
+        value = normalize(item)
+        if value and value.lower() not in seen:
+            seen.add(value.lower())
+            cleaned.append(value)
+    return cleaned
+
+
+def normalize_experience_level(level: str) -> str:
+    """Map free-form experience levels onto Beginner, Intermediate or Advanced
+
+    Spans such as "5 years" or "2-3 yrs" are judged by their lower bound.
+    """
+    span = _EXPERIENCE_SPAN.search(level or "")
+    if span:
+        years = float(span.group(1))
+        if span.group(2).lower().startswith("m"):
+            years /= 12
+        return next(name for least, name in EXPERIENCE_YEARS if years >= least)
+    lookup = re.sub(r"[^a-z ]", " ", fix_typos(level or "").lower())
+    lookup = re.sub(r"\s+", " ", lookup).strip()
+    return EXPERIENCE_LEVELS.get(lookup, title_case(lookup))
+
+
+def _unreadable(text: str) -> bool:
+    """Words without vowels usually mean keyboard mashing"""
+    return any(
+        len(word) >= 4 and not _VOWELS.search(word) and word.lower() not in ACRONYMS
+        for word in _WORD.findall(text)
+    )
+
+
+def prospect_quality_issues(cleaned: Dict[str, Any]) -> List[str]:
+    """Heuristic flags that the local clean-up is not good enough"""
+    issues = [
+        f"missing_{field}"
+        for field in ("prospect_name", "company", "role", "value_proposition")
+        if not cleaned[field]
+    ]
+    if not cleaned["pain_points"]:
+        issues.append("missing_pain_points")
+    if cleaned["value_proposition"] and len(cleaned["value_proposition"].split()) < 4:
+        issues.append("short_value_proposition")
+    text = " ".join(
+        [cleaned["role"], cleaned["value_proposition"], *cleaned["pain_points"]]
+    )
+    if _unreadable(text):
+        issues.append("unreadable_text")
+    return issues
+
+
+def niche_quality_issues(cleaned: Dict[str, Any]) -> List[str]:
+    """Heuristic flags that the local niche clean-up is not good enough"""
+    issues = [
+        f"missing_{field}" for field in ("skills", "interests") if not cleaned[field]
+    ]
+    if cleaned["experience_level"] not in ("Beginner", "Intermediate", "Advanced"):
+        issues.append("unknown_experience_level")
+    if _unreadable(" ".join(cleaned["skills"] + cleaned["interests"])):
+        issues.append("unreadable_text")
+    return issues
+
+
+class InputNormalizer:
+    """Clean request inputs locally and only ask the LLM when heuristics flag them
+
+    Escalated results are cached per workspace in a small local LRU in front
+    of Redis, so a workspace that keeps sending the same rough input pays for
+    the LLM clean-up once. Local entries expire with the Redis TTL, so a
+    change to the prompts or the model reaches every process in time.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[LLMService] = None,
+        redis_cache: RedisCache = cache,
+        escalation_enabled: bool = settings.input_llm_escalation_enabled,
+        cache_ttl: int = settings.input_cache_ttl_seconds,
+        max_entries: int = settings.input_cache_max_entries,
+    ):
+        self.llm = llm or LLMService()
+        self.redis = redis_cache
+        self.escalation_enabled = escalation_enabled
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "local": 0,
+            "cache_hits": 0,
+            "escalations": 0,
+            "escalation_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(kind: str, workspace_id: Optional[str], raw: Dict[str, Any]) -> str:
+        """Cache key for a raw input within a workspace"""
+        payload = json.dumps(raw, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        return f"input:clean:{workspace_id or 'global'}:{kind}:{digest}"
+
+    def normalize_prospect(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Local clean-up of cold email prospect fields"""
+        return {
+            "prospect_name": normalize_name(raw.get("prospect_name", "")),
+            "company": normalize_company(raw.get("company", "")),
+            "role": normalize_role(raw.get("role", "")),
+            "pain_points": normalize_list(raw.get("pain_points", [])),
+            "value_proposition": sentence_case(raw.get("value_proposition", "")),
+        }
+
+    def normalize_niche(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Local clean-up of niche research fields"""
+        return {
+            "skills": normalize_list(
+                raw.get("skills", []), lambda item: title_case(fix_typos(item))
+            ),
+            "interests": normalize_list(
+                raw.get("interests", []), lambda item: title_case(fix_typos(item))
+            ),
+            "experience_level": normalize_experience_level(
+                raw.get("experience_level", "")
+            ),
+        }
+
+    async def clean_prospect(
+        self, raw: Dict[str, Any], workspace_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Clean cold email prospect inputs"""
+        cleaned = self.normalize_prospect(raw)
+        issues = prospect_quality_issues(cleaned)
+        if not issues:
+            self.stats["local"] += 1
+            return cleaned
+
+        prompt = f"""
+        Please clean and improve the following prospect information for a professional
+        cold email:
+
+        Original Input:
+        - Name: {raw.get('prospect_name', '')}
+        - Company: {raw.get('company', '')}
+        - Role: {raw.get('role', '')}
+        - Pain Points: {', '.join(raw.get('pain_points', []))}
+        - Value Proposition: {raw.get('value_proposition', '')}
+
+        Detected problems: {', '.join(issues)}
+
+        Please provide cleaned and improved versions that:
+        1. Fix any spelling, grammar, or formatting errors
+        2. Make the language more professional and clear
+        3. Ensure proper capitalization and punctuation
+        4. Improve the value proposition to be more compelling
+        5. Make pain points more specific and actionable
+        6. Ensure the role is properly formatted
+           (e.g., "VP of Marketing" not "vp marketing")
+
+        Return the response in this exact JSON format:
+        {{
+            "prospect_name": "cleaned name",
+            "company": "cleaned company name",
+            "role": "cleaned role title",
+            "pain_points": ["cleaned pain point 1", "cleaned pain point 2"],
+            "value_proposition": "improved value proposition"
+        }}
+        """
+        return await self._escalate(
+            "prospect",
+            workspace_id,
+            raw,
+            cleaned,
+            PROSPECT_CLEANING_SYSTEM_PROMPT,
+            prompt,
+            500,
+        )
+
+    async def clean_niche(
+        self, raw: Dict[str, Any], workspace_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Clean niche research inputs"""
+        cleaned = self.normalize_niche(raw)
+        issues = niche_quality_issues(cleaned)
+        if not issues:
+            self.stats["local"] += 1
+            return cleaned
+
+        prompt = f"""
+        Please clean and improve the following niche research information:
+
+        Original Input:
+        - Skills: {', '.join(raw.get('skills', []))}
+        - Interests: {', '.join(raw.get('interests', []))}
+        - Experience Level: {raw.get('experience_level', '')}
+
+        Detected problems: {', '.join(issues)}
+
+        Please provide cleaned and improved versions that:
+        1. Fix any spelling, grammar, or formatting errors
+        2. Make the language more professional and clear
+        3. Ensure proper capitalization and punctuation
+        4. Make skills more specific and actionable
+        5. Make interests more focused and business-relevant
+        6. Standardize experience level (e.g., "Beginner", "Intermediate", "Advanced")
+
+        Return the response in this exact JSON format:
+        {{
+            "skills": ["cleaned skill 1", "cleaned skill 2"],
+            "interests": ["cleaned interest 1", "cleaned interest 2"],
+            "experience_level": "cleaned experience level"
+        }}
+        """
+        return await self._escalate(
+            "niche",
+            workspace_id,
+            raw,
+            cleaned,
+            NICHE_CLEANING_SYSTEM_PROMPT,
+            prompt,
+            400,
+        )
+
+    async def _escalate(
+        self,
+        kind: str,
+        workspace_id: Optional[str],
+        raw: Dict[str, Any],
+        cleaned: Dict[str, Any],
+        system_prompt: str,
+        prompt: str,
+        max_tokens: int,
+    ) -> Dict[str, Any]:
+        """Ask the LLM to clean flagged input, falling back to the local result"""
+        if not self.escalation_enabled:
+            self.stats["local"] += 1
+            return cleaned
+
+        key = self.make_key(kind, workspace_id, raw)
+        cached = self._get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        self.stats["escalations"] += 1
+        try:
+            with llm_governor.context(workspace_id=workspace_id):
+                content = await self.llm.chat(
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    template=f"clean_{kind}_input",
+                    tier="fast",
+                )
+            json_match = re.search(r"\{.*\}", content or "", re.DOTALL)
+            if not json_match:
+                raise ValueError("no JSON object in response")
+            improved = json.loads(json_match.group())
+            # Keep the local value for any field the model dropped
+            result = {
+                field: improved.get(field) or value for field, value in cleaned.items()
+            }
+        except Exception as e:
+            print(f"Error cleaning {kind} input: {e}")
+            self.stats["escalation_errors"] += 1
+            return cleaned
+
+        self._set(key, result)
+        return result
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._local.move_to_end(key)
+                    return value
+                del self._local[key]
+        value = self.redis.get(key)
+        if isinstance(value, dict):
+            self._store_local(key, value)
+            return value
+        return None
+
+    def _set(self, key: str, value: Dict[str, Any]) -> None:
+        self._store_local(key, value)
+        self.redis.set(key, value, self.cache_ttl)
+
+    def _store_local(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.cache_ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+# Global input normalizer instance
+input_normalizer = InputNormalizer()
@@ -0,0 +1,347 @@
+"""
+Declarative job pipelines: stages with dependencies, chained through Redis
+"""
+
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+# Placeholder for a parent stage's result, resolved when the stage runs
+PIPELINE_REF = "__pipeline_ref__"
+
+STAGE_SUCCEEDED = "succeeded"
+STAGE_FAILED = "failed"
+STAGE_SKIPPED = "skipped"
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _lookup(value: Any, path: Optional[str]) -> Any:
+    """Follow a dotted path into a result; None when it is missing"""
+    for part in path.split(".") if path else []:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _refs(value: Any) -> List[Tuple[str, str, Optional[str]]]:
+    """(pipeline id, stage, path) of every reference inside stage arguments"""
+    if isinstance(value, dict):
+        if PIPELINE_REF in value:
+            pipeline_id, _, stage = value[PIPELINE_REF].partition(":")
+            return [(pipeline_id, stage, value.get("path"))]
+        return [ref for item in value.values() for ref in _refs(item)]
+    if isinstance(value, (list, tuple)):
+        return [ref for item in value for ref in _refs(item)]
+    return []
+
+
+def _substitute(value: Any, results: Dict[Tuple[str, str], Any]) -> Any:
+    if isinstance(value, dict):
+        if PIPELINE_REF in value:
+            pipeline_id, _, stage = value[PIPELINE_REF].partition(":")
+            return _lookup(results.get((pipeline_id, stage)), value.get("path"))
+        return {key: _substitute(item, results) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_substitute(item, results) for item in value)
+    return value
+
+
+class JobPipeline:
+    """A set of job stages where each stage starts once its parents finish
+
+    Stages name the stages they run ``after`` and may take parts of their
+    results through ``ref``; the references are resolved from Redis when
+    the stage runs, so results are never copied into job payloads. A stage
+    whose parent failed or was skipped, or whose ``when`` conditions on
+    parent results do not hold, is skipped along with its dependents.
+
+        pipeline = job_service.pipeline("inbound_reply", workspace_id)
+        pipeline.stage("ingest", ingest_email, workspace_id, email_data)
+        pipeline.stage(
+            "reply", sdr_reply, workspace_id,
+            pipeline.ref("ingest", "thread_id"), pipeline.ref("ingest", "intent"),
+            after=["ingest"], when={"ingest.intent.reply_type": "positive"},
+        )
+        pipeline_id = pipeline.enqueue()
+    """
+
+    def __init__(
+        self,
+        service,
+        store: "PipelineStore",
+        name: str,
+        workspace_id: Optional[str] = None,
+    ):
+        self.service = service
+        self.store = store
+        self.name = name
+        self.workspace_id = workspace_id
+        self.id = str(uuid.uuid4())
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.job_ids: Dict[str, str] = {}
+
+    def ref(self, stage: str, path: Optional[str] = None) -> Dict[str, Any]:
+        """Reference to a parent stage's result, or a dotted path into it"""
+        if stage not in self.stages:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        return {PIPELINE_REF: f"{self.id}:{stage}", "path": path}
+
+    def stage(
+        self,
+        name: str,
+        func: Callable,
+        *args,
+        after: Optional[List[str]] = None,
+        when: Optional[Dict[str, Any]] = None,
+        queue_name: Optional[str] = None,
+        timeout: Optional[int] = None,
+        retry: Optional[int] = None,
+        **kwargs,
+    ) -> str:
+        """Add a stage calling a job function; options default to its @job options"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        parents = list(after or [])
+        referenced = {stage for _, stage, _ in _refs([args, kwargs])}
+        conditioned = {key.partition(".")[0] for key in (when or {})}
+        for parent in set(parents) | referenced | conditioned:
+            if parent not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage: {parent}")
+        if not referenced | conditioned <= set(parents):
+            raise ValueError(
+                f"Stage {name} uses results of stages it does not run after"
+            )
+
+        options = getattr(func, "job_options", {})
+        self.stages[name] = {
+            "name": name,
+            "type": getattr(func, "__name__", name),
+            "func": f"{func.__module__}.{func.__name__}",
+            "args": list(args),
+            "kwargs": kwargs,
+            "parents": parents,
+            "children": [],
+            "when": when or {},
+            "queue_name": queue_name or options.get("queue_name", "default"),
+            "timeout": timeout or options.get("timeout", 300),
+            "retry": retry if retry is not None else options.get("retry", 3),
+        }
+        for parent in parents:
+            self.stages[parent]["children"].append(name)
+        return name
+
+    def enqueue(self) -> Optional[str]:
+        """Store the pipeline and enqueue its root stages; None when Redis is down"""
+        if not self.stages:
+            raise ValueError("Pipeline has no stages")
+        if not self.store.create(self):
+            return None
+        for spec in self.stages.values():
+            if not spec["parents"]:
+                job_id = self.service.enqueue_stage(self.id, self.workspace_id, spec)
+                if job_id:
+                    self.job_ids[spec["name"]] = job_id
+        return self.id
+
+
+class PipelineStore:
+    """Pipeline specs, stage outcomes and results in one Redis hash per pipeline
+
+    Finishing a stage is claimed with HSETNX, so a stage that runs twice
+    only releases its dependents once, and each dependent counts down its
+    unfinished parents with HINCRBY. The parent whose decrement reaches
+    zero enqueues the child, straight from the worker that ran it.
+    """
+
+    def __init__(
+        self,
+        redis,
+        prefix: str = "job:pipeline",
+        ttl: int = settings.job_pipeline_ttl_seconds,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, pipeline_id: str) -> str:
+        return f"{self.prefix}:{pipeline_id}"
+
+    def create(self, pipeline: JobPipeline) -> bool:
+        fields = {
+            "name": pipeline.name,
+            "workspace_id": pipeline.workspace_id or "",
+            "status": "running",
+            "created_at": datetime.utcnow().isoformat(),
+            "stages": len(pipeline.stages),
+            "done": 0,
+            "failed": 0,
+        }
+        for name, spec in pipeline.stages.items():
+            fields[f"spec:{name}"] = json.dumps(spec, default=str)
+            fields[f"waiting:{name}"] = len(spec["parents"])
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(self._key(pipeline.id), mapping=fields)
+            pipe.expire(self._key(pipeline.id), self.ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis pipeline create error: {e}")
+            return False
+
+    def workspace_id(self, pipeline_id: str) -> Optional[str]:
+        try:
+            return (
+                _text(self.redis.hget(self._key(pipeline_id), "workspace_id")) or None
+            )
+        except Exception as e:
+            print(f"Redis pipeline read error: {e}")
+            return None
+
+    def stage_enqueued(self, pipeline_id: str, stage: str, job_id: str) -> None:
+        try:
+            self.redis.hset(self._key(pipeline_id), mapping={f"job:{stage}": job_id})
+        except Exception as e:
+            print(f"Redis pipeline update error: {e}")
+
+    def finish_stage(
+        self, pipeline_id: str, stage: str, status: str, result: Any = None
+    ) -> List[Dict[str, Any]]:
+        """Record a stage's outcome; returns the specs of dependents now ready"""
+        key = self._key(pipeline_id)
+        try:
+            if not self.redis.hsetnx(key, f"status:{stage}", status):
+                return []
+            spec = json.loads(_text(self.redis.hget(key, f"spec:{stage}")))
+
+            pipe = self.redis.pipeline(transaction=True)
+            if status == STAGE_SUCCEEDED:
+                pipe.hset(
+                    key, mapping={f"result:{stage}": json.dumps(result, default=str)}
+                )
+            pipe.hincrby(key, "failed", int(status == STAGE_FAILED))
+            pipe.hincrby(key, "done", 1)
+            for child in spec["children"]:
+                pipe.hincrby(key, f"waiting:{child}", -1)
+            replies = pipe.execute()[-len(spec["children"]) - 1 :]
+        except Exception as e:
+            print(f"Redis pipeline stage error: {e}")
+            return []
+
+        done, waiting = int(replies[0]), replies[1:]
+        self._maybe_finish(key, done)
+
+        ready = []
+        for child, left in zip(spec["children"], waiting):
+            if int(left) != 0:
+                continue
+            child_spec = self._runnable(key, child)
+            if child_spec is None:
+                ready.extend(self.finish_stage(pipeline_id, child, STAGE_SKIPPED))
+            else:
+                ready.append(child_spec)
+        return ready
+
+    def _runnable(self, key: str, stage: str) -> Optional[Dict[str, Any]]:
+        """A ready stage's spec, or None when a parent failed or a condition fails"""
+        spec = json.loads(_text(self.redis.hget(key, f"spec:{stage}")))
+        parents = spec["parents"]
+        statuses = (
+            self.redis.hmget(key, [f"status:{parent}" for parent in parents])
+            if parents
+            else []
+        )
+        if any(_text(status) != STAGE_SUCCEEDED for status in statuses):
+            return None
+        if spec["when"]:
+            results = self._results(
+                key, list({condition.partition(".")[0] for condition in spec["when"]})
+            )
+            for condition, expected in spec["when"].items():
+                parent, _, path = condition.partition(".")
+                if _lookup(results.get(parent), path) != expected:
+                    return None
+        return spec
+
+    def _results(self, key: str, stages: List[str]) -> Dict[str, Any]:
+        values = self.redis.hmget(key, [f"result:{stage}" for stage in stages])
+        return {
+            stage: json.loads(_text(value))
+            for stage, value in zip(stages, values)
+            if value is not None
+        }
+
+    def _maybe_finish(self, key: str, done: int) -> None:
+        """Settle the pipeline's status once its last stage is done"""
+        stages, failed = self.redis.hmget(key, ["stages", "failed"])
+        if done < int(stages or 0):
+            return
+        self.redis.hset(
+            key,
+            mapping={
+                "status": STAGE_FAILED if int(failed or 0) else STAGE_SUCCEEDED,
+                "finished_at": datetime.utcnow().isoformat(),
+            },
+        )
+
+    def resolve(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict]:
+        """Replace result references in a stage's arguments with the parents' results"""
+        refs = {(pipeline_id, stage) for pipeline_id, stage, _ in _refs([args, kwargs])}
+        if not refs:
+            return args, kwargs
+        results = {}
+        for pipeline_id, stage in refs:
+            results[(pipeline_id, stage)] = self._results(
+                self._key(pipeline_id), [stage]
+            ).get(stage)
+        return tuple(_substitute(list(args), results)), _substitute(kwargs, results)
+
+    def get(self, pipeline_id: str) -> Optional[Dict[str, Any]]:
+        """Pipeline status, overall latency and each stage's outcome and job"""
+        try:
+            fields = {
+                _text(name): _text(value)
+                for name, value in self.redis.hgetall(self._key(pipeline_id)).items()
+            }
+        except Exception as e:
+            print(f"Redis pipeline read error: {e}")
+            return None
+        if "name" not in fields:
+            return None
+
+        created_at = datetime.fromisoformat(fields["created_at"])
+        finished_at = (
+            datetime.fromisoformat(fields["finished_at"])
+            if fields.get("finished_at")
+            else None
+        )
+        stages = {}
+        for field in fields:
+            if field.startswith("spec:"):
+                stage = field[len("spec:") :]
+                stages[stage] = {
+                    "status": fields.get(f"status:{stage}")
+                    or ("enqueued" if f"job:{stage}" in fields else "waiting"),
+                    "job_id": fields.get(f"job:{stage}"),
+                }
+        return {
+            "id": pipeline_id,
+            "name": fields["name"],
+            "workspace_id": fields["workspace_id"] or None,
+            "status": fields["status"],
+            "created_at": fields["created_at"],
+            "finished_at": fields.get("finished_at"),
+            "latency_seconds": (
+                (finished_at or datetime.utcnow()) - created_at
+            ).total_seconds(),
+            "stages": stages,
+        }
@@ -0,0 +1,164 @@
+"""
+Per-job execution profiles: where a job's wall time goes
+"""
+
+import contextvars
+import resource
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Fields of a profile; times in milliseconds, peak memory growth in kilobytes
+PROFILE_FIELDS = (
+    "wall_ms",
+    "cpu_ms",
+    "own_ms",
+    "rss_kb",
+    "db_queries",
+    "db_ms",
+    "redis_calls",
+    "llm_calls",
+    "llm_tokens",
+    "llm_ms",
+)
+
+_profile: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "job_profile", default=None
+)
+
+
+def add(name: str, amount: float) -> None:
+    """Add to a counter of the job profiled in this context, if any"""
+    profile = _profile.get()
+    if profile is not None:
+        profile[name] += amount
+
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def profile_job() -> Iterator[Dict[str, float]]:
+    """Profile the block; the yielded dict holds the rounded profile once it exits
+
+    CPU time is the thread's, so jobs sharing an async worker do not count
+    each other. LLM time is time spent waiting on the model (or its cache),
+    and ``own_ms`` is what is left after database and LLM time.
+    """
+    profile = {name: 0.0 for name in PROFILE_FIELDS}
+    token = _profile.set(profile)
+    wall, cpu, rss = time.perf_counter(), time.thread_time(), _peak_rss_kb()
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+        profile["wall_ms"] = (time.perf_counter() - wall) * 1000
+        profile["cpu_ms"] = (time.thread_time() - cpu) * 1000
+        profile["rss_kb"] = _peak_rss_kb() - rss
+        profile["own_ms"] = max(
+            0.0, profile["wall_ms"] - profile["db_ms"] - profile["llm_ms"]
+        )
+        for name in PROFILE_FIELDS:
+            profile[name] = int(round(profile[name]))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile.get() is not None:
+        conn.info.setdefault("job_profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("job_profile_started")
+    if started and _profile.get() is not None:
+        add("db_queries", 1)
+        add("db_ms", (time.perf_counter() - started.pop()) * 1000)
+
+
+class _ProfiledConnection:
+    """Counts round trips: single commands and whole pipelines alike"""
+
+    def send_packed_command(self, command, check_health=True):
+        add("redis_calls", 1)
+        return super().send_packed_command(command, check_health)
+
+
+def instrument_redis(client):
+    """Count a sync Redis client's round trips in job profiles; returns the client"""
+    pool = client.connection_pool
+    base = pool.connection_class
+    if not issubclass(base, _ProfiledConnection):
+        pool.connection_class = type(
+            f"Profiled{base.__name__}", (_ProfiledConnection, base), {}
+        )
+    return client
+
+
+class ProfileStats:
+    """Profile totals per job type in Redis, one hash per type"""
+
+    def __init__(self, redis, prefix: str = "job:profile"):
+        self.redis = redis
+        self.prefix = prefix
+        self.types_key = f"{prefix}:types"
+
+    def _key(self, job_type: str) -> str:
+        return f"{self.prefix}:{job_type}"
+
+    def record(self, job_type: str, profile: Dict[str, int]) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(self.types_key, job_type)
+            pipe.hincrby(self._key(job_type), "jobs", 1)
+            for name in PROFILE_FIELDS:
+                if profile.get(name):
+                    pipe.hincrby(self._key(job_type), name, profile[name])
+            pipe.execute()
+        except Exception as e:
+            print(f"Redis job profile error: {e}")
+
+    def summary(
+        self, job_types: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Average profile per job type and its share of wall time per kind of work"""
+        try:
+            if job_types is None:
+                job_types = sorted(
+                    value.decode() if isinstance(value, bytes) else value
+                    for value in self.redis.smembers(self.types_key)
+                )
+            pipe = self.redis.pipeline(transaction=False)
+            for job_type in job_types:
+                pipe.hgetall(self._key(job_type))
+            totals = pipe.execute()
+        except Exception as e:
+            print(f"Redis job profile read error: {e}")
+            return {}
+
+        summary = {}
+        for job_type, raw in zip(job_types, totals):
+            fields = {
+                (name.decode() if isinstance(name, bytes) else name): int(value)
+                for name, value in raw.items()
+            }
+            jobs = fields.get("jobs", 0)
+            if not jobs:
+                continue
+            wall = fields.get("wall_ms", 0)
+            shares = {
+                "model": fields.get("llm_ms", 0) / wall if wall else 0.0,
+                "database": fields.get("db_ms", 0) / wall if wall else 0.0,
+                "code": fields.get("own_ms", 0) / wall if wall else 0.0,
+            }
+            summary[job_type] = {
+                "jobs": jobs,
+                "avg": {name: fields.get(name, 0) / jobs for name in PROFILE_FIELDS},
+                "share": {name: round(share, 3) for name, share in shares.items()},
+                "bound_by": max(shares, key=shares.get) if wall else None,
+            }
+        return summary
@@ -3,28 +3,99 @@ Job orchestration service using RQ (Redis Queue)
 """
 
 import json
+import base64
 import hashlib
+import importlib
+import inspect
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Callable
-from rq import Queue, Worker
-from rq.job import Job
-from rq_scheduler import Scheduler
+import time
+import uuid
+import zlib
+from functools import wraps
+from typing import Any, Dict, List, Optional, Callable, Tuple
+from rq import Queue, Worker, get_current_job
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus as RQJobStatus
 from config import settings
 from services.redis_cache import cache
-from database import Job as JobModel, JobStatus, get_db
-from sqlalchemy.orm import Session
+from services.llm_governor import QUEUE_PRIORITIES, llm_governor
+from services.llm_telemetry import llm_telemetry
+from services.job_state import TERMINAL_STATUSES, TIMING_FIELDS, JobStateStore
+from services.queue_stats import QueueStats
+from services.fair_queue import FairQueues, base_queue_name
+from services.retry_policy import RetryPolicies, RetryPolicy, RetryScheduler
+from services.timing_wheel import TimingWheel
+from services.job_profile import ProfileStats, instrument_redis, profile_job
+from services.job_pipeline import (
+    STAGE_FAILED,
+    STAGE_SUCCEEDED,
+    JobPipeline,
+    PipelineStore,
+)
+from database import DeadLetterJob, Job as JobModel, JobStatus, get_db
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
 
 # Initialize Redis connection
 import redis
-redis_conn = redis.from_url(settings.redis_url)
+redis_conn = instrument_redis(redis.from_url(settings.redis_url))
+
+# Write-behind job status tracking
+job_state = JobStateStore(redis_conn)
+
+# Incremental queue counters and throughput
+queue_stats = QueueStats(redis_conn)
+
+# Per-workspace sub-queues, dequeued in turn
+fair_queues = FairQueues(redis_conn)
+
+# Pipeline specs and stage results
+job_pipelines = PipelineStore(redis_conn)
+
+# Failed jobs waiting out their retry backoff
+job_retries = RetryScheduler(redis_conn)
 
 # Create queues
 default_queue = Queue('default', connection=redis_conn)
 high_queue = Queue('high', connection=redis_conn)
 low_queue = Queue('low', connection=redis_conn)
 
-# Create scheduler
-scheduler = Scheduler(connection=redis_conn)
+# Execution profile totals per job type
+job_profiles = ProfileStats(redis_conn)
+
+# Delayed jobs, such as sequence steps, wait in the timing wheel
+delayed_jobs = TimingWheel(redis_conn)
+
+
+def import_job(func_path: str) -> Callable:
+    """Object at a job's import path; the enqueueing wrapper for decorated jobs"""
+    module_name, _, name = func_path.rpartition(".")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def resolve_job_func(func_path: str) -> Callable:
+    """Job function for an import path"""
+    func = import_job(func_path)
+    # Decorated jobs resolve to their enqueueing wrapper
+    return getattr(func, "__wrapped__", func)
+
+
+def execute_job(
+    job_id: str,
+    func_path: str,
+    args: tuple,
+    kwargs: dict,
+    pipeline_stage: Optional[Tuple[str, str]] = None,
+):
+    """RQ entry point: resolve the job function by import path and run it"""
+    return job_service._execute_job(
+        job_id, resolve_job_func(func_path), args, kwargs, pipeline_stage
+    )
+
+
+def job_func_path(func: Callable) -> str:
+    return f"{func.__module__}.{func.__name__}"
 
 class JobService:
     def __init__(self):
@@ -33,10 +104,22 @@ class JobService:
             'high': high_queue,
             'low': low_queue
         }
+        self.retry_policies = RetryPolicies()
     
-    def job(self, queue_name: str = "default", timeout: int = 300, retry: int = 3):
-        """Decorator to register a function as a job"""
+    def job(
+        self,
+        queue_name: str = "default",
+        timeout: int = 300,
+        retry: int = 3,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """Decorator to register a job, with ``retry`` retries or a full retry policy"""
         def decorator(func: Callable):
+            self.retry_policies.register(
+                func.__name__, retry_policy or RetryPolicy(max_retries=retry)
+            )
+
+            @wraps(func)
             def wrapper(*args, **kwargs):
                 return self.enqueue_job(
                     func.__name__,
@@ -47,9 +130,46 @@ class JobService:
                     timeout,
                     retry
                 )
+
+            def enqueue_many(
+                calls: List[Tuple[tuple, dict]],
+                workspace_id: Optional[str] = None,
+                delay: Optional[timedelta] = None,
+                cancel_keys: Optional[List[Optional[str]]] = None,
+            ) -> List[Optional[str]]:
+                return self.enqueue_many(
+                    func.__name__,
+                    func,
+                    calls,
+                    queue_name,
+                    timeout,
+                    retry,
+                    workspace_id,
+                    delay,
+                    cancel_keys,
+                )
+
+            wrapper.enqueue_many = enqueue_many
+            wrapper.delay = wrapper
+            wrapper.job_options = {
+                "queue_name": queue_name,
+                "timeout": timeout,
+                "retry": retry,
+            }
             return wrapper
         return decorator
     
+    @staticmethod
+    def _dedupe_key(
+        func: Callable, args: tuple, kwargs: dict, scope: Optional[str] = None
+    ) -> str:
+        """Idempotency key for a call, optionally within a scope such as a pipeline"""
+        payload = {"func": func.__name__, "args": args, "kwargs": kwargs}
+        if scope:
+            payload["scope"] = scope
+        payload_str = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.md5(payload_str.encode()).hexdigest()
+
     def enqueue_job(
         self,
         job_type: str,
@@ -60,78 +180,105 @@ class JobService:
         timeout: int = 300,
         retry: int = 3,
         workspace_id: Optional[str] = None,
-        delay: Optional[timedelta] = None
+        delay: Optional[timedelta] = None,
+        pipeline_stage: Optional[Tuple[str, str]] = None,
+        cancel_key: Optional[str] = None,
     ) -> str:
-        """Enqueue a job"""
-        # Create dedupe key for idempotency
-        payload_str = json.dumps({
-            "func": func.__name__,
-            "args": args,
-            "kwargs": kwargs
-        }, sort_keys=True)
-        dedupe_key = hashlib.md5(payload_str.encode()).hexdigest()
+        """Enqueue a job; delayed jobs sharing a ``cancel_key`` cancel together"""
+        # Create dedupe key for idempotency; pipeline stages dedupe per pipeline
+        dedupe_key = self._dedupe_key(
+            func, args, kwargs, pipeline_stage[0] if pipeline_stage else None
+        )
         
-        # Check if job already exists
+        # Check if job already exists, claiming the key in Redis first
+        job_id = str(uuid.uuid4())
         if workspace_id:
-            existing_job = self.get_job_by_dedupe_key(dedupe_key, workspace_id)
-            if existing_job and existing_job.status in [JobStatus.QUEUED, JobStatus.RUNNING]:
-                return str(existing_job.id)
+            owners = self.claim_dedupe_keys(workspace_id, {dedupe_key: job_id})
+            if owners is None:
+                existing_job = self.get_job_by_dedupe_key(dedupe_key, workspace_id)
+                if existing_job:
+                    return str(existing_job.id)
+            elif owners[dedupe_key] != job_id:
+                return owners[dedupe_key]
         
         # Create job record in database
-        db = next(get_db())
+        created_at = datetime.utcnow()
+        record = {
+            "id": job_id,
+            "workspace_id": workspace_id or "system",
+            "type": job_type,
+            "payload_json": {
+                "func": func.__name__,
+                "args": args,
+                "kwargs": kwargs,
+                "dedupe_key": dedupe_key,
+            },
+            "dedupe_key": dedupe_key if workspace_id else None,
+            "status": JobStatus.QUEUED,
+            "attempts": 0,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        if pipeline_stage:
+            record["payload_json"]["pipeline"] = {
+                "id": pipeline_stage[0],
+                "stage": pipeline_stage[1],
+            }
         try:
-            job_record = JobModel(
-                workspace_id=workspace_id or "system",
-                type=job_type,
-                payload_json={
-                    "func": func.__name__,
-                    "args": args,
-                    "kwargs": kwargs,
-                    "dedupe_key": dedupe_key
-                },
-                status=JobStatus.QUEUED,
-                attempts=0
-            )
-            db.add(job_record)
-            db.commit()
-            db.refresh(job_record)
-            job_id = str(job_record.id)
+            existing, _ = self._insert_jobs([record], workspace_id)
         except Exception as e:
-            db.rollback()
             print(f"Error creating job record: {e}")
+            if workspace_id:
+                self.release_dedupe_keys(workspace_id, {dedupe_key: job_id})
             return None
-        finally:
-            db.close()
+        if existing:
+            return existing[dedupe_key]
+
+        job_state.track([record])
         
         # Enqueue in Redis
         try:
-            queue = self.queues.get(queue_name, default_queue)
+            base_queue = self.queues.get(queue_name, default_queue)
+            queue = fair_queues.queue_for(base_queue, workspace_id)
             
             if delay:
                 # Schedule for later
-                scheduler.enqueue_in(
-                    delay,
-                    self._execute_job,
-                    job_id,
-                    func,
-                    args,
-                    kwargs,
-                    timeout=timeout,
-                    job_timeout=timeout,
-                    retry=retry
-                )
+                with redis_conn.pipeline() as pipe:
+                    queue.create_job(
+                        execute_job,
+                        args=(
+                            job_id,
+                            job_func_path(func),
+                            args,
+                            kwargs,
+                            pipeline_stage,
+                        ),
+                        timeout=timeout,
+                        job_id=job_id,
+                        meta={"max_retries": retry},
+                        status=RQJobStatus.SCHEDULED,
+                    ).save(pipeline=pipe)
+                    delayed_jobs.schedule(
+                        {job_id: self._cancel_group(workspace_id, cancel_key)},
+                        time.time() + delay.total_seconds(),
+                        pipeline=pipe,
+                    )
+                    pipe.execute()
             else:
                 # Execute immediately
                 queue.enqueue(
-                    self._execute_job,
+                    execute_job,
                     job_id,
-                    func,
+                    job_func_path(func),
                     args,
                     kwargs,
-                    timeout=timeout,
+                    pipeline_stage,
                     job_timeout=timeout,
-                    retry=retry
+                    job_id=job_id,
+                    meta={"max_retries": retry},
                 )
+                fair_queues.activate(queue)
+                queue_stats.enqueued(base_queue.name, job_type)
             
             return job_id
         except Exception as e:
@@ -140,103 +287,981 @@ class JobService:
             self.update_job_status(job_id, JobStatus.FAILED, str(e))
             return None
     
-    def _execute_job(self, job_id: str, func: Callable, args: tuple, kwargs: dict):
+    def enqueue_many(
+        self,
+        job_type: str,
+        func: Callable,
+        calls: List[Tuple[tuple, dict]],
+        queue_name: str = "default",
+        timeout: int = 300,
+        retry: int = 3,
+        workspace_id: Optional[str] = None,
+        delay: Optional[timedelta] = None,
+        cancel_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[Optional[str]]:
+        """Enqueue many calls of one job function in bulk
+
+        Calls are deduped against each other and, with a workspace, against
+        its queued or running jobs in one query. New job rows are inserted
+        in a single transaction and the RQ jobs are pushed through Redis
+        pipelines. Delayed calls go to the timing wheel, each under its
+        ``cancel_keys`` entry. Returns a job id per call, in order; None when
+        the batch could not be persisted.
+        """
+        dedupe_keys = [self._dedupe_key(func, args, kwargs) for args, kwargs in calls]
+        claims = {
+            dedupe_key: str(uuid.uuid4()) for dedupe_key in dict.fromkeys(dedupe_keys)
+        }
+        job_ids = dict(claims)
+        if workspace_id:
+            owners = self.claim_dedupe_keys(workspace_id, claims)
+            if owners is None:
+                owners = self.get_active_jobs_by_dedupe_keys(list(claims), workspace_id)
+            job_ids.update(owners)
+
+        payloads = dict(zip(dedupe_keys, calls))
+        groups = dict(
+            zip(
+                dedupe_keys,
+                [
+                    self._cancel_group(workspace_id, key)
+                    for key in cancel_keys or [None] * len(calls)
+                ],
+            )
+        )
+        created_at = datetime.utcnow()
+        new_jobs = [
+            {
+                "id": job_id,
+                "workspace_id": workspace_id or "system",
+                "type": job_type,
+                "payload_json": {
+                    "func": func.__name__,
+                    "args": payloads[dedupe_key][0],
+                    "kwargs": payloads[dedupe_key][1],
+                    "dedupe_key": dedupe_key,
+                },
+                "dedupe_key": dedupe_key if workspace_id else None,
+                "status": JobStatus.QUEUED,
+                "attempts": 0,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            for dedupe_key, job_id in claims.items()
+            if job_ids[dedupe_key] == job_id
+        ]
+
+        if new_jobs:
+            # Create all job records in one transaction
+            try:
+                existing, new_jobs = self._insert_jobs(new_jobs, workspace_id)
+            except Exception as e:
+                print(f"Error creating job records: {e}")
+                if workspace_id:
+                    self.release_dedupe_keys(workspace_id, claims)
+                return [None] * len(calls)
+            job_ids.update(existing)
+
+            # Enqueue in Redis, one pipeline per batch
+            base_queue = self.queues.get(queue_name, default_queue)
+            queue = fair_queues.queue_for(base_queue, workspace_id)
+            func_path = job_func_path(func)
+            batch_size = settings.job_enqueue_batch_size
+            enqueued = 0
+            try:
+                for start in range(0, len(new_jobs), batch_size):
+                    records = new_jobs[start : start + batch_size]
+                    batch = [
+                        (
+                            record["id"],
+                            (
+                                record["id"],
+                                func_path,
+                                record["payload_json"]["args"],
+                                record["payload_json"]["kwargs"],
+                            ),
+                        )
+                        for record in records
+                    ]
+                    with redis_conn.pipeline() as pipe:
+                        job_state.track(records, pipeline=pipe)
+                        if delay:
+                            for job_id, job_args in batch:
+                                queue.create_job(
+                                    execute_job,
+                                    args=job_args,
+                                    timeout=timeout,
+                                    job_id=job_id,
+                                    meta={"max_retries": retry},
+                                    status=RQJobStatus.SCHEDULED,
+                                ).save(pipeline=pipe)
+                            delayed_jobs.schedule(
+                                {
+                                    record["id"]: groups[
+                                        record["payload_json"]["dedupe_key"]
+                                    ]
+                                    for record in records
+                                },
+                                time.time() + delay.total_seconds(),
+                                pipeline=pipe,
+                            )
+                        else:
+                            queue.enqueue_many(
+                                [
+                                    Queue.prepare_data(
+                                        execute_job,
+                                        args=job_args,
+                                        timeout=timeout,
+                                        job_id=job_id,
+                                        meta={"max_retries": retry},
+                                    )
+                                    for job_id, job_args in batch
+                                ],
+                                pipeline=pipe,
+                            )
+                            fair_queues.activate(queue, pipeline=pipe)
+                            queue_stats.enqueued(
+                                base_queue.name, job_type, len(batch), pipeline=pipe
+                            )
+                        pipe.execute()
+                    enqueued += len(batch)
+            except Exception as e:
+                print(f"Error enqueueing jobs: {e}")
+                self.fail_jobs([record["id"] for record in new_jobs[enqueued:]], str(e))
+                failed = {
+                    record["payload_json"]["dedupe_key"]
+                    for record in new_jobs[enqueued:]
+                }
+                if workspace_id:
+                    self.release_dedupe_keys(
+                        workspace_id, {key: job_ids[key] for key in failed}
+                    )
+                return [None if key in failed else job_ids[key] for key in dedupe_keys]
+
+        return [job_ids[key] for key in dedupe_keys]
+
+    def _insert_jobs(
+        self, records: List[Dict[str, Any]], workspace_id: Optional[str]
+    ) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """Insert job rows in one transaction
+
+        Rows whose dedupe key is held by an active job the Redis claims did
+        not know about are dropped and retried without them. Returns those
+        owning job ids by dedupe key, and the rows actually inserted.
+        """
+        existing: Dict[str, str] = {}
+        for _ in range(3):
+            if not records:
+                return existing, records
+            db = next(get_db())
+            try:
+                db.execute(insert(JobModel), records)
+                db.commit()
+                return existing, records
+            except IntegrityError:
+                db.rollback()
+                if not workspace_id:
+                    raise
+                found = self.get_active_jobs_by_dedupe_keys(
+                    [record["dedupe_key"] for record in records], workspace_id
+                )
+                if not found:
+                    raise
+                # Jobs finished in Redis but not yet in the table free their key
+                states = job_state.get_many(list(found.values()))
+                finished = [
+                    job_id
+                    for job_id in found.values()
+                    if states.get(job_id, {}).get("status")
+                    in {status.value for status in TERMINAL_STATUSES}
+                ]
+                job_state.flush_jobs(finished)
+                found = {
+                    key: job_id
+                    for key, job_id in found.items()
+                    if job_id not in finished
+                }
+                self.remember_dedupe_keys(workspace_id, found)
+                existing.update(found)
+                records = [
+                    record for record in records if record["dedupe_key"] not in existing
+                ]
+            finally:
+                db.close()
+        raise RuntimeError("Job dedupe keys kept conflicting")
+
+    def _execute_job(
+        self,
+        job_id: str,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        pipeline_stage: Optional[Tuple[str, str]] = None,
+    ):
         """Execute a job and update status"""
         # Update job status to running
         self.update_job_status(job_id, JobStatus.RUNNING)
+        current = get_current_job()
+        queue_name = base_queue_name(current.origin) if current else "default"
+        # Time from dequeue to here is the worker's fork, import and setup cost
+        dequeued_at = getattr(current, "dequeued_at", None)
+        queue_stats.started(
+            queue_name,
+            func.__name__,
+            current.enqueued_at if current else None,
+            time.monotonic() - dequeued_at if dequeued_at else None,
+        )
+        started = time.monotonic()
+        profile = None
         
         try:
-            # Execute the function
-            result = func(*args, **kwargs)
+            if pipeline_stage:
+                # Parent stage results are passed by reference
+                args, kwargs = job_pipelines.resolve(args, kwargs)
+
+            # Execute the function, with its LLM calls on the job's workspace and queue
+            with (
+                profile_job() as profile,
+                llm_governor.context(**self._llm_context(func, args, kwargs)),
+            ):
+                result = func(*args, **kwargs)
+            job_profiles.record(func.__name__, profile)
             
+            # Keep the output before reporting success, so pollers can fetch it
+            self.store_result(job_id, result)
+
             # Update job status to succeeded
-            self.update_job_status(job_id, JobStatus.SUCCEEDED)
+            self.update_job_status(job_id, JobStatus.SUCCEEDED, profile=profile)
+            queue_stats.finished(queue_name, func.__name__, time.monotonic() - started)
+            if pipeline_stage:
+                self._finish_stage(*pipeline_stage, STAGE_SUCCEEDED, result)
             
             return result
         except Exception as e:
-            # Update job status to failed
-            self.update_job_status(job_id, JobStatus.FAILED, str(e))
+            if profile is not None:
+                job_profiles.record(func.__name__, profile)
+            delay, reason, retry = self._retry_delay(func, current, e)
+            if delay is not None:
+                # RQ fails the job as usual; the retry scheduler requeues it from the
+                # failed registry
+                current.meta["retries"] = retry
+                current.save_meta()
+                job_retries.schedule(job_id, current.origin, delay)
+                self.update_job_status(job_id, JobStatus.QUEUED, str(e), profile)
+            else:
+                self.update_job_status(job_id, JobStatus.FAILED, str(e), profile)
+                self.dead_letter(
+                    job_id, func, args, kwargs, queue_name, retry, str(e), reason
+                )
+            retrying = delay is not None
+            queue_stats.finished(
+                queue_name,
+                func.__name__,
+                time.monotonic() - started,
+                failed=True,
+                retrying=retrying,
+            )
+            if pipeline_stage and not retrying:
+                self._finish_stage(*pipeline_stage, STAGE_FAILED)
             raise e
+        finally:
+            # Forked work horses exit after the job without a periodic flusher;
+            # write their LLM ledger now
+            if not llm_telemetry.flusher_running():
+                llm_telemetry.flush()
     
-    def update_job_status(self, job_id: str, status: JobStatus, error: Optional[str] = None):
-        """Update job status in database"""
+    def _retry_delay(
+        self, func: Callable, current: Optional[Job], error: Exception
+    ) -> Tuple[Optional[float], str, int]:
+        """Backoff before a failed job's next try, why it stops retrying, and the try"""
+        if current is None:
+            return None, "not_retryable", 1
+        retry = current.meta.get("retries", 0) + 1
+        created_at = (
+            current.created_at.replace(tzinfo=None)
+            if current.created_at
+            else datetime.utcnow()
+        )
+        elapsed = (datetime.utcnow() - created_at).total_seconds()
+        policy = self.retry_policies.get(func.__name__, current.meta.get("max_retries"))
+        delay, reason = policy.next_delay(error, retry, elapsed)
+        return delay, reason, retry
+
+    def dead_letter(
+        self,
+        job_id: str,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        queue_name: str,
+        attempts: int,
+        error: str,
+        reason: str,
+    ) -> None:
+        """Keep a job that will not be retried, with its payload, for replay"""
+        db = next(get_db())
+        try:
+            job = db.query(JobModel.workspace_id).filter(JobModel.id == job_id).first()
+            if not job:
+                return
+            db.add(
+                DeadLetterJob(
+                    id=str(uuid.uuid4()),
+                    job_id=job_id,
+                    workspace_id=job.workspace_id,
+                    type=func.__name__,
+                    func_path=job_func_path(func),
+                    queue_name=queue_name,
+                    payload_json={"args": list(args), "kwargs": kwargs},
+                    attempts=attempts,
+                    last_error=error,
+                    reason=reason,
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error dead-lettering job {job_id}: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _dead_letter_dict(entry: DeadLetterJob) -> Dict[str, Any]:
+        return {
+            "id": str(entry.id),
+            "job_id": str(entry.job_id),
+            "type": entry.type,
+            "queue_name": entry.queue_name,
+            "attempts": entry.attempts,
+            "last_error": entry.last_error,
+            "reason": entry.reason,
+            "replay_job_id": str(entry.replay_job_id) if entry.replay_job_id else None,
+            "replayed_at": entry.replayed_at.isoformat() if entry.replayed_at else None,
+            "created_at": entry.created_at.isoformat() if entry.created_at else None,
+        }
+
+    def get_dead_letters(
+        self,
+        workspace_id: str,
+        job_type: Optional[str] = None,
+        include_replayed: bool = False,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Dead-lettered jobs of a workspace, newest first"""
+        db = next(get_db())
+        try:
+            query = db.query(DeadLetterJob).filter(
+                DeadLetterJob.workspace_id == workspace_id
+            )
+            if job_type:
+                query = query.filter(DeadLetterJob.type == job_type)
+            if not include_replayed:
+                query = query.filter(DeadLetterJob.replay_job_id.is_(None))
+            entries = (
+                query.order_by(DeadLetterJob.created_at.desc())
+                .limit(max(1, min(limit, 500)))
+                .all()
+            )
+            return [self._dead_letter_dict(entry) for entry in entries]
+        finally:
+            db.close()
+
+    def replay_dead_letters(
+        self,
+        workspace_id: str,
+        ids: Optional[List[str]] = None,
+        job_type: Optional[str] = None,
+        limit: int = 500,
+    ) -> Dict[str, Any]:
+        """Enqueue dead-lettered jobs again; returns new job ids by dead-letter id"""
+        db = next(get_db())
+        try:
+            query = db.query(DeadLetterJob).filter(
+                DeadLetterJob.workspace_id == workspace_id,
+                DeadLetterJob.replay_job_id.is_(None),
+            )
+            if ids:
+                query = query.filter(DeadLetterJob.id.in_(ids))
+            if job_type:
+                query = query.filter(DeadLetterJob.type == job_type)
+            entries = (
+                query.order_by(DeadLetterJob.created_at)
+                .limit(max(1, min(limit, 500)))
+                .all()
+            )
+
+            # One bulk enqueue per job function and queue
+            groups: Dict[Tuple[str, str], List[DeadLetterJob]] = {}
+            for entry in entries:
+                groups.setdefault((entry.func_path, entry.queue_name), []).append(entry)
+
+            replayed, skipped = {}, []
+            for (func_path, queue_name), group in groups.items():
+                try:
+                    func = import_job(func_path)
+                except Exception as e:
+                    print(f"Cannot replay {func_path}: {e}")
+                    skipped.extend(str(entry.id) for entry in group)
+                    continue
+                options = getattr(func, "job_options", {})
+                job_ids = self.enqueue_many(
+                    func.__name__,
+                    resolve_job_func(func_path),
+                    [
+                        (
+                            tuple(entry.payload_json["args"]),
+                            entry.payload_json["kwargs"],
+                        )
+                        for entry in group
+                    ],
+                    queue_name,
+                    workspace_id=workspace_id,
+                    timeout=options.get("timeout", 300),
+                    retry=options.get("retry", 3),
+                )
+                for entry, job_id in zip(group, job_ids):
+                    if job_id:
+                        entry.replay_job_id = job_id
+                        entry.replayed_at = datetime.utcnow()
+                        replayed[str(entry.id)] = job_id
+                    else:
+                        skipped.append(str(entry.id))
+            db.commit()
+            return {"replayed": replayed, "skipped": skipped}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _cancel_group(
+        workspace_id: Optional[str], cancel_key: Optional[str]
+    ) -> Optional[str]:
+        """Timing wheel group for a cancel key, scoped to the workspace"""
+        if not cancel_key:
+            return None
+        return f"{workspace_id or 'system'}:{cancel_key.lower()}"
+
+    def fire_delayed(self, job_ids: List[str]) -> int:
+        """Push due delayed jobs onto their queues in one pipeline; returns the count
+
+        Redis errors propagate, so the timing wheel fires the jobs again shortly.
+        """
+        try:
+            jobs = [
+                job
+                for job in Job.fetch_many(job_ids, connection=redis_conn)
+                if job is not None
+            ]
+            if len(jobs) < len(job_ids):
+                print(
+                    f"Dropped {len(job_ids) - len(jobs)} delayed jobs "
+                    "that no longer exist"
+                )
+            counts: Dict[Tuple[str, str], int] = {}
+            with redis_conn.pipeline() as pipe:
+                queues = {}
+                for job in jobs:
+                    queue = queues.setdefault(
+                        job.origin, Queue(job.origin, connection=redis_conn)
+                    )
+                    queue.enqueue_job(job, pipeline=pipe)
+                    job_type = job.args[1].rpartition(".")[2]
+                    key = (base_queue_name(job.origin), job_type)
+                    counts[key] = counts.get(key, 0) + 1
+                for queue in queues.values():
+                    fair_queues.activate(queue, pipeline=pipe)
+                for (queue_name, job_type), count in counts.items():
+                    queue_stats.enqueued(queue_name, job_type, count, pipeline=pipe)
+                pipe.execute()
+            return len(jobs)
+        except redis.exceptions.RedisError as e:
+            print(f"Redis error enqueueing delayed jobs: {e}")
+            raise
+        except Exception as e:
+            print(f"Error enqueueing delayed jobs: {e}")
+            self.fail_jobs(job_ids, str(e))
+            return 0
+
+    def cancel_delayed(
+        self,
+        workspace_id: Optional[str] = None,
+        cancel_key: Optional[str] = None,
+        job_ids: Optional[List[str]] = None,
+        reason: str = "Cancelled",
+    ) -> List[str]:
+        """Cancel pending delayed jobs by cancel key or id; returns the cancelled ids"""
+        cancelled = delayed_jobs.cancel(job_ids or [])
+        if cancel_key:
+            cancelled += delayed_jobs.cancel_group(
+                self._cancel_group(workspace_id, cancel_key)
+            )
+        if not cancelled:
+            return []
+        try:
+            redis_conn.delete(*[Job.key_for(job_id) for job_id in cancelled])
+        except Exception as e:
+            print(f"Error deleting cancelled jobs: {e}")
+        for job_id in cancelled:
+            self.update_job_status(job_id, JobStatus.FAILED, reason)
+        return cancelled
+
+    def pipeline(self, name: str, workspace_id: Optional[str] = None) -> JobPipeline:
+        """Start declaring a pipeline of dependent job stages"""
+        return JobPipeline(self, job_pipelines, name, workspace_id)
+
+    def enqueue_stage(
+        self, pipeline_id: str, workspace_id: Optional[str], spec: Dict[str, Any]
+    ) -> Optional[str]:
+        """Enqueue one pipeline stage; a stage that cannot be enqueued fails"""
+        job_id = self.enqueue_job(
+            spec["type"],
+            resolve_job_func(spec["func"]),
+            tuple(spec["args"]),
+            spec["kwargs"],
+            spec["queue_name"],
+            spec["timeout"],
+            spec["retry"],
+            workspace_id,
+            pipeline_stage=(pipeline_id, spec["name"]),
+        )
+        if job_id:
+            job_pipelines.stage_enqueued(pipeline_id, spec["name"], job_id)
+        else:
+            self._finish_stage(pipeline_id, spec["name"], STAGE_FAILED)
+        return job_id
+
+    def _finish_stage(
+        self, pipeline_id: str, stage: str, status: str, result: Any = None
+    ):
+        """Record a stage outcome and enqueue the stages it released"""
+        ready = job_pipelines.finish_stage(pipeline_id, stage, status, result)
+        if ready:
+            workspace_id = job_pipelines.workspace_id(pipeline_id)
+            for spec in ready:
+                self.enqueue_stage(pipeline_id, workspace_id, spec)
+
+    def get_pipeline_status(self, pipeline_id: str) -> Optional[Dict[str, Any]]:
+        """Get a pipeline's status, latency and stages, with live job status"""
+        pipeline = job_pipelines.get(pipeline_id)
+        if pipeline is None:
+            return None
+        active = [
+            stage["job_id"]
+            for stage in pipeline["stages"].values()
+            if stage["status"] == "enqueued"
+        ]
+        states = job_state.get_many(active) if active else {}
+        for stage in pipeline["stages"].values():
+            if stage["job_id"] in states:
+                stage["status"] = states[stage["job_id"]]["status"]
+        return pipeline
+
+    @staticmethod
+    def _llm_context(
+        func: Callable, args: tuple, kwargs: dict
+    ) -> Dict[str, Optional[str]]:
+        """Workspace and LLM priority for a job from its arguments and queue"""
+        try:
+            workspace_id = (
+                inspect.signature(func)
+                .bind_partial(*args, **kwargs)
+                .arguments.get("workspace_id")
+            )
+        except TypeError:
+            workspace_id = None
+        current = get_current_job()
+        return {
+            "workspace_id": str(workspace_id) if workspace_id else None,
+            "priority": (
+                QUEUE_PRIORITIES.get(base_queue_name(current.origin), "batch")
+                if current
+                else "batch"
+            ),
+        }
+
+    def update_job_status(
+        self,
+        job_id: str,
+        status: JobStatus,
+        error: Optional[str] = None,
+        profile: Optional[Dict[str, int]] = None,
+    ):
+        """Update job status, write-behind through Redis when the job is tracked"""
+        state = job_state.transition(job_id, status, error, profile)
+        if state is not None:
+            if state.get("dedupe_key") and status in TERMINAL_STATUSES:
+                self.release_dedupe_keys(
+                    state["workspace_id"], {state["dedupe_key"]: job_id}
+                )
+            return
+
         db = next(get_db())
         try:
             job = db.query(JobModel).filter(JobModel.id == job_id).first()
             if job:
                 job.status = status
-                job.attempts += 1
+                if status == JobStatus.RUNNING:
+                    job.attempts += 1
                 if error:
                     job.last_error = error
+                if profile:
+                    job.profile = profile
+                if status in TIMING_FIELDS:
+                    setattr(job, TIMING_FIELDS[status], datetime.utcnow())
                 db.commit()
+                if job.dedupe_key and status in TERMINAL_STATUSES:
+                    self.release_dedupe_keys(
+                        str(job.workspace_id), {job.dedupe_key: str(job.id)}
+                    )
         except Exception as e:
             db.rollback()
             print(f"Error updating job status: {e}")
         finally:
             db.close()
     
+    def fail_jobs(self, job_ids: List[str], error: str):
+        """Mark many jobs failed in one statement"""
+        db = next(get_db())
+        try:
+            db.execute(
+                update(JobModel)
+                .where(JobModel.id.in_(job_ids))
+                .values(
+                    status=JobStatus.FAILED,
+                    last_error=error,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error updating job statuses: {e}")
+        finally:
+            db.close()
+
+    def _dedupe_redis_key(self, workspace_id: str, dedupe_key: str) -> str:
+        return f"job:dedupe:{workspace_id}:{dedupe_key}"
+
+    def claim_dedupe_keys(
+        self, workspace_id: str, claims: Dict[str, str]
+    ) -> Optional[Dict[str, str]]:
+        """Claim dedupe keys for new job ids with SET NX
+
+        Returns the job id owning each key: the claimed id, or the active
+        job that claimed it first. None when Redis is unavailable, so the
+        caller falls back to the database.
+        """
+        try:
+            ttl = settings.job_dedupe_ttl_seconds
+            pipe = redis_conn.pipeline(transaction=False)
+            for dedupe_key, job_id in claims.items():
+                pipe.set(
+                    self._dedupe_redis_key(workspace_id, dedupe_key),
+                    job_id,
+                    nx=True,
+                    ex=ttl,
+                )
+            taken = [
+                dedupe_key
+                for dedupe_key, claimed in zip(claims, pipe.execute())
+                if not claimed
+            ]
+
+            owners = dict(claims)
+            if taken:
+                pipe = redis_conn.pipeline(transaction=False)
+                for dedupe_key in taken:
+                    pipe.get(self._dedupe_redis_key(workspace_id, dedupe_key))
+                for dedupe_key, owner in zip(taken, pipe.execute()):
+                    # A key that expired in between stays ours; the unique index
+                    # backs this up
+                    if owner:
+                        owners[dedupe_key] = (
+                            owner.decode() if isinstance(owner, bytes) else owner
+                        )
+            return owners
+        except Exception as e:
+            print(f"Redis dedupe claim error: {e}")
+            return None
+
+    def remember_dedupe_keys(self, workspace_id: str, owners: Dict[str, str]):
+        """Point dedupe keys at jobs found in the database"""
+        try:
+            pipe = redis_conn.pipeline(transaction=False)
+            for dedupe_key, job_id in owners.items():
+                pipe.set(
+                    self._dedupe_redis_key(workspace_id, dedupe_key),
+                    job_id,
+                    ex=settings.job_dedupe_ttl_seconds,
+                )
+            pipe.execute()
+        except Exception as e:
+            print(f"Redis dedupe set error: {e}")
+
+    def release_dedupe_keys(self, workspace_id: str, owners: Dict[str, str]):
+        """Drop dedupe keys still owned by the given jobs"""
+        try:
+            keys = [
+                self._dedupe_redis_key(workspace_id, dedupe_key)
+                for dedupe_key in owners
+            ]
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+            current = pipe.execute()
+            # A claim landing between GET and DEL only costs one fast-path miss
+            stale = [
+                key
+                for key, job_id, owner in zip(keys, owners.values(), current)
+                if owner
+                and (owner.decode() if isinstance(owner, bytes) else owner) == job_id
+            ]
+            if stale:
+                redis_conn.delete(*stale)
+        except Exception as e:
+            print(f"Redis dedupe release error: {e}")
+
     def get_job_by_dedupe_key(self, dedupe_key: str, workspace_id: str) -> Optional[JobModel]:
-        """Get job by dedupe key for idempotency"""
+        """Get the queued or running job with a dedupe key"""
         db = next(get_db())
         try:
             return db.query(JobModel).filter(
                 JobModel.workspace_id == workspace_id,
-                JobModel.payload_json['dedupe_key'].astext == dedupe_key
+                JobModel.dedupe_key == dedupe_key,
+                JobModel.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
             ).first()
         finally:
             db.close()
     
+    def get_active_jobs_by_dedupe_keys(
+        self, dedupe_keys: List[str], workspace_id: str
+    ) -> Dict[str, str]:
+        """Queued or running job ids by dedupe key, looked up in bulk"""
+        db = next(get_db())
+        try:
+            found = {}
+            for start in range(0, len(dedupe_keys), 1000):
+                rows = (
+                    db.query(JobModel.id, JobModel.dedupe_key)
+                    .filter(
+                        JobModel.workspace_id == workspace_id,
+                        JobModel.dedupe_key.in_(dedupe_keys[start : start + 1000]),
+                        JobModel.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+                    )
+                    .all()
+                )
+                found.update({key: str(job_id) for job_id, key in rows})
+            return found
+        except Exception as e:
+            print(f"Error looking up job dedupe keys: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def store_result(self, job_id: str, result: Any) -> None:
+        """Keep a job's return value, compressed and size-capped, until it expires"""
+        if result is None:
+            return
+        try:
+            raw = json.dumps(result, default=str).encode()
+            blob = zlib.compress(raw)
+            if len(blob) > settings.job_result_max_bytes:
+                print(
+                    f"Result for job {job_id} is {len(blob)} bytes compressed, "
+                    "not stored"
+                )
+                blob = None
+        except Exception as e:
+            print(f"Error encoding result for job {job_id}: {e}")
+            return
+
+        db = next(get_db())
+        try:
+            db.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id)
+                .values(
+                    result=blob,
+                    result_size=len(raw),
+                    result_expires_at=datetime.utcnow()
+                    + timedelta(seconds=settings.job_result_ttl_seconds),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error storing result for job {job_id}: {e}")
+        finally:
+            db.close()
+
+    def purge_expired_results(self) -> int:
+        """Drop stored results past their TTL; returns jobs purged"""
+        db = next(get_db())
+        try:
+            purged = db.execute(
+                update(JobModel)
+                .where(JobModel.result_expires_at <= datetime.utcnow())
+                .values(result=None, result_size=None, result_expires_at=None)
+            ).rowcount
+            db.commit()
+            return purged
+        except Exception as e:
+            db.rollback()
+            print(f"Error purging job results: {e}")
+            return 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _result_fields(
+        blob: Optional[bytes], size: Optional[int], expires_at: Optional[datetime]
+    ) -> Dict[str, Any]:
+        """Decoded result, or None when there is none, it expired or was over the cap"""
+        if size is None or (expires_at and expires_at <= datetime.utcnow()):
+            return {"result": None, "result_truncated": False}
+        if blob is None:
+            return {"result": None, "result_truncated": True}
+        return {"result": json.loads(zlib.decompress(blob)), "result_truncated": False}
+
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
-        """Get job status"""
+        """Get job status and result, with the status from Redis when it is tracked"""
+        state = job_state.get(job_id)
+        if state is not None and state["status"] != JobStatus.SUCCEEDED.value:
+            return {**state, "result": None, "result_truncated": False}
+
         db = next(get_db())
         try:
+            if state is not None:
+                row = (
+                    db.query(
+                        JobModel.result,
+                        JobModel.result_size,
+                        JobModel.result_expires_at,
+                    )
+                    .filter(JobModel.id == job_id)
+                    .first()
+                )
+                return {**state, **self._result_fields(*row)} if row else state
+
             job = db.query(JobModel).filter(JobModel.id == job_id).first()
             if job:
                 return {
-                    "id": str(job.id),
-                    "type": job.type,
-                    "status": job.status.value,
-                    "attempts": job.attempts,
-                    "last_error": job.last_error,
-                    "created_at": job.created_at.isoformat(),
-                    "updated_at": job.updated_at.isoformat()
+                    **self._job_dict(job),
+                    **self._result_fields(
+                        job.result, job.result_size, job.result_expires_at
+                    ),
                 }
             return None
         finally:
             db.close()
     
-    def get_workspace_jobs(self, workspace_id: str, limit: int = 100) -> list[Dict[str, Any]]:
-        """Get jobs for a workspace"""
+    @staticmethod
+    def _job_dict(job: JobModel) -> Dict[str, Any]:
+        return {
+            "id": str(job.id),
+            "type": job.type,
+            "status": job.status.value,
+            "attempts": job.attempts,
+            "last_error": job.last_error,
+            "created_at": job.created_at.isoformat(),
+            "updated_at": job.updated_at.isoformat(),
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "profile": job.profile,
+        }
+
+    @staticmethod
+    def _encode_cursor(job: JobModel) -> str:
+        return base64.urlsafe_b64encode(
+            f"{job.created_at.isoformat()}|{job.id}".encode()
+        ).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Position after which the next page starts; ValueError when malformed"""
+        try:
+            created_at, _, job_id = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+            )
+            return datetime.fromisoformat(created_at), job_id
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+    def get_workspace_jobs(
+        self,
+        workspace_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_results: bool = False,
+    ) -> Dict[str, Any]:
+        """Get a page of a workspace's jobs, newest first
+
+        Pages are keyed on (created_at, id) so each one is an index range
+        scan whatever its depth; pass ``next_cursor`` back to get the next.
+        """
+        limit = max(1, min(limit, 500))
         db = next(get_db())
         try:
-            jobs = db.query(JobModel).filter(
-                JobModel.workspace_id == workspace_id
-            ).order_by(JobModel.created_at.desc()).limit(limit).all()
+            query = db.query(JobModel).filter(JobModel.workspace_id == workspace_id)
+            if cursor:
+                created_at, job_id = self._decode_cursor(cursor)
+                query = query.filter(
+                    or_(
+                        JobModel.created_at < created_at,
+                        and_(JobModel.created_at == created_at, JobModel.id < job_id),
+                    )
+                )
+            if not include_results:
+                query = query.options(defer(JobModel.result))
+            jobs = (
+                query.order_by(JobModel.created_at.desc(), JobModel.id.desc())
+                .limit(limit + 1)
+                .all()
+            )
+            page = jobs[:limit]
             
-            return [
-                {
-                    "id": str(job.id),
-                    "type": job.type,
-                    "status": job.status.value,
-                    "attempts": job.attempts,
-                    "last_error": job.last_error,
-                    "created_at": job.created_at.isoformat(),
-                    "updated_at": job.updated_at.isoformat()
-                }
-                for job in jobs
-            ]
+            # Overlay transitions not yet flushed to the database
+            states = job_state.get_many([str(job.id) for job in page])
+            now = datetime.utcnow()
+            results = []
+            for job in page:
+                item = states.get(str(job.id)) or self._job_dict(job)
+                if include_results:
+                    item.update(
+                        self._result_fields(
+                            job.result, job.result_size, job.result_expires_at
+                        )
+                    )
+                else:
+                    item["has_result"] = bool(
+                        job.result_expires_at and job.result_expires_at > now
+                    )
+                results.append(item)
+
+            return {
+                "jobs": results,
+                "next_cursor": (
+                    self._encode_cursor(page[-1]) if len(jobs) > limit else None
+                ),
+            }
         finally:
             db.close()
     
     def cancel_job(self, job_id: str) -> bool:
         """Cancel a job"""
         try:
-            # Try to cancel in Redis
-            for queue in self.queues.values():
-                job = queue.fetch_job(job_id)
-                if job:
-                    job.cancel()
-                    break
+            if self.cancel_delayed(job_ids=[job_id], reason="Cancelled by user"):
+                return True
+
+            # Cancel in Redis from whichever queue it waits in, sub-queues included
+            try:
+                job = Job.fetch(job_id, connection=redis_conn)
+            except NoSuchJobError:
+                job = None
+            if job:
+                job.cancel()
             
             # Update status in database
             self.update_job_status(job_id, JobStatus.FAILED, "Cancelled by user")
@@ -246,21 +1271,30 @@ class JobService:
             return False
     
     def get_queue_stats(self) -> Dict[str, Any]:
-        """Get queue statistics"""
-        stats = {}
-        for name, queue in self.queues.items():
-            stats[name] = {
-                "queued": len(queue),
-                "failed": len(queue.failed_job_registry),
-                "started": len(queue.started_job_registry),
-                "finished": len(queue.finished_job_registry)
-            }
-        return stats
+        """Get queue counters, maintained as jobs change state"""
+        return queue_stats.counts(list(self.queues))
+
+    def get_job_profiles(self) -> Dict[str, Any]:
+        """Average execution profile per job type"""
+        return job_profiles.summary()
+
+    def get_queue_throughput(self, minutes: int = 60) -> Dict[str, Any]:
+        """Get per-minute throughput and latency by queue and job type"""
+        return queue_stats.series(minutes)
+
+    def get_workspace_backlog(self, workspace_id: str) -> Dict[str, Any]:
+        """Get a workspace's waiting and running jobs per queue"""
+        return fair_queues.backlog(workspace_id, list(self.queues.values()))
 
 # Global job service instance
 job_service = JobService()
 
 # Job decorators
-def job(queue_name: str = "default", timeout: int = 300, retry: int = 3):
+def job(
+    queue_name: str = "default",
+    timeout: int = 300,
+    retry: int = 3,
+    retry_policy: Optional[RetryPolicy] = None,
+):
     """Decorator to register a function as a job"""
-    return job_service.job(queue_name, timeout, retry)
+    return job_service.job(queue_name, timeout, retry, retry_policy)
@@ -0,0 +1,271 @@
+"""
+Write-behind job status tracking in Redis with batched database flushes
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, bindparam, func, or_, update
+
+from config import settings
+from database import Job as JobModel, JobStatus, get_db
+
+TERMINAL_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+# Hash field set when a status transition also marks a timing
+TIMING_FIELDS = {
+    JobStatus.RUNNING: "started_at",
+    JobStatus.SUCCEEDED: "finished_at",
+    JobStatus.FAILED: "finished_at",
+}
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class JobStateStore:
+    """Job status, attempts and timings kept in Redis hashes
+
+    A hash is written when a job is enqueued; transitions then only touch
+    Redis and mark the job dirty. A flusher copies dirty hashes onto the
+    ``jobs`` table with one executemany UPDATE per batch, skipping rows that
+    already hold a newer transition. Jobs without a hash (enqueued before
+    tracking, or expired) and Redis errors fall back to a direct update.
+    """
+
+    def __init__(
+        self,
+        redis,
+        prefix: str = "job:state",
+        ttl: int = settings.job_state_ttl_seconds,
+        flush_batch_size: int = settings.job_state_flush_batch_size,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self.flush_batch_size = flush_batch_size
+        self.dirty_key = f"{prefix}:dirty"
+        self.stats = {"transitions": 0, "fallbacks": 0, "flushed": 0, "flush_errors": 0}
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    def track(self, jobs: List[Dict[str, Any]], pipeline=None) -> None:
+        """Start hashes for newly inserted job rows, optionally on a given pipeline"""
+        try:
+            pipe = (
+                pipeline
+                if pipeline is not None
+                else self.redis.pipeline(transaction=False)
+            )
+            for job in jobs:
+                created_at = job.get("created_at") or datetime.utcnow()
+                state = {
+                    "type": job["type"],
+                    "workspace_id": str(job["workspace_id"]),
+                    "status": JobStatus.QUEUED.value,
+                    "attempts": 0,
+                    "created_at": created_at.isoformat(),
+                    "updated_at": created_at.isoformat(),
+                }
+                if job.get("dedupe_key"):
+                    state["dedupe_key"] = job["dedupe_key"]
+                pipe.hset(self._key(job["id"]), mapping=state)
+                pipe.expire(self._key(job["id"]), self.ttl)
+            if pipeline is None:
+                pipe.execute()
+        except Exception as e:
+            print(f"Redis job state track error: {e}")
+
+    def transition(
+        self,
+        job_id: str,
+        status: JobStatus,
+        error: Optional[str] = None,
+        profile: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, str]]:
+        """Record a status transition, and the attempt's profile when it ended, in Redis
+
+        Returns the job's hash (with its workspace and dedupe key), or None
+        when the job is not tracked and the caller must write the database.
+        """
+        now = datetime.utcnow().isoformat()
+        fields = {"status": status.value, "updated_at": now}
+        if error:
+            fields["last_error"] = error
+        if profile:
+            fields["profile"] = json.dumps(profile, separators=(",", ":"))
+        if status in TIMING_FIELDS:
+            fields[TIMING_FIELDS[status]] = now
+
+        key = self._key(job_id)
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hset(key, mapping=fields)
+            # An attempt is a run, not every status change along the way
+            pipe.hincrby(key, "attempts", int(status == JobStatus.RUNNING))
+            pipe.hgetall(key)
+            pipe.expire(key, self.ttl)
+            pipe.sadd(self.dirty_key, job_id)
+            state = {
+                _text(name): _text(value) for name, value in pipe.execute()[2].items()
+            }
+            if "type" not in state:
+                # Not tracked: drop the partial hash written above
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.delete(key)
+                pipe.srem(self.dirty_key, job_id)
+                pipe.execute()
+                self.stats["fallbacks"] += 1
+                return None
+            self.stats["transitions"] += 1
+            return state
+        except Exception as e:
+            print(f"Redis job state transition error: {e}")
+            self.stats["fallbacks"] += 1
+            return None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a tracked job; None when only the database knows it"""
+        return self.get_many([job_id]).get(job_id)
+
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Current states of tracked jobs, by job id"""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hgetall(self._key(job_id))
+            results = pipe.execute()
+        except Exception as e:
+            print(f"Redis job state read error: {e}")
+            return {}
+
+        states = {}
+        for job_id, raw in zip(job_ids, results):
+            state = {_text(name): _text(value) for name, value in raw.items()}
+            if "type" in state:
+                states[job_id] = {
+                    "id": job_id,
+                    "type": state["type"],
+                    "status": state["status"],
+                    "attempts": int(state.get("attempts") or 0),
+                    "last_error": state.get("last_error"),
+                    "created_at": state["created_at"],
+                    "updated_at": state["updated_at"],
+                    "started_at": state.get("started_at"),
+                    "finished_at": state.get("finished_at"),
+                    "profile": (
+                        json.loads(state["profile"]) if state.get("profile") else None
+                    ),
+                }
+        return states
+
+    def flush(self) -> int:
+        """Write one batch of dirty job states to the database; returns rows flushed"""
+        try:
+            job_ids = [
+                _text(job_id)
+                for job_id in self.redis.spop(self.dirty_key, self.flush_batch_size)
+                or []
+            ]
+        except Exception as e:
+            print(f"Redis job state flush error: {e}")
+            return 0
+        return self.flush_jobs(job_ids)
+
+    def flush_jobs(self, job_ids: List[str]) -> int:
+        """Write the given jobs' states to the database now; returns rows flushed"""
+        states = self.get_many(job_ids) if job_ids else {}
+        rows = [
+            {
+                "job_id": job_id,
+                "b_status": JobStatus(state["status"]),
+                "b_attempts": state["attempts"],
+                "b_last_error": state["last_error"],
+                "b_updated_at": _datetime(state["updated_at"]),
+                "b_started_at": _datetime(state["started_at"]),
+                "b_finished_at": _datetime(state["finished_at"]),
+                "b_profile": state["profile"],
+            }
+            for job_id, state in states.items()
+        ]
+        if not rows:
+            return 0
+
+        jobs = JobModel.__table__
+        statement = (
+            update(jobs)
+            .where(jobs.c.id == bindparam("job_id"))
+            # A slower flusher must not overwrite a newer transition
+            .where(
+                or_(
+                    jobs.c.updated_at.is_(None),
+                    jobs.c.updated_at <= bindparam("b_updated_at"),
+                )
+            )
+            .values(
+                status=bindparam("b_status"),
+                attempts=bindparam("b_attempts"),
+                last_error=func.coalesce(bindparam("b_last_error"), jobs.c.last_error),
+                updated_at=bindparam("b_updated_at"),
+                started_at=func.coalesce(bindparam("b_started_at"), jobs.c.started_at),
+                finished_at=func.coalesce(
+                    bindparam("b_finished_at"), jobs.c.finished_at
+                ),
+                profile=func.coalesce(
+                    bindparam("b_profile", type_=JSON(none_as_null=True)),
+                    jobs.c.profile,
+                ),
+            )
+        )
+        db = next(get_db())
+        try:
+            db.execute(statement, rows)
+            db.commit()
+            self.stats["flushed"] += len(rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            print(f"Error flushing job states: {e}")
+            self.stats["flush_errors"] += 1
+            try:
+                self.redis.sadd(self.dirty_key, *[row["job_id"] for row in rows])
+            except Exception as redis_error:
+                print(f"Redis job state requeue error: {redis_error}")
+            return 0
+        finally:
+            db.close()
+
+    def flush_all(self) -> int:
+        """Flush until no dirty jobs are left"""
+        total = 0
+        while True:
+            flushed = self.flush()
+            total += flushed
+            if flushed < self.flush_batch_size:
+                return total
+
+    def start_flusher(
+        self, interval: float = settings.job_state_flush_interval_seconds
+    ) -> threading.Thread:
+        """Flush dirty job states from a daemon thread every interval"""
+
+        def run():
+            while True:
+                started = time.monotonic()
+                self.flush_all()
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        thread = threading.Thread(target=run, name="job-state-flusher", daemon=True)
+        thread.start()
+        return thread
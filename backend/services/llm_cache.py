@@ -0,0 +1,159 @@
+"""
+Two-tier content-addressed cache for LLM responses
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.redis_service import get_async_redis
+
+# Per-template TTLs in seconds; templates not listed use the default TTL.
+# Deterministic checks can live long, creative copy should refresh sooner.
+TEMPLATE_TTLS: Dict[str, int] = {
+    "check_compliance": 7 * 24 * 3600,
+    "score_content": 7 * 24 * 3600,
+    "classify_intent": 24 * 3600,
+    "generate_workflow": 24 * 3600,
+    "offer_creator": 6 * 3600,
+    "cold_email": 6 * 3600,
+    "ad_variants": 6 * 3600,
+}
+
+
+class LLMResponseCache:
+    """In-process LRU in front of a shared Redis tier, keyed by request content
+
+    The Redis tier is read and written through the running loop's async
+    client, so lookups never block the event loop.
+    """
+
+    def __init__(
+        self,
+        redis_client: Callable[[], Any] = get_async_redis,
+        max_entries: int = settings.llm_cache_max_entries,
+        default_ttl: int = settings.llm_cache_default_ttl_seconds,
+        max_temperature: float = settings.llm_cache_max_temperature,
+    ):
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_temperature = max_temperature
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+    ) -> str:
+        """Stable hash of everything that determines the completion"""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return f"llm:response:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def is_cacheable(self, temperature: float, use_cache: bool = True) -> bool:
+        """High-temperature creative calls opt out of caching"""
+        if (
+            not settings.llm_cache_enabled
+            or not use_cache
+            or temperature > self.max_temperature
+        ):
+            self._count("bypassed")
+            return False
+        return True
+
+    def ttl_for(self, template: Optional[str]) -> int:
+        """TTL for a template"""
+        return TEMPLATE_TTLS.get(template or "", self.default_ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a response, promoting Redis hits into the local tier"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    self._stats["local_hits"] += 1
+                    return value
+                del self._local[key]
+
+        try:
+            # Value and remaining TTL in one round trip
+            async with self.redis_client().pipeline(transaction=False) as pipe:
+                stored, ttl = await pipe.get(key).ttl(key).execute()
+            value = json.loads(stored) if stored else None
+        except Exception as e:
+            print(f"Redis get error: {e}")
+            value = None
+        if isinstance(value, str):
+            self._store_local(key, value, ttl if ttl and ttl > 0 else self.default_ttl)
+            self._count("redis_hits")
+            return value
+
+        self._count("misses")
+        return None
+
+    async def set(self, key: str, value: str, template: Optional[str] = None) -> None:
+        """Store a response in both tiers"""
+        ttl = self.ttl_for(template)
+        self._store_local(key, value, ttl)
+        try:
+            await self.redis_client().set(key, json.dumps(value), ex=ttl)
+        except Exception as e:
+            print(f"Redis set error: {e}")
+        self._count("stores")
+
+    def clear_local(self) -> None:
+        """Drop the in-process tier"""
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            (stats["local_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+    def _store_local(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+# Global LLM response cache instance
+llm_cache = LLMResponseCache()
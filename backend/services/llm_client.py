@@ -0,0 +1,79 @@
+"""
+Shared async OpenAI client with a tuned keep-alive connection pool
+"""
+
+import asyncio
+import weakref
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+import openai
+
+from config import settings
+from services.redis_service import close_async_redis
+
+T = TypeVar("T")
+
+# One client per event loop: httpx connection pools are bound to the loop that
+# created them, and RQ jobs run each tool call in a fresh loop via asyncio.run().
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _build_client() -> openai.AsyncOpenAI:
+    """Create an AsyncOpenAI client backed by a pooled httpx transport"""
+    timeout = httpx.Timeout(
+        settings.llm_request_timeout_seconds,
+        connect=settings.llm_connect_timeout_seconds,
+    )
+    http_client = httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry_seconds,
+        ),
+    )
+    return openai.AsyncOpenAI(
+        api_key=settings.openai_api_key or None,
+        timeout=timeout,
+        max_retries=settings.llm_max_retries,
+        http_client=http_client,
+    )
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """Get the shared client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _build_client()
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """Close the running loop's client and release its pooled connections"""
+    client: Optional[openai.AsyncOpenAI] = _clients.pop(
+        asyncio.get_running_loop(), None
+    )
+    if client is not None:
+        await client.close()
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run an LLM coroutine from synchronous code such as RQ jobs
+
+    The loop-bound clients created along the way are closed before the
+    temporary event loop goes away.
+    """
+
+    async def runner() -> T:
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+            await close_async_redis()
+
+    return asyncio.run(runner())
@@ -0,0 +1,325 @@
+"""
+Cluster-wide LLM concurrency governor with per-workspace fair queuing
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from config import settings
+from services.redis_service import get_async_redis
+
+PRIORITIES = ("interactive", "batch")
+
+# RQ queues whose jobs yield to interactive API traffic
+QUEUE_PRIORITIES: Dict[str, str] = {
+    "high": "interactive",
+    "default": "batch",
+    "low": "batch",
+}
+
+_workspace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "llm_workspace", default=None
+)
+_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "llm_priority", default=None
+)
+
+# Join a priority class's queue with a start-time fair queuing tag: each
+# workspace's virtual clock advances by cost / weight, so a workspace with a
+# thousand queued calls interleaves with one that has a single call.
+# KEYS: queue, workspace clocks, class clock, alive key
+# ARGV: request id, workspace, cost / weight, alive ttl ms
+_ENQUEUE = """
+local clock = tonumber(redis.call("get", KEYS[3]) or "0")
+local last = tonumber(redis.call("hget", KEYS[2], ARGV[2]) or "0")
+local finish = math.max(clock, last) + tonumber(ARGV[3])
+redis.call("hset", KEYS[2], ARGV[2], finish)
+redis.call("expire", KEYS[2], 86400)
+redis.call("zadd", KEYS[1], finish, ARGV[1])
+redis.call("set", KEYS[4], "1", "px", ARGV[4])
+return tostring(finish)
+"""
+
+# Take a slot if this request heads its queue and capacity allows.
+# Returns 1 when granted, 0 to keep waiting, -1 when only the token budget blocks.
+# KEYS: interactive queue, batch queue, interactive leases, batch leases,
+#       minute tokens, class clock
+# ARGV: request id, priority, now ms, lease ms, max in flight, batch max,
+#       tokens per minute, estimated tokens, alive key prefix
+_ACQUIRE = """
+local now = tonumber(ARGV[3])
+redis.call("zremrangebyscore", KEYS[3], "-inf", now)
+redis.call("zremrangebyscore", KEYS[4], "-inf", now)
+for i = 1, 2 do
+    while true do
+        local head = redis.call("zrange", KEYS[i], 0, 0)[1]
+        if not head or redis.call("exists", ARGV[9] .. head) == 1 then break end
+        redis.call("zrem", KEYS[i], head)
+    end
+end
+local queue = KEYS[1]
+local leases = KEYS[3]
+if ARGV[2] == "batch" then
+    if redis.call("zcard", KEYS[1]) > 0 then return 0 end
+    queue = KEYS[2]
+    leases = KEYS[4]
+end
+local head = redis.call("zrange", queue, 0, 0, "withscores")
+if head[1] ~= ARGV[1] then return 0 end
+local batch = redis.call("zcard", KEYS[4])
+if redis.call("zcard", KEYS[3]) + batch >= tonumber(ARGV[5]) then return 0 end
+if ARGV[2] == "batch" and batch >= tonumber(ARGV[6]) then return 0 end
+local limit = tonumber(ARGV[7])
+local used = tonumber(redis.call("get", KEYS[5]) or "0")
+if limit > 0 and used > 0 and used + tonumber(ARGV[8]) > limit then return -1 end
+redis.call("zrem", queue, ARGV[1])
+redis.call("zadd", leases, now + tonumber(ARGV[4]), ARGV[1])
+redis.call("incrby", KEYS[5], ARGV[8])
+redis.call("expire", KEYS[5], 120)
+redis.call("set", KEYS[6], head[2])
+redis.call("del", ARGV[9] .. ARGV[1])
+return 1
+"""
+
+
+class LLMCapacityError(Exception):
+    """Raised when a call waited too long for an LLM slot"""
+
+
+class Lease:
+    """A granted slot; set actual_tokens so the minute budget is corrected on release"""
+
+    def __init__(
+        self,
+        request_id: str,
+        priority: str,
+        estimated_tokens: int,
+        tokens_key: Optional[str],
+    ):
+        self.request_id = request_id
+        self.priority = priority
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens: Optional[int] = None
+        self.tokens_key = tokens_key
+
+
+class LLMGovernor:
+    """Global in-flight cap and tokens-per-minute budget shared through Redis
+
+    Every upstream completion from the API processes and RQ workers takes a
+    lease first. Waiting calls queue per priority class (interactive before
+    batch) and within a class by workspace fair share; batch work may only
+    hold part of the global capacity so interactive requests always have
+    headroom. Redis errors fail open, matching the rest of the LLM stack.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "{llm:gov}",
+        enabled: bool = settings.llm_governor_enabled,
+        max_in_flight: int = settings.llm_governor_max_in_flight,
+        tokens_per_minute: int = settings.llm_governor_tokens_per_minute,
+        batch_share: float = settings.llm_governor_batch_share,
+        lease_ttl: int = settings.llm_governor_lease_ttl_seconds,
+        wait_timeout: float = settings.llm_governor_wait_timeout_seconds,
+        workspace_weights: Optional[Dict[str, float]] = None,
+        default_priority: str = settings.llm_governor_default_priority,
+    ):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.tokens_per_minute = tokens_per_minute
+        self.batch_max = max(1, int(max_in_flight * batch_share))
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.workspace_weights = (
+            workspace_weights
+            if workspace_weights is not None
+            else self._parse_weights(settings.llm_governor_workspace_weights)
+        )
+        self.default_priority = default_priority
+        self.alive_ttl_ms = 5000
+        self.stats = {
+            "granted": 0,
+            "waited": 0,
+            "token_waits": 0,
+            "timeouts": 0,
+            "fail_open": 0,
+        }
+
+    @staticmethod
+    def _parse_weights(raw: str) -> Dict[str, float]:
+        if not raw:
+            return {}
+        try:
+            return {
+                str(workspace): float(weight)
+                for workspace, weight in json.loads(raw).items()
+            }
+        except Exception as e:
+            print(f"Invalid LLM workspace weights: {e}")
+            return {}
+
+    @contextmanager
+    def context(
+        self, workspace_id: Optional[str] = None, priority: Optional[str] = None
+    ) -> Iterator[None]:
+        """Attribute LLM calls made inside the block to a workspace and priority"""
+        tokens = []
+        if workspace_id is not None:
+            tokens.append((_workspace, _workspace.set(workspace_id)))
+        if priority is not None:
+            tokens.append((_priority, _priority.set(priority)))
+        try:
+            yield
+        finally:
+            for var, token in reversed(tokens):
+                var.reset(token)
+
+    def current_workspace(self) -> str:
+        return _workspace.get() or "anonymous"
+
+    def current_priority(self) -> str:
+        priority = _priority.get() or self.default_priority
+        return priority if priority in PRIORITIES else "interactive"
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[Optional[Lease]]:
+        """Hold a cluster-wide LLM slot for the duration of one upstream call"""
+        lease = await self.acquire(estimated_tokens) if self.enabled else None
+        try:
+            yield lease
+        finally:
+            if lease is not None:
+                await self.release(lease)
+
+    async def acquire(
+        self, estimated_tokens: int, wait_timeout: Optional[float] = None
+    ) -> Optional[Lease]:
+        """Wait for a slot; None when the governor failed open
+
+        ``wait_timeout=0`` tries once and raises LLMCapacityError at once
+        when no slot is free.
+        """
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        workspace = self.current_workspace()
+        priority = self.current_priority()
+        request_id = str(uuid.uuid4())
+        queue_key = self._key(priority, "queue")
+        alive_key = self._key("alive", request_id)
+        weight = self.workspace_weights.get(workspace, 1.0) or 1.0
+
+        try:
+            client = get_async_redis()
+            await client.eval(
+                _ENQUEUE,
+                4,
+                queue_key,
+                self._key(priority, "workspaces"),
+                self._key(priority, "clock"),
+                alive_key,
+                request_id,
+                workspace,
+                estimated_tokens / weight,
+                self.alive_ttl_ms,
+            )
+        except Exception as e:
+            print(f"LLM governor enqueue error: {e}")
+            self.stats["fail_open"] += 1
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_timeout
+        last_heartbeat = loop.time()
+        delay = 0.005
+        waited = False
+        granted = False
+        try:
+            while True:
+                now_ms = int(time.time() * 1000)
+                tokens_key = self._key("tokens", str(now_ms // 60000))
+                result = await client.eval(
+                    _ACQUIRE,
+                    6,
+                    self._key("interactive", "queue"),
+                    self._key("batch", "queue"),
+                    self._key("interactive", "leases"),
+                    self._key("batch", "leases"),
+                    tokens_key,
+                    self._key(priority, "clock"),
+                    request_id,
+                    priority,
+                    now_ms,
+                    self.lease_ttl * 1000,
+                    self.max_in_flight,
+                    self.batch_max,
+                    self.tokens_per_minute,
+                    estimated_tokens,
+                    self._key("alive", ""),
+                )
+                if int(result) == 1:
+                    granted = True
+                    self.stats["granted"] += 1
+                    self.stats["waited"] += int(waited)
+                    return Lease(request_id, priority, estimated_tokens, tokens_key)
+                if int(result) == -1:
+                    self.stats["token_waits"] += 1
+                waited = True
+
+                if loop.time() >= deadline:
+                    if wait_timeout:
+                        self.stats["timeouts"] += 1
+                    raise LLMCapacityError(
+                        f"No LLM capacity for workspace {workspace} "
+                        f"after {wait_timeout:g}s"
+                    )
+                if loop.time() - last_heartbeat >= 1.0:
+                    await client.set(alive_key, "1", px=self.alive_ttl_ms)
+                    last_heartbeat = loop.time()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        except LLMCapacityError:
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"LLM governor acquire error: {e}")
+            self.stats["fail_open"] += 1
+            return None
+        finally:
+            if not granted:
+                await self._abandon(queue_key, alive_key, request_id)
+
+    async def release(self, lease: Lease) -> None:
+        """Return the slot and settle the minute budget with the real token count"""
+        try:
+            client = get_async_redis()
+            pipe = client.pipeline(transaction=False)
+            pipe.zrem(self._key(lease.priority, "leases"), lease.request_id)
+            if lease.actual_tokens is not None and lease.tokens_key:
+                pipe.incrby(
+                    lease.tokens_key, lease.actual_tokens - lease.estimated_tokens
+                )
+            await pipe.execute()
+        except Exception as e:
+            print(f"LLM governor release error: {e}")
+
+    async def _abandon(self, queue_key: str, alive_key: str, request_id: str) -> None:
+        try:
+            client = get_async_redis()
+            await client.zrem(queue_key, request_id)
+            await client.delete(alive_key)
+        except Exception as e:
+            print(f"LLM governor abandon error: {e}")
+
+
+# Global LLM governor instance
+llm_governor = LLMGovernor()
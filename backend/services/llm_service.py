@@ -1,26 +1,260 @@
-import openai
 import json
-import os
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional, AsyncIterator
 import asyncio
+from services.llm_transport import StaleContent, get_transport
+from services.llm_cache import llm_cache
+from services.single_flight import llm_single_flight
+from services.embedding_store import embedding_store
+from services.prompt_budget import prompt_budget
+from services.model_router import model_router
+from services.llm_governor import llm_governor
+from services.llm_telemetry import llm_telemetry
+from config import settings
+
+WORKFLOW_SYSTEM_PROMPT = """You are an expert n8n workflow designer.
+        Convert plain English descriptions into valid n8n workflow JSON.
+        
+        Return a JSON object with these exact fields:
+        - nodes: Array of n8n node objects with proper structure
+        - connections: Object defining connections between nodes
+        - summary: Brief description of what the workflow does
+        
+        Use standard n8n node types like Webhook, HTTP Request, Slack, etc."""
 
 class LLMService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    async def generate_completion(self, system_prompt: str, user_prompt: str, model: str = "gpt-4") -> str:
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        coalesce: Optional[bool] = None,
+        tier: Optional[str] = None,
+    ) -> str:
+        """Run a chat completion without blocking the event loop
+
+        Without an explicit model, the model comes from the template's tier
+        in the model router. Low-temperature responses are served from the
+        two-tier response cache when possible, and identical concurrent
+        requests share one upstream call; by default only cacheable ones do,
+        since high-temperature callers expect their own sample. Cancelling
+        the last task awaiting a call aborts the in-flight HTTP request.
+        """
+        model = model_router.resolve(template, tier, model)
+        cache_key = llm_cache.make_key(model, messages, temperature, max_tokens)
+        cacheable = llm_cache.is_cacheable(temperature, use_cache)
+        if coalesce is None:
+            coalesce = cacheable
+        call_started = time.perf_counter()
+        if cacheable:
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                llm_telemetry.record(
+                    "completion",
+                    model,
+                    template,
+                    time.perf_counter() - call_started,
+                    cache_status="hit",
+                )
+                return cached
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "upstream": False}
+
+        async def call_upstream() -> str:
+            usage["upstream"] = True
+            params = self._completion_params(
+                messages, model, temperature, max_tokens, timeout
+            )
+            prompt_tokens = prompt_budget.counter.count_messages(messages)
+            prompt_budget.record(template, prompt_tokens)
+            usage["prompt_tokens"] = prompt_tokens
+            completion_budget = (
+                max_tokens or settings.llm_governor_completion_tokens_estimate
+            )
+            async with llm_governor.slot(prompt_tokens + completion_budget) as lease:
+                started = time.perf_counter()
+                try:
+                    content = await get_transport().complete(
+                        cache_key, template, params
+                    )
+                except Exception:
+                    model_router.record(
+                        template,
+                        model,
+                        time.perf_counter() - started,
+                        prompt_tokens,
+                        error=True,
+                    )
+                    raise
+                completion_tokens = prompt_budget.count(content or "")
+                usage["completion_tokens"] = completion_tokens
+                model_router.record(
+                    template,
+                    model,
+                    time.perf_counter() - started,
+                    prompt_tokens,
+                    completion_tokens,
+                )
+                if lease is not None:
+                    lease.actual_tokens = prompt_tokens + completion_tokens
+            if cacheable and content and not isinstance(content, StaleContent):
+                await llm_cache.set(cache_key, content, template)
+            return content
+
+        outcome = "error"
+        try:
+            if coalesce:
+                content = await llm_single_flight.do(cache_key, call_upstream)
+            else:
+                content = await call_upstream()
+            outcome = "stale" if isinstance(content, StaleContent) else "ok"
+            return content
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            status = (
+                ("miss" if cacheable else "bypass")
+                if usage["upstream"]
+                else "coalesced"
+            )
+            llm_telemetry.record(
+                "completion",
+                model,
+                template,
+                time.perf_counter() - call_started,
+                usage["prompt_tokens"],
+                usage["completion_tokens"],
+                status,
+                outcome,
+            )
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        tier: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion as content deltas
+
+        A cached response is yielded as a single chunk; a fully streamed
+        response is written back to the cache.
+        """
+        model = model_router.resolve(template, tier, model)
+        cache_key = llm_cache.make_key(model, messages, temperature, max_tokens)
+        cacheable = llm_cache.is_cacheable(temperature, use_cache)
+        call_started = time.perf_counter()
+        if cacheable:
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                llm_telemetry.record(
+                    "completion",
+                    model,
+                    template,
+                    time.perf_counter() - call_started,
+                    cache_status="hit",
+                )
+                yield cached
+                return
+
+        params = self._completion_params(
+            messages, model, temperature, max_tokens, timeout
+        )
+        prompt_tokens = prompt_budget.counter.count_messages(messages)
+        prompt_budget.record(template, prompt_tokens)
+        completion_budget = (
+            max_tokens or settings.llm_governor_completion_tokens_estimate
+        )
+        parts = []
+        outcome = "error"
+        try:
+            async with llm_governor.slot(prompt_tokens + completion_budget) as lease:
+                started = time.perf_counter()
+                async for delta in get_transport().stream(cache_key, template, params):
+                    parts.append(delta)
+                    yield delta
+
+                content = "".join(parts)
+                completion_tokens = prompt_budget.count(content)
+                model_router.record(
+                    template,
+                    model,
+                    time.perf_counter() - started,
+                    prompt_tokens,
+                    completion_tokens,
+                )
+                if lease is not None:
+                    lease.actual_tokens = prompt_tokens + completion_tokens
+            stale = any(isinstance(part, StaleContent) for part in parts)
+            outcome = "stale" if stale else "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            llm_telemetry.record(
+                "completion",
+                model,
+                template,
+                time.perf_counter() - call_started,
+                prompt_tokens,
+                prompt_budget.count("".join(parts)),
+                "miss" if cacheable else "bypass",
+                outcome,
+            )
+        if cacheable and content and not stale:
+            await llm_cache.set(cache_key, content, template)
+
+    @staticmethod
+    def _completion_params(
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        timeout: Optional[float],
+    ) -> Dict[str, Any]:
+        params = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if timeout is not None:
+            params["timeout"] = timeout
+        return params
+
+    async def generate_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        timeout: Optional[float] = None,
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        tier: Optional[str] = None,
+    ) -> str:
         """Generate a completion using OpenAI API"""
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
+            return await self.chat(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.7,
-                max_tokens=2000
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                template=template,
+                use_cache=use_cache,
+                tier=tier,
             )
-            return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"LLM generation failed: {str(e)}")
     
@@ -49,7 +283,9 @@ class LLMService:
         - Guarantee: {inputs.get('guarantee', '')}
         """
         
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            system_prompt, user_prompt, template="offer_creator"
+        )
         return json.loads(response)
     
     async def generate_cold_email(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
@@ -73,7 +309,9 @@ class LLMService:
         - CTA: {inputs.get('cta', '')}
         """
         
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            system_prompt, user_prompt, template="cold_email"
+        )
         return json.loads(response)
     
     async def generate_ad_variants(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
@@ -95,26 +333,34 @@ class LLMService:
         - Pain/Benefit: {inputs.get('pain_or_benefit', '')}
         """
         
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            system_prompt, user_prompt, template="ad_variants"
+        )
         return json.loads(response)
     
     async def generate_workflow(self, description: str) -> Dict[str, Any]:
         """Generate n8n workflow JSON from description"""
-        system_prompt = """You are an expert n8n workflow designer.
-        Convert plain English descriptions into valid n8n workflow JSON.
-        
-        Return a JSON object with these exact fields:
-        - nodes: Array of n8n node objects with proper structure
-        - connections: Object defining connections between nodes
-        - summary: Brief description of what the workflow does
-        
-        Use standard n8n node types like Webhook, HTTP Request, Slack, etc."""
-        
-        user_prompt = f"Create an n8n workflow for: {description}"
-        
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            WORKFLOW_SYSTEM_PROMPT,
+            f"Create an n8n workflow for: {description}",
+            template="generate_workflow",
+        )
         return json.loads(response)
     
+    def stream_workflow(self, description: str) -> AsyncIterator[str]:
+        """Stream n8n workflow JSON from description"""
+        return self.stream_chat(
+            [
+                {"role": "system", "content": WORKFLOW_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Create an n8n workflow for: {description}",
+                },
+            ],
+            max_tokens=2000,
+            template="generate_workflow",
+        )
+
     async def score_content(self, content: str) -> Dict[str, float]:
         """Score content on various rubrics"""
         system_prompt = """You are an expert content evaluator for supplement marketing.
@@ -130,7 +376,9 @@ class LLMService:
         
         user_prompt = f"Score this content: {content}"
         
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            system_prompt, user_prompt, template="score_content", tier="fast"
+        )
         return json.loads(response)
     
     async def check_compliance(self, content: str) -> Dict[str, Any]:
@@ -148,16 +396,76 @@ class LLMService:
         
         user_prompt = f"Check compliance for: {content}"
         
-        response = await self.generate_completion(system_prompt, user_prompt)
+        response = await self.generate_completion(
+            system_prompt, user_prompt, template="check_compliance", tier="balanced"
+        )
         return json.loads(response)
     
     async def generate_embeddings(self, text: str) -> List[float]:
         """Generate embeddings for text using OpenAI"""
-        try:
-            response = self.client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            raise Exception(f"Embedding generation failed: {str(e)}")
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> List[List[float]]:
+        """Embed many texts, reusing stored vectors and batching the rest
+
+        Stored vectors are looked up in one round trip; the remaining unique
+        texts are sent in provider-sized batches, several batches at a time.
+        Vectors are returned in input order.
+        """
+        model = model or settings.embedding_model
+        batch_size = batch_size or settings.embedding_batch_size
+        semaphore = asyncio.Semaphore(concurrency or settings.embedding_concurrency)
+
+        vectors: Dict[str, List[float]] = {}
+        unique_texts = list(dict.fromkeys(texts))
+        for text, vector in zip(
+            unique_texts, embedding_store.get_many(unique_texts, model)
+        ):
+            if vector is not None:
+                vectors[text] = vector
+
+        missing = [text for text in unique_texts if text not in vectors]
+
+        if len(missing) < len(unique_texts):
+            llm_telemetry.record("embedding", model, None, 0.0, cache_status="hit")
+
+        async def embed_batch(batch: List[str]) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                prompt_tokens = sum(prompt_budget.count(text) for text in batch)
+                try:
+                    batch_vectors = await get_transport().embed(model, batch)
+                except Exception as e:
+                    llm_telemetry.record(
+                        "embedding",
+                        model,
+                        None,
+                        time.perf_counter() - started,
+                        prompt_tokens,
+                        outcome="error",
+                    )
+                    raise Exception(f"Embedding generation failed: {str(e)}")
+                llm_telemetry.record(
+                    "embedding",
+                    model,
+                    None,
+                    time.perf_counter() - started,
+                    prompt_tokens,
+                )
+            fresh = dict(zip(batch, batch_vectors))
+            embedding_store.set_many(fresh, model)
+            vectors.update(fresh)
+
+        await asyncio.gather(
+            *[
+                embed_batch(missing[i : i + batch_size])
+                for i in range(0, len(missing), batch_size)
+            ]
+        )
+        return [vectors[text] for text in texts]
@@ -0,0 +1,197 @@
+"""
+Server-sent-event helpers and an incremental JSON parser for streamed LLM output
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+class IncrementalJSONParser:
+    """Emit top-level fields of a streamed JSON object as soon as they complete
+
+    Feed raw model output chunk by chunk. Each top-level field yields a
+    ``field`` event once its value is closed, and each element of a top-level
+    array yields an ``item`` event as soon as that element is closed, so a
+    sequence step can be rendered before the rest of the sequence arrives.
+    Any prose or code fence before the opening brace is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._object_start: Optional[int] = None
+        self._object_end: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "key"  # key -> colon -> value, for the top-level object
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._in_array = False
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The whole object once it has closed and parses"""
+        if not self._done:
+            return None
+        try:
+            return json.loads(self.buffer[self._object_start : self._object_end])
+        except json.JSONDecodeError:
+            return None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk and return the events it completed"""
+        self.buffer += chunk
+        events: List[Dict[str, Any]] = []
+        buffer = self.buffer
+
+        while self._pos < len(buffer) and not self._done:
+            i = self._pos
+            c = buffer[i]
+            self._pos += 1
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._object_start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = json.loads(buffer[self._key_start : i + 1])
+                        self._state = "colon"
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == "key":
+                        self._key_start = i
+                    elif self._state == "value" and self._value_start is None:
+                        self._value_start = i
+                elif self._depth == 2 and self._in_array and self._item_start is None:
+                    self._item_start = i
+                continue
+
+            if c.isspace():
+                continue
+
+            if self._depth == 1:
+                if self._state == "colon":
+                    if c == ":":
+                        self._state = "value"
+                        self._value_start = None
+                    continue
+                if self._state == "value":
+                    if c in ",}":
+                        self._emit(events, "field", buffer[self._value_start : i])
+                        self._state = "key"
+                        if c == "}":
+                            self._finish(i)
+                        continue
+                    if self._value_start is None:
+                        self._value_start = i
+                    if c in "{[":
+                        self._depth = 2
+                        if c == "[":
+                            self._in_array = True
+                            self._item_start = None
+                            self._item_index = 0
+                    continue
+                if c == "}":
+                    self._finish(i)
+                continue
+
+            # Inside a top-level value
+            if self._depth == 2 and self._in_array:
+                if c == "]":
+                    if self._item_start is not None:
+                        self._emit(events, "item", buffer[self._item_start : i])
+                    self._in_array = False
+                    self._depth = 1
+                    continue
+                if c == ",":
+                    self._emit(events, "item", buffer[self._item_start : i])
+                    self._item_start = None
+                    continue
+                if self._item_start is None:
+                    self._item_start = i
+
+            if c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+
+        return events
+
+    def _emit(
+        self, events: List[Dict[str, Any]], kind: str, text: Optional[str]
+    ) -> None:
+        if text is None or not text.strip():
+            return
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if kind == "item":
+            events.append(
+                {
+                    "type": "item",
+                    "field": self._key,
+                    "index": self._item_index,
+                    "value": value,
+                }
+            )
+            self._item_index += 1
+        else:
+            events.append({"type": "field", "field": self._key, "value": value})
+
+    def _finish(self, end: int) -> None:
+        self._done = True
+        self._object_end = end + 1
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def sse_json_stream(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Relay streamed tokens as SSE, plus field/item events as JSON completes
+
+    A ``start`` event is sent before the first token so clients get their
+    first byte immediately; the stream ends with ``done`` carrying the parsed
+    object, or ``error``.
+    """
+    parser = IncrementalJSONParser()
+    yield sse_event("start", {})
+    try:
+        async for delta in tokens:
+            yield sse_event("token", {"delta": delta})
+            for event in parser.feed(delta):
+                yield sse_event(event["type"], event)
+        yield sse_event("done", {"result": parser.result})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
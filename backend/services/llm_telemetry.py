@@ -0,0 +1,304 @@
+"""
+LLM call telemetry: latency histograms, token usage and a daily cost ledger
+"""
+
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import settings
+from services.job_profile import add as add_to_job_profile
+from services.llm_governor import llm_governor
+from services.model_router import MODEL_PRICES
+
+# Upper bounds of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    20000,
+    30000,
+    60000,
+)
+
+CACHE_STATUSES = ("hit", "miss", "bypass", "coalesced")
+OUTCOMES = ("ok", "error", "stale", "cancelled")
+
+# Ledger fields written per workspace, day and template
+LEDGER_FIELDS = (
+    "calls",
+    "errors",
+    "cache_hits",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost_usd",
+)
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Approximate USD cost of one call"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def is_workspace_id(value: Optional[str]) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+class LLMTelemetry:
+    """Per-call LLM metrics aggregated in process and flushed in batches
+
+    Every completion and embedding call records its model, template,
+    workspace, token counts, end-to-end latency, cache status and outcome.
+    Calls feed fixed-bucket latency histograms per template and model, and
+    a per-workspace daily ledger that is added onto ``MetricDaily`` rows in
+    one transaction once enough entries or time have accumulated. Calls
+    without a real workspace only reach the histograms. Database errors
+    keep the pending deltas for the next flush.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.llm_telemetry_enabled,
+        flush_interval: float = settings.llm_telemetry_flush_interval_seconds,
+        flush_batch_size: int = settings.llm_telemetry_flush_batch_size,
+        session_factory=None,
+    ):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._ledger: Dict[Tuple[str, str, str], float] = {}
+        self._last_flush = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self.stats = {"recorded": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0}
+
+    def record(
+        self,
+        kind: str,
+        model: str,
+        template: Optional[str],
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cache_status: str = "miss",
+        outcome: str = "ok",
+        workspace_id: Optional[str] = None,
+    ) -> None:
+        """Record one completion or embedding call"""
+        # Count the wait against the job making the call, when it is profiled
+        add_to_job_profile("llm_calls", 1)
+        add_to_job_profile("llm_tokens", prompt_tokens + completion_tokens)
+        add_to_job_profile("llm_ms", latency * 1000)
+        if not self.enabled:
+            return
+        template = template or ("embedding" if kind == "embedding" else "default")
+        workspace_id = workspace_id or llm_governor.current_workspace()
+        latency_ms = latency * 1000
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                f"{kind}:{template}:{model}",
+                {
+                    "kind": kind,
+                    "template": template,
+                    "model": model,
+                    "calls": 0,
+                    "latency_ms_total": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost_usd": 0.0,
+                    "cache": {status: 0 for status in CACHE_STATUSES},
+                    "outcomes": {name: 0 for name in OUTCOMES},
+                },
+            )
+            histogram["calls"] += 1
+            histogram["latency_ms_total"] += latency_ms
+            histogram["buckets"][bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            histogram["prompt_tokens"] += prompt_tokens
+            histogram["completion_tokens"] += completion_tokens
+            histogram["cost_usd"] += cost
+            histogram["cache"][cache_status] = (
+                histogram["cache"].get(cache_status, 0) + 1
+            )
+            histogram["outcomes"][outcome] = histogram["outcomes"].get(outcome, 0) + 1
+            self.stats["recorded"] += 1
+
+            if is_workspace_id(workspace_id):
+                day = datetime.utcnow().strftime("%Y-%m-%d")
+                values = {
+                    "calls": 1,
+                    "errors": int(outcome == "error"),
+                    "cache_hits": int(cache_status == "hit"),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "cost_usd": cost,
+                }
+                for scope in ("llm", f"llm.{template}"):
+                    for field in LEDGER_FIELDS:
+                        if values[field]:
+                            key = (str(workspace_id), day, f"{scope}.{field}"[:100])
+                            self._ledger[key] = (
+                                self._ledger.get(key, 0.0) + values[field]
+                            )
+
+            due = len(self._ledger) >= self.flush_batch_size or (
+                self._ledger
+                and time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due and not self._flush_lock.locked():
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self) -> int:
+        """Add pending ledger deltas onto MetricDaily rows; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._ledger = self._ledger, {}
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                written = self._write(pending)
+            except Exception as e:
+                print(f"LLM telemetry flush error: {e}")
+                with self._lock:
+                    self.stats["flush_errors"] += 1
+                    for key, value in pending.items():
+                        self._ledger[key] = self._ledger.get(key, 0.0) + value
+                return 0
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += written
+            return written
+
+    def start_flusher(self, interval: Optional[float] = None) -> threading.Thread:
+        """Flush the ledger from a daemon thread of this process every interval"""
+        interval = interval or self.flush_interval
+        if self._flusher is not None and self._flusher.is_alive():
+            return self._flusher
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.flush()
+
+        self._flusher = threading.Thread(
+            target=run, name="llm-telemetry-flusher", daemon=True
+        )
+        self._flusher.start()
+        return self._flusher
+
+    def flusher_running(self) -> bool:
+        """Whether this process flushes periodically; forks do not inherit the thread"""
+        return self._flusher is not None and self._flusher.is_alive()
+
+    def _write(self, pending: Dict[Tuple[str, str, str], float]) -> int:
+        from database import MetricDaily, SessionLocal
+
+        db = (self.session_factory or SessionLocal)()
+        try:
+            # Add onto the day's row in one statement, so concurrent flushes
+            # from the API and every worker neither lose deltas nor duplicate rows
+            table = MetricDaily.__table__
+            dialect = db.get_bind().dialect.name
+            insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["workspace_id", "metric_name", "recorded_on"],
+                set_={"value": table.c.value + statement.excluded.value},
+            )
+            db.execute(
+                statement,
+                [
+                    {
+                        "workspace_id": workspace_id,
+                        "metric_name": metric_name,
+                        "value": value,
+                        "recorded_on": datetime.strptime(day, "%Y-%m-%d"),
+                    }
+                    for (workspace_id, day, metric_name), value in pending.items()
+                ],
+            )
+            db.commit()
+            return len(pending)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Latency histograms with estimated percentiles per call route"""
+        with self._lock:
+            routes = {
+                route: {
+                    **stats,
+                    "buckets": list(stats["buckets"]),
+                    "cache": dict(stats["cache"]),
+                    "outcomes": dict(stats["outcomes"]),
+                }
+                for route, stats in self._histograms.items()
+            }
+        for stats in routes.values():
+            stats["bucket_bounds_ms"] = list(LATENCY_BUCKETS_MS)
+            stats["latency_ms_avg"] = (
+                stats["latency_ms_total"] / stats["calls"] if stats["calls"] else 0.0
+            )
+            for name, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                stats[f"latency_ms_{name}"] = self._quantile(
+                    stats["buckets"], stats["calls"], quantile
+                )
+        return routes
+
+    @staticmethod
+    def _quantile(buckets: List[int], calls: int, quantile: float) -> Optional[float]:
+        """Upper bound of the bucket holding the quantile; None past the last bound"""
+        if not calls:
+            return 0.0
+        seen = 0
+        for index, count in enumerate(buckets):
+            seen += count
+            if seen >= calls * quantile:
+                return (
+                    LATENCY_BUCKETS_MS[index]
+                    if index < len(LATENCY_BUCKETS_MS)
+                    else None
+                )
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Histograms plus flush counters for this process"""
+        with self._lock:
+            pending = len(self._ledger)
+            stats = dict(self.stats)
+        return {"routes": self.histograms(), "pending_ledger_entries": pending, **stats}
+
+    def reset(self) -> None:
+        """Drop in-process histograms and unflushed ledger entries"""
+        with self._lock:
+            self._histograms.clear()
+            self._ledger.clear()
+
+
+# Global LLM telemetry instance
+llm_telemetry = LLMTelemetry()
@@ -0,0 +1,799 @@
+"""
+Pluggable LLM transports: live OpenAI, record, replay and stub
+
+The transport is the last hop under LLMService (and so AIAgentsService). In
+``record`` mode real responses are captured to a fixture directory; ``replay``
+serves them back deterministically with simulated latency; ``stub`` returns
+schema-valid JSON per template without any fixtures. Replay and stub let us
+load-test the API and RQ jobs without calling OpenAI.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import openai
+
+from config import settings
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.llm_client import get_async_client
+from services.llm_governor import LLMCapacityError, Lease, llm_governor
+from services.prompt_budget import prompt_budget
+from services.redis_service import get_async_redis
+
+
+class LLMTransport:
+    """Interface for sending completion and embedding requests"""
+
+    async def complete(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> str:
+        raise NotImplementedError
+
+    async def stream(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class OpenAITransport(LLMTransport):
+    """Live transport over the shared pooled AsyncOpenAI client"""
+
+    async def complete(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> str:
+        response = await get_async_client().chat.completions.create(**params)
+        return response.choices[0].message.content
+
+    async def stream(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        stream = await get_async_client().chat.completions.create(stream=True, **params)
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            # A consumer that stops early must not leave the HTTP response, and its
+            # pooled connection, open
+            await stream.response.aclose()
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        response = await get_async_client().embeddings.create(model=model, input=inputs)
+        vectors: List[List[float]] = [[] for _ in inputs]
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+
+class FixtureStore:
+    """One JSON file per request key in a fixture directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key.rsplit(':', 1)[-1]}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Fixture load error: {e}")
+            return None
+
+    def save(self, key: str, fixture: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename so concurrent recorders never leave partial files
+            tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(fixture, f, indent=2)
+            os.replace(tmp_path, self.path(key))
+        except Exception as e:
+            print(f"Fixture save error: {e}")
+
+
+class LatencyModel:
+    """Simulated upstream timing: lognormal time to first token, normal token rate"""
+
+    def __init__(
+        self,
+        ttft_median_ms: float = settings.llm_synthetic_ttft_median_ms,
+        ttft_sigma: float = settings.llm_synthetic_ttft_sigma,
+        tokens_per_second_mean: float = settings.llm_synthetic_tps_mean,
+        tokens_per_second_stddev: float = settings.llm_synthetic_tps_stddev,
+        seed: int = settings.llm_synthetic_seed,
+    ):
+        self.ttft_median_ms = ttft_median_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second_mean = tokens_per_second_mean
+        self.tokens_per_second_stddev = tokens_per_second_stddev
+        self.seed = seed
+
+    def sample(self, key: str) -> Dict[str, float]:
+        """Deterministic timing for a request key: first-token delay and token rate"""
+        rng = random.Random(f"{self.seed}:{key}")
+        ttft = (
+            rng.lognormvariate(math.log(max(self.ttft_median_ms, 1.0)), self.ttft_sigma)
+            / 1000
+        )
+        rate = max(
+            1.0, rng.gauss(self.tokens_per_second_mean, self.tokens_per_second_stddev)
+        )
+        return {"ttft": ttft, "tokens_per_second": rate}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class SimulatedTransport(LLMTransport):
+    """Base for offline transports that pace canned content like the real API"""
+
+    def __init__(
+        self,
+        latency_mode: str = settings.llm_simulated_latency,
+        latency_model: Optional[LatencyModel] = None,
+    ):
+        self.latency_mode = latency_mode
+        self.latency_model = latency_model or LatencyModel()
+
+    def content_for(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Return {"content": ..., "latency_ms": optional recorded latency}"""
+        raise NotImplementedError
+
+    def _timing(
+        self, key: str, content: str, fixture: Dict[str, Any]
+    ) -> Dict[str, float]:
+        if self.latency_mode == "none":
+            return {"ttft": 0.0, "per_token": 0.0}
+        if self.latency_mode == "recorded" and fixture.get("latency_ms") is not None:
+            return {"ttft": fixture["latency_ms"] / 1000, "per_token": 0.0}
+        timing = self.latency_model.sample(key)
+        return {"ttft": timing["ttft"], "per_token": 1 / timing["tokens_per_second"]}
+
+    async def complete(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> str:
+        fixture = self.content_for(key, template, params)
+        content = fixture["content"]
+        timing = self._timing(key, content, fixture)
+        await asyncio.sleep(
+            timing["ttft"] + timing["per_token"] * estimate_tokens(content)
+        )
+        return content
+
+    async def stream(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        fixture = self.content_for(key, template, params)
+        content = fixture["content"]
+        timing = self._timing(key, content, fixture)
+        await asyncio.sleep(timing["ttft"])
+        # Emit roughly one token per chunk, paced at the sampled token rate
+        for i in range(0, len(content), 4):
+            if timing["per_token"]:
+                await asyncio.sleep(timing["per_token"])
+            yield content[i : i + 4]
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        return [stub_embedding(text, model) for text in inputs]
+
+
+def stub_embedding(
+    text: str, model: str, dimension: int = settings.embedding_dimension
+) -> List[float]:
+    """Deterministic unit vector derived from the text"""
+    rng = random.Random(hashlib.sha256(f"{model}:{text}".encode()).hexdigest())
+    vector = [rng.gauss(0, 1) for _ in range(dimension)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _ad_variant(angle: str) -> Dict[str, Any]:
+    return {
+        "hook": f"Stub {angle} hook",
+        "body": f"Stub {angle} body copy.",
+        "cta": "Shop now",
+        "targeting_hints": ["stub audience"],
+    }
+
+
+def _sequence_step(step: int) -> Dict[str, Any]:
+    return {
+        "step": step,
+        "day": (step - 1) * 3,
+        "subject": f"Stub subject {step}",
+        "email_body": f"Stub email body for step {step}.",
+        "personalization_score": 80,
+        "call_to_action": "Schedule a call",
+        "wait_days": 3,
+    }
+
+
+# Schema-valid example payloads per template, used by stub mode and as the
+# replay fallback when a fixture is missing
+STUB_RESPONSES: Dict[str, Callable[[], Any]] = {
+    "offer_creator": lambda: {
+        "promise": "Stub promise",
+        "proof_pillars": ["Stub study", "Stub testimonial", "Stub guarantee"],
+        "price": "$97",
+        "guarantee": "30-day money-back guarantee",
+        "cta": "Order now",
+        "landing_blurb": "Stub landing page blurb.",
+    },
+    "cold_email": lambda: {
+        "subject": "Stub subject",
+        "body": "Stub cold email body.",
+        "tone": "professional",
+        "compliance_notes": "None",
+    },
+    "ad_variants": lambda: {
+        "proof_based": _ad_variant("proof"),
+        "transformation": _ad_variant("transformation"),
+        "social_proof": _ad_variant("social proof"),
+    },
+    "generate_workflow": lambda: {
+        "nodes": [{"id": "1", "type": "n8n-nodes-base.webhook", "name": "Webhook"}],
+        "connections": {},
+        "summary": "Stub workflow",
+    },
+    "score_content": lambda: {
+        "clarity": 0.8,
+        "specificity": 0.7,
+        "compliance": 0.9,
+        "brand_match": 0.8,
+    },
+    "check_compliance": lambda: {
+        "risk_score": 0.2,
+        "findings": [],
+        "suggested_rewrite": "Stub compliant rewrite.",
+    },
+    "analyze_niche": lambda: {
+        "market_size": "$2.4B",
+        "competition_level": "Medium",
+        "growth_rate": "23% YoY",
+        "profitability_score": 85.0,
+        "opportunities": ["Stub opportunity"],
+        "challenges": ["Stub challenge"],
+        "target_audience": "Stub audience",
+        "pricing_range": "$5K-$50K",
+        "revenue_potential": "$1M+ annually",
+    },
+    "generate_cold_email": lambda: {
+        "subject": "Stub subject",
+        "body": "Stub cold email body.",
+        "personalization_score": 85.0,
+        "reply_probability": 18.0,
+        "tone": "Professional",
+        "compliance_notes": "None",
+        "follow_up_sequence": [_sequence_step(2), _sequence_step(3)],
+    },
+    "handle_reply": lambda: {
+        "response_text": "Stub reply.",
+        "qualification_score": 70,
+        "next_action": "book_meeting",
+        "meeting_slots": [],
+        "confidence_level": 80,
+    },
+    "generate_ad_variants": lambda: {
+        angle: _ad_variant(angle)
+        for angle in (
+            "proof_based",
+            "transformation",
+            "social_proof",
+            "urgency",
+            "curiosity",
+        )
+    },
+    "analyze_sales_call": lambda: {
+        "overall_score": 75,
+        "sections": {
+            "opening": 80,
+            "discovery": 70,
+            "pitch": 75,
+            "objection_handling": 70,
+            "closing": 80,
+        },
+        "strengths": ["Stub strength"],
+        "improvements": ["Stub improvement"],
+        "coaching_tips": ["Stub tip"],
+        "next_steps": ["Stub next step"],
+    },
+    "provide_growth_advice": lambda: {
+        "answer": "Stub answer.",
+        "recommendations": ["Stub recommendation"],
+        "timeline": "90 days",
+        "expected_outcomes": {},
+        "challenges": [],
+        "resources": [],
+        "success_indicators": [],
+    },
+    "create_growth_plan": lambda: {
+        "title": "Stub Growth Plan",
+        "phases": [{"name": "Phase 1", "days": 30}],
+        "budget_allocation": {"ads": 0.5, "content": 0.5},
+        "expected_outcomes": {"revenue_growth": "20%"},
+        "kpis": ["MRR"],
+        "resources_needed": ["Stub resource"],
+    },
+    "create_campaign": lambda: {
+        "strategy": "Stub strategy",
+        "segments": ["Stub segment"],
+        "email_sequence": [_sequence_step(step) for step in range(1, 6)],
+        "ab_tests": [],
+        "timing": {"send_window": "09:00-11:00"},
+    },
+    "ad_variant": lambda: {
+        "headline": "Stub headline",
+        "subheadline": "Stub subheadline",
+        "body": "Stub body copy.",
+        "cta": "Shop now",
+        "visual_suggestions": ["Stub visual"],
+        "targeting": ["Stub audience"],
+    },
+    "sequence_step": lambda: {
+        "subject": "Stub subject",
+        "email_body": "Stub email body.",
+        "personalization_score": 80,
+        "call_to_action": "Schedule a call",
+    },
+    "campaign_strategy": lambda: {
+        "strategy": "Stub strategy",
+        "segments": ["Stub segment"],
+        "ab_tests": [],
+        "timing": {"send_window": "09:00-11:00"},
+    },
+    "classify_intent": lambda: {
+        "reply_type": "positive",
+        "urgency": "medium",
+        "book_meeting": True,
+        "sentiment": "positive",
+        "key_topics": ["pricing"],
+    },
+    "analyze_transcript": lambda: {
+        "highlights": ["Stub highlight"],
+        "objections": ["Stub objection"],
+        "actions": ["Stub action"],
+        "coaching": ["Stub coaching tip"],
+    },
+    "cold_email_writer": lambda: {
+        "subject": "Stub subject",
+        "email_body": "Stub email body.",
+        "personalization_score": 80,
+        "call_to_action": "Schedule a call",
+        "follow_up_suggestions": ["Follow up in 3 days"],
+    },
+    "email_sequence": lambda: {
+        "sequence": [_sequence_step(step) for step in range(1, 6)],
+        "total_emails": 5,
+        "estimated_duration_days": 12,
+        "success_metrics": {
+            "expected_open_rate": "25-35%",
+            "expected_reply_rate": "8-12%",
+            "expected_meeting_rate": "2-5%",
+        },
+    },
+    "niche_research": lambda: {
+        "recommended_niches": [
+            {
+                "name": "Stub niche",
+                "profitability_score": 85,
+                "market_size": "$50B",
+                "competition_level": "Medium",
+                "entry_barrier": "Low",
+                "description": "Stub description",
+            }
+        ],
+        "market_analysis": {
+            "total_addressable_market": "$75B",
+            "growth_rate": "15%",
+            "key_trends": [],
+        },
+        "implementation_strategy": ["Stub step"],
+        "risk_assessment": {
+            "market_risk": "Low",
+            "competition_risk": "Medium",
+            "technical_risk": "Low",
+        },
+    },
+}
+
+
+def stub_content(template: Optional[str]) -> str:
+    """Schema-valid JSON for a template"""
+    builder = STUB_RESPONSES.get(template or "")
+    return json.dumps(
+        builder() if builder else {"result": "stub", "template": template}
+    )
+
+
+class StubTransport(SimulatedTransport):
+    """Serve schema-valid JSON per template, no fixtures needed"""
+
+    def __init__(
+        self,
+        latency_mode: str = settings.llm_simulated_latency,
+        latency_model: Optional[LatencyModel] = None,
+    ):
+        # Nothing was recorded, so "recorded" falls back to the synthetic model
+        super().__init__(
+            "synthetic" if latency_mode == "recorded" else latency_mode, latency_model
+        )
+
+    def content_for(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return {"content": stub_content(template)}
+
+
+class ReplayTransport(SimulatedTransport):
+    """Serve recorded responses; missing fixtures fall back to stub content"""
+
+    def __init__(
+        self,
+        store: Optional[FixtureStore] = None,
+        latency_mode: str = settings.llm_simulated_latency,
+        latency_model: Optional[LatencyModel] = None,
+    ):
+        super().__init__(latency_mode, latency_model)
+        self.store = store or FixtureStore(settings.llm_fixture_dir)
+        self.misses = 0
+
+    def content_for(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        fixture = self.store.load(key)
+        if fixture is None:
+            self.misses += 1
+            print(f"No LLM fixture for {template or 'unknown'} ({key}); serving stub")
+            return {"content": stub_content(template)}
+        return fixture
+
+
+class RecordingTransport(LLMTransport):
+    """Pass requests to a live transport and capture responses as fixtures"""
+
+    def __init__(
+        self, inner: Optional[LLMTransport] = None, store: Optional[FixtureStore] = None
+    ):
+        self.inner = inner or OpenAITransport()
+        self.store = store or FixtureStore(settings.llm_fixture_dir)
+
+    def _save(
+        self,
+        key: str,
+        template: Optional[str],
+        params: Dict[str, Any],
+        content: str,
+        started: float,
+    ) -> None:
+        self.store.save(
+            key,
+            {
+                "template": template,
+                "model": params.get("model"),
+                "temperature": params.get("temperature"),
+                "content": content,
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                "recorded_at": time.time(),
+            },
+        )
+
+    async def complete(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> str:
+        started = time.monotonic()
+        content = await self.inner.complete(key, template, params)
+        self._save(key, template, params, content, started)
+        return content
+
+    async def stream(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        started = time.monotonic()
+        parts = []
+        async for delta in self.inner.stream(key, template, params):
+            parts.append(delta)
+            yield delta
+        self._save(key, template, params, "".join(parts), started)
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        # Embeddings are not recorded; replay and stub derive them from the text
+        return await self.inner.embed(model, inputs)
+
+
+class StaleContent(str):
+    """A last-known-good response served while upstream is unhealthy
+
+    JSON object responses also carry ``"_stale": true`` so API clients can
+    tell. LLMService never writes stale content back into the response cache.
+    """
+
+    stale = True
+
+    @classmethod
+    def mark(cls, content: str) -> "StaleContent":
+        try:
+            payload = json.loads(content)
+        except (TypeError, ValueError):
+            return cls(content)
+        if isinstance(payload, dict):
+            payload["_stale"] = True
+            return cls(json.dumps(payload))
+        return cls(content)
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy
+
+    Timeouts, lost connections, 429s and 5xx count. Bad requests, auth errors
+    and our own bugs say nothing about its health.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class ResilientTransport(LLMTransport):
+    """Circuit breaker, hedged requests and stale-serve around another transport
+
+    One breaker per model trips on error rate or p95 latency and then fails
+    fast. Low-temperature calls, whose duplicates are interchangeable, send a
+    hedged second request when the first is slower than the hedge delay and
+    a governor slot is free for it. Every good answer is kept as a
+    long-lived stale copy that is served when the breaker is open or the
+    call fails.
+    """
+
+    def __init__(
+        self,
+        inner: LLMTransport,
+        redis_client: Callable[[], Any] = get_async_redis,
+        hedge_delay: float = settings.llm_hedge_delay_seconds,
+        hedge_max_temperature: float = settings.llm_hedge_max_temperature,
+        stale_ttl: int = settings.llm_stale_ttl_seconds,
+    ):
+        self.inner = inner
+        self.redis_client = redis_client
+        self.hedge_delay = hedge_delay
+        self.hedge_max_temperature = hedge_max_temperature
+        self.stale_ttl = stale_ttl
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats = {
+            "hedges": 0,
+            "hedge_wins": 0,
+            "hedges_skipped": 0,
+            "stale_served": 0,
+            "fast_failures": 0,
+        }
+
+    def breaker_for(self, model: Optional[str]) -> CircuitBreaker:
+        name = model or "default"
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(f"llm:{name}")
+        return self.breakers[name]
+
+    def _stale_key(self, key: str) -> str:
+        return f"llm:stale:{key.rsplit(':', 1)[-1]}"
+
+    async def _serve_stale(self, key: str, error: Exception) -> str:
+        try:
+            stored = await self.redis_client().get(self._stale_key(key))
+            stale = json.loads(stored) if stored else None
+        except Exception as e:
+            print(f"Redis stale read error: {e}")
+            stale = None
+        if isinstance(stale, str):
+            self.stats["stale_served"] += 1
+            return StaleContent.mark(stale)
+        raise error
+
+    async def _keep_stale(self, key: str, content: str) -> None:
+        try:
+            await self.redis_client().set(
+                self._stale_key(key), json.dumps(content), ex=self.stale_ttl
+            )
+        except Exception as e:
+            print(f"Redis stale write error: {e}")
+
+    @staticmethod
+    def _record(breaker: CircuitBreaker, started: float, error: BaseException) -> None:
+        if is_upstream_failure(error):
+            breaker.record(time.monotonic() - started, ok=False)
+        else:
+            breaker.abandon(time.monotonic() - started)
+
+    async def _call(
+        self,
+        breaker: CircuitBreaker,
+        key: str,
+        template: Optional[str],
+        params: Dict[str, Any],
+    ) -> str:
+        started = time.monotonic()
+        try:
+            content = await self.inner.complete(key, template, params)
+        except asyncio.CancelledError:
+            breaker.abandon(time.monotonic() - started)
+            raise
+        except Exception as e:
+            self._record(breaker, started, e)
+            raise
+        breaker.record(time.monotonic() - started, ok=True)
+        return content
+
+    @staticmethod
+    async def _hedge_slot(params: Dict[str, Any]) -> Optional[Lease]:
+        """A governor slot for the duplicate request, without waiting
+
+        Raises LLMCapacityError when none is free.
+        """
+        if not llm_governor.enabled:
+            return None
+        estimated_tokens = prompt_budget.counter.count_messages(
+            params.get("messages", [])
+        ) + (
+            params.get("max_tokens") or settings.llm_governor_completion_tokens_estimate
+        )
+        return await llm_governor.acquire(estimated_tokens, wait_timeout=0)
+
+    async def _hedged(
+        self,
+        breaker: CircuitBreaker,
+        key: str,
+        template: Optional[str],
+        params: Dict[str, Any],
+    ) -> str:
+        primary = asyncio.ensure_future(self._call(breaker, key, template, params))
+        tasks = {primary}
+        lease: Optional[Lease] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                # The duplicate is a second upstream call, so it needs a slot of its own
+                try:
+                    lease = await self._hedge_slot(params)
+                except LLMCapacityError:
+                    self.stats["hedges_skipped"] += 1
+                else:
+                    if breaker.allow():
+                        self.stats["hedges"] += 1
+                        tasks.add(
+                            asyncio.ensure_future(
+                                self._call(breaker, key, template, params)
+                            )
+                        )
+                    elif lease is not None:
+                        await llm_governor.release(lease)
+                        lease = None
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if lease is not None:
+                await llm_governor.release(lease)
+
+    async def complete(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> str:
+        breaker = self.breaker_for(params.get("model"))
+        if not breaker.allow():
+            self.stats["fast_failures"] += 1
+            return await self._serve_stale(
+                key, CircuitOpenError(f"LLM circuit open for {breaker.name}")
+            )
+
+        hedge = (
+            self.hedge_delay > 0
+            and params.get("temperature", 1.0) <= self.hedge_max_temperature
+        )
+        try:
+            if hedge:
+                content = await self._hedged(breaker, key, template, params)
+            else:
+                content = await self._call(breaker, key, template, params)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return await self._serve_stale(key, e)
+
+        if content:
+            await self._keep_stale(key, content)
+        return content
+
+    async def stream(
+        self, key: str, template: Optional[str], params: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        breaker = self.breaker_for(params.get("model"))
+        if not breaker.allow():
+            self.stats["fast_failures"] += 1
+            yield await self._serve_stale(
+                key, CircuitOpenError(f"LLM circuit open for {breaker.name}")
+            )
+            return
+
+        started = time.monotonic()
+        parts = []
+        try:
+            async for delta in self.inner.stream(key, template, params):
+                parts.append(delta)
+                yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            breaker.abandon(time.monotonic() - started)
+            raise
+        except Exception as e:
+            self._record(breaker, started, e)
+            if parts:
+                raise
+            yield await self._serve_stale(key, e)
+            return
+
+        breaker.record(time.monotonic() - started, ok=True)
+        content = "".join(parts)
+        if content:
+            await self._keep_stale(key, content)
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        return await self.inner.embed(model, inputs)
+
+
+_transport: Optional[LLMTransport] = None
+
+
+def build_transport(mode: str) -> LLMTransport:
+    """Create the transport for a mode: live, record, replay or stub"""
+    if mode == "replay":
+        return ReplayTransport()
+    if mode == "stub":
+        return StubTransport()
+    transport = RecordingTransport() if mode == "record" else OpenAITransport()
+    if settings.llm_breaker_enabled:
+        return ResilientTransport(transport)
+    return transport
+
+
+def get_transport() -> LLMTransport:
+    """The process-wide transport selected by LLM_TRANSPORT_MODE"""
+    global _transport
+    if _transport is None:
+        _transport = build_transport(settings.llm_transport_mode)
+    return _transport
+
+
+def set_transport(transport: Optional[LLMTransport]) -> None:
+    """Override the process-wide transport (None re-reads the settings)"""
+    global _transport
+    _transport = transport
@@ -0,0 +1,140 @@
+"""
+Latency-tiered model routing for LLM templates and agent tools
+"""
+
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from config import settings
+
+TIERS = ("fast", "balanced", "quality")
+DEFAULT_TIER = "quality"
+
+# Approximate USD per 1K (prompt, completion) tokens, for cost stats only
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-3.5-turbo": (0.001, 0.002),
+    "gpt-3.5-turbo-1106": (0.001, 0.002),
+    "text-embedding-ada-002": (0.0001, 0.0),
+    "text-embedding-3-small": (0.00002, 0.0),
+}
+
+
+def parse_routing_table(raw: str) -> Dict[str, str]:
+    """Parse a JSON object of template -> tier or model name"""
+    if not raw:
+        return {}
+    try:
+        table = json.loads(raw)
+        return {str(template): str(target) for template, target in table.items()}
+    except Exception as e:
+        print(f"Invalid LLM routing table: {e}")
+        return {}
+
+
+class ModelRouter:
+    """Pick a model per call from the template's declared tier
+
+    Templates and tools declare a tier (fast for classification and
+    scoring, balanced for short structured replies, quality for long-form
+    generation). The routing table from settings overrides declarations
+    and may name a tier or a concrete model, so a route can be moved
+    without a deploy.
+    """
+
+    def __init__(
+        self,
+        tier_models: Optional[Dict[str, str]] = None,
+        routes: Optional[Dict[str, str]] = None,
+        default_tier: str = DEFAULT_TIER,
+    ):
+        self.tier_models = tier_models or {
+            "fast": settings.llm_model_fast,
+            "balanced": settings.llm_model_balanced,
+            "quality": settings.llm_model_quality,
+        }
+        self.routes = (
+            dict(routes)
+            if routes is not None
+            else parse_routing_table(settings.llm_routing_table)
+        )
+        self.default_tier = default_tier
+        self.declared: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def declare(self, template: str, tier: str) -> None:
+        """Declare the tier a template or tool runs on"""
+        if tier not in TIERS:
+            raise ValueError(f"Unknown model tier {tier}")
+        self.declared[template] = tier
+
+    def resolve(
+        self,
+        template: Optional[str] = None,
+        tier: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> str:
+        """Model for a call; an explicit model always wins"""
+        if model:
+            return model
+        target = (
+            self.routes.get(template or "")
+            or tier
+            or self.declared.get(template or "")
+            or self.default_tier
+        )
+        return self.tier_models.get(target, target)
+
+    def record(
+        self,
+        template: Optional[str],
+        model: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: bool = False,
+    ) -> None:
+        """Add one upstream call to the per-route latency and cost stats"""
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self._stats.setdefault(
+                f"{template or 'default'}:{model}",
+                {
+                    "template": template or "default",
+                    "model": model,
+                    "calls": 0,
+                    "errors": 0,
+                    "latency_ms_total": 0.0,
+                    "latency_ms_max": 0.0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost_usd": 0.0,
+                },
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["latency_ms_total"] += latency * 1000
+            stats["latency_ms_max"] = max(stats["latency_ms_max"], latency * 1000)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += (
+                prompt_tokens * prompt_price + completion_tokens * completion_price
+            ) / 1000
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latency and cost per template/model route for this process"""
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._stats.items()}
+        for stats in routes.values():
+            stats["latency_ms_avg"] = (
+                stats["latency_ms_total"] / stats["calls"] if stats["calls"] else 0.0
+            )
+        return routes
+
+
+# Global model router instance
+model_router = ModelRouter()
@@ -0,0 +1,258 @@
+"""
+Token-aware prompt budgeting and context compaction
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional, falls back to an estimate
+    tiktoken = None
+
+# Input token budgets for the variable part of each template's prompt
+# (history, profile, transcript); templates not listed use the default.
+TEMPLATE_BUDGETS: Dict[str, int] = {
+    "handle_reply": 2500,
+    "analyze_sales_call": 6000,
+    "analyze_transcript": 6000,
+}
+
+# How a handle_reply budget is split between the thread and the profile
+HISTORY_SHARE = 0.8
+
+# Transcript turns worth keeping when the middle of a call has to be dropped
+SIGNAL_WORDS = re.compile(
+    r"\b(price|pricing|cost|budget|expensive|contract|decision|approve|timeline|"
+    r"competitor|concern|worried|problem|issue|next step|follow up|demo|trial|"
+    r"pilot|sign|deadline)\b",
+    re.IGNORECASE,
+)
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """Local token counts: tiktoken when installed, otherwise a close estimate"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"Tokenizer load error: {e}")
+
+    def count(self, text: str) -> int:
+        """Tokens in a piece of text"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Words average ~1.3 tokens; punctuation is usually a token of its own
+        pieces = _TOKEN_PIECES.findall(text)
+        words = sum(1 for piece in pieces if piece[0].isalnum() or piece[0] == "_")
+        return int(words * 1.3) + (len(pieces) - words)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens in a chat request, including per-message framing"""
+        return (
+            sum(4 + self.count(message.get("content") or "") for message in messages)
+            + 2
+        )
+
+
+class PromptBudget:
+    """Keep the variable parts of prompts inside a per-template token budget
+
+    Conversation history keeps its most recent turns and folds older ones
+    into a short extractive summary; transcripts keep the opening, the close
+    and the turns in between that mention pricing, objections or next steps.
+    Everything is local, so compaction adds no extra LLM round trip.
+    """
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        default_budget: int = settings.llm_prompt_token_budget,
+    ):
+        self.counter = counter or TokenCounter()
+        self.default_budget = default_budget
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def budget_for(self, template: Optional[str]) -> int:
+        """Token budget for a template"""
+        return TEMPLATE_BUDGETS.get(template or "", self.default_budget)
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def fit_history(
+        self, history: List[Dict[str, Any]], budget: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Most recent messages that fit, plus a summary of the ones dropped
+
+        The newest message is shortened when it alone is over budget, and
+        summarized with the rest when even that does not make it fit.
+        """
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        for message in reversed(history):
+            tokens = self._message_tokens(message)
+            if used + tokens > budget:
+                if kept:
+                    break
+                message = self._fit_message(message, budget)
+                tokens = self._message_tokens(message)
+                if tokens > budget:
+                    break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+
+        dropped = history[: len(history) - len(kept)]
+        if not dropped:
+            return kept, None
+        summary = self._summarize(dropped, budget - used)
+        return kept, summary
+
+    def _message_tokens(self, message: Dict[str, Any]) -> int:
+        return self.count(json.dumps(message, separators=(",", ":"), default=str))
+
+    def _fit_message(self, message: Dict[str, Any], budget: int) -> Dict[str, Any]:
+        """Shorten a message's long string values until it fits, as far as they go"""
+        fitted = message
+        limit = 400
+        while self._message_tokens(fitted) > budget and limit >= 25:
+            fitted = self._shorten(message, limit)
+            limit //= 2
+        return fitted
+
+    def _summarize(self, messages: List[Dict[str, Any]], budget: int) -> str:
+        """First sentence of each dropped message, newest last, within budget"""
+        lines = [f"{len(messages)} earlier messages, condensed:"]
+        used = self.count(lines[0])
+        for message in reversed(messages):
+            sender = (
+                message.get("role")
+                or message.get("from")
+                or message.get("sender")
+                or "message"
+            )
+            text = str(
+                message.get("content")
+                or message.get("text")
+                or message.get("body")
+                or ""
+            )
+            first_sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0][
+                :200
+            ]
+            line = f"- {sender}: {first_sentence}"
+            tokens = self.count(line)
+            if used + tokens > budget:
+                break
+            lines.insert(1, line)
+            used += tokens
+        return "\n".join(lines)
+
+    def compact_json(self, value: Any, budget: int) -> str:
+        """Compact JSON, shortening long string values until it fits"""
+        text = json.dumps(value, separators=(",", ":"), default=str)
+        limit = 400
+        while self.count(text) > budget and limit >= 25:
+            text = json.dumps(
+                self._shorten(value, limit), separators=(",", ":"), default=str
+            )
+            limit //= 2
+        return self.truncate(text, budget)
+
+    def _shorten(self, value: Any, limit: int) -> Any:
+        if isinstance(value, str):
+            return value if len(value) <= limit else value[:limit] + "..."
+        if isinstance(value, dict):
+            return {key: self._shorten(item, limit) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._shorten(item, limit) for item in value]
+        return value
+
+    def truncate(self, text: str, budget: int) -> str:
+        """Hard cut to roughly the budget, for text with no structure to exploit"""
+        tokens = self.count(text)
+        if tokens <= budget:
+            return text
+        return text[: int(len(text) * budget / tokens)] + " [truncated]"
+
+    def compact_transcript(self, transcript: str, budget: int) -> str:
+        """Keep the opening, the close and the highest-signal turns in between"""
+        if self.count(transcript) <= budget:
+            return transcript
+        turns = [line for line in transcript.splitlines() if line.strip()]
+        if len(turns) < 3:
+            return self.truncate(transcript, budget)
+
+        costs = [self.count(turn) for turn in turns]
+        keep = set()
+
+        def take(indexes, allowance: int) -> int:
+            spent = 0
+            for i in indexes:
+                if i in keep:
+                    continue
+                if spent + costs[i] > allowance:
+                    break
+                keep.add(i)
+                spent += costs[i]
+            return spent
+
+        spent = take(range(len(turns)), int(budget * 0.25))
+        spent += take(range(len(turns) - 1, -1, -1), int(budget * 0.35))
+        middle = [i for i in range(len(turns)) if i not in keep]
+        middle.sort(
+            key=lambda i: (len(SIGNAL_WORDS.findall(turns[i])) + turns[i].count("?")),
+            reverse=True,
+        )
+        remaining = budget - spent
+        for i in middle:
+            if costs[i] <= remaining:
+                keep.add(i)
+                remaining -= costs[i]
+
+        lines: List[str] = []
+        skipped = 0
+        for i, turn in enumerate(turns):
+            if i in keep:
+                if skipped:
+                    lines.append(f"[... {skipped} turns omitted ...]")
+                    skipped = 0
+                lines.append(turn)
+            else:
+                skipped += 1
+        if skipped:
+            lines.append(f"[... {skipped} turns omitted ...]")
+        return "\n".join(lines)
+
+    def record(self, template: Optional[str], prompt_tokens: int) -> None:
+        """Count the prompt tokens sent for a template"""
+        with self._lock:
+            stats = self._stats.setdefault(
+                template or "default",
+                {"calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0},
+            )
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Prompt token usage per template for this process"""
+        with self._lock:
+            return {template: dict(stats) for template, stats in self._stats.items()}
+
+
+# Global prompt budget instance
+prompt_budget = PromptBudget()
@@ -0,0 +1,212 @@
+"""
+Incremental queue counters and per-minute throughput series in Redis
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.fair_queue import sub_queues
+
+# Gauges of jobs waiting and running, and running totals of outcomes
+COUNTERS = ("queued", "started", "finished", "failed", "retried")
+GAUGES = ("queued", "started")
+
+SERIES_METRICS = (
+    "enqueued",
+    "started",
+    "finished",
+    "failed",
+    "wait_ms",
+    "startup_ms",
+    "run_ms",
+)
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class QueueStats:
+    """Queue counters and throughput kept up to date as jobs change state
+
+    Every enqueue, start and finish increments a counters hash and a hash
+    for the current minute, fielded by queue, job type and metric, in one
+    pipeline. Reading the stats is then one HGETALL plus one per minute of
+    the window, instead of counting every queue and registry. Counters can
+    drift when a worker dies mid-job, so ``reconcile`` resets the gauges
+    from the queues now and then.
+    """
+
+    def __init__(
+        self,
+        redis,
+        prefix: str = "job:stats",
+        retention_minutes: int = settings.job_stats_retention_minutes,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.retention_minutes = retention_minutes
+        self.counts_key = f"{prefix}:counts"
+
+    def _minute_key(self, minute: int) -> str:
+        return f"{self.prefix}:minute:{minute}"
+
+    def _record(
+        self,
+        queue: str,
+        job_type: str,
+        counts: Dict[str, int],
+        series: Dict[str, int],
+        pipeline=None,
+    ) -> None:
+        try:
+            pipe = (
+                pipeline
+                if pipeline is not None
+                else self.redis.pipeline(transaction=False)
+            )
+            for name, amount in counts.items():
+                pipe.hincrby(self.counts_key, f"{queue}:{name}", amount)
+            minute_key = self._minute_key(int(time.time() // 60))
+            for metric, amount in series.items():
+                pipe.hincrby(minute_key, f"{queue}:{job_type}:{metric}", amount)
+            pipe.expire(minute_key, (self.retention_minutes + 1) * 60)
+            if pipeline is None:
+                pipe.execute()
+        except Exception as e:
+            print(f"Redis queue stats error: {e}")
+
+    def enqueued(
+        self, queue: str, job_type: str, count: int = 1, pipeline=None
+    ) -> None:
+        """Jobs pushed onto a queue, optionally on a caller's pipeline"""
+        self._record(queue, job_type, {"queued": count}, {"enqueued": count}, pipeline)
+
+    def started(
+        self,
+        queue: str,
+        job_type: str,
+        enqueued_at: Optional[datetime],
+        startup_seconds: Optional[float] = None,
+    ) -> None:
+        """A worker picked a job up ``startup_seconds`` after taking it off the queue"""
+        series = {"started": 1}
+        if enqueued_at:
+            waited = datetime.utcnow() - enqueued_at.replace(tzinfo=None)
+            series["wait_ms"] = max(0, int(waited.total_seconds() * 1000))
+        if startup_seconds is not None:
+            series["startup_ms"] = max(0, int(startup_seconds * 1000))
+        self._record(queue, job_type, {"queued": -1, "started": 1}, series)
+
+    def finished(
+        self,
+        queue: str,
+        job_type: str,
+        run_seconds: float,
+        failed: bool = False,
+        retrying: bool = False,
+    ) -> None:
+        """A job returned or raised; a failure with retries left is queued again"""
+        counts = {"started": -1}
+        if retrying:
+            counts.update(queued=1, retried=1)
+        else:
+            counts["failed" if failed else "finished"] = 1
+        series = {
+            "failed" if failed else "finished": 1,
+            "run_ms": int(run_seconds * 1000),
+        }
+        self._record(queue, job_type, counts, series)
+
+    def counts(self, queues: List[str]) -> Dict[str, Dict[str, int]]:
+        """Current counters per queue"""
+        stats = {queue: {name: 0 for name in COUNTERS} for queue in queues}
+        try:
+            raw = self.redis.hgetall(self.counts_key)
+        except Exception as e:
+            print(f"Redis queue stats read error: {e}")
+            return stats
+        for field, value in raw.items():
+            queue, _, name = _text(field).rpartition(":")
+            if queue in stats and name in COUNTERS:
+                # Gauges can dip below zero between reconciles
+                stats[queue][name] = (
+                    max(0, int(value)) if name in GAUGES else int(value)
+                )
+        return stats
+
+    def series(self, minutes: int = 60) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Per-minute throughput and latency by queue and job type, oldest first
+
+        Minutes without activity for a queue and job type are left out.
+        """
+        minutes = max(1, min(minutes, self.retention_minutes))
+        current = int(time.time() // 60)
+        window = list(range(current - minutes + 1, current + 1))
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for minute in window:
+                pipe.hgetall(self._minute_key(minute))
+            buckets = pipe.execute()
+        except Exception as e:
+            print(f"Redis queue stats read error: {e}")
+            return {}
+
+        series: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for minute, raw in zip(window, buckets):
+            points: Dict[tuple, Dict[str, int]] = {}
+            for field, value in raw.items():
+                queue, job_type, metric = _text(field).rsplit(":", 2)
+                points.setdefault((queue, job_type), {})[metric] = int(value)
+            for (queue, job_type), values in sorted(points.items()):
+                point = {"minute": datetime.utcfromtimestamp(minute * 60).isoformat()}
+                point.update(
+                    {metric: values.get(metric, 0) for metric in SERIES_METRICS}
+                )
+                point["avg_wait_ms"] = (
+                    point["wait_ms"] // point["started"] if point["started"] else None
+                )
+                point["avg_startup_ms"] = (
+                    point["startup_ms"] // point["started"]
+                    if point["started"]
+                    else None
+                )
+                completed = point["finished"] + point["failed"]
+                point["avg_run_ms"] = (
+                    point["run_ms"] // completed if completed else None
+                )
+                series.setdefault(queue, {}).setdefault(job_type, []).append(point)
+        return series
+
+    def reconcile(self, queues) -> None:
+        """Reset the gauges from the queues, their sub-queues and started registries"""
+        try:
+            gauges = {}
+            for queue in queues:
+                members = [queue] + sub_queues(self.redis, queue)
+                gauges[f"{queue.name}:queued"] = sum(len(member) for member in members)
+                gauges[f"{queue.name}:started"] = sum(
+                    len(member.started_job_registry) for member in members
+                )
+            self.redis.hset(self.counts_key, mapping=gauges)
+        except Exception as e:
+            print(f"Redis queue stats reconcile error: {e}")
+
+    def start_reconciler(
+        self, queues, interval: float = settings.job_stats_reconcile_interval_seconds
+    ) -> threading.Thread:
+        """Reconcile the gauges from a daemon thread every interval"""
+
+        def run():
+            while True:
+                self.reconcile(queues)
+                time.sleep(interval)
+
+        thread = threading.Thread(
+            target=run, name="queue-stats-reconciler", daemon=True
+        )
+        thread.start()
+        return thread
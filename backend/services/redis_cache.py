@@ -7,10 +7,13 @@ import redis
 from typing import Any, Optional, List, Dict
 from datetime import datetime, timedelta
 from config import settings
+from services.job_profile import instrument_redis
 
 class RedisCache:
     def __init__(self):
-        self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        self.redis_client = instrument_redis(
+            redis.from_url(settings.redis_url, decode_responses=True)
+        )
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
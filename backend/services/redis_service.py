@@ -1,13 +1,44 @@
 import redis
+import redis.asyncio
 import json
 import os
+import weakref
 from typing import Any, Optional
 import asyncio
+from config import settings
+from services.job_profile import instrument_redis
+from services.embedding_store import embedding_store
+
+# Async clients are bound to the event loop that created their connections
+_async_clients: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.asyncio.Redis]"
+) = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """Get a natively async Redis client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = redis.asyncio.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379"), decode_responses=True
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_redis() -> None:
+    """Close the running loop's async Redis client"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
 class RedisService:
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        self.redis_client = instrument_redis(
+            redis.from_url(self.redis_url, decode_responses=True)
+        )
     
     async def get(self, key: str) -> Optional[str]:
         """Get value from Redis"""
@@ -56,13 +87,8 @@ class RedisService:
     
     async def cache_embedding(self, text: str, embedding: list) -> bool:
         """Cache embedding result"""
-        key = f"embedding:{hash(text)}"
-        return await self.set(key, embedding, expire=3600)  # 1 hour
+        return embedding_store.set(text, embedding, settings.embedding_model)
     
     async def get_cached_embedding(self, text: str) -> Optional[list]:
         """Get cached embedding"""
-        key = f"embedding:{hash(text)}"
-        result = await self.get(key)
-        if result:
-            return json.loads(result)
-        return None
+        return embedding_store.get(text, settings.embedding_model)
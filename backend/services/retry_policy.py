@@ -0,0 +1,180 @@
+"""
+Per-job-type retry policies and the delayed retry schedule
+"""
+
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Callable, Dict, Optional, Tuple
+
+from rq import Queue
+from rq.exceptions import InvalidJobOperation, NoSuchJobError
+from rq.registry import FailedJobRegistry
+
+from config import settings
+
+# Exceptions worth another attempt: network, timeouts, rate limits and upstream 5xx
+TRANSIENT_ERRORS = (
+    "ConnectionError",
+    "TimeoutError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "JobTimeoutException",
+    "LLMCapacityError",
+    "CircuitOpenError",
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how soon a failed job is tried again"""
+
+    max_retries: int = 3
+    base_delay: float = settings.job_retry_base_delay_seconds
+    max_delay: float = settings.job_retry_max_delay_seconds
+    multiplier: float = 2.0
+    jitter: float = 0.5  # share of each delay that is randomized
+    max_elapsed: float = settings.job_retry_max_elapsed_seconds
+    retry_on: Tuple[str, ...] = (
+        TRANSIENT_ERRORS  # exception class names, "Exception" for any
+    )
+
+    def retryable(self, error: BaseException) -> bool:
+        return any(cls.__name__ in self.retry_on for cls in type(error).__mro__)
+
+    def delay(self, retry: int) -> float:
+        """Seconds before retry number ``retry`` (1-based), jittered to spread out"""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (retry - 1))
+        return ceiling * (1 - self.jitter * random.random())
+
+    def next_delay(
+        self, error: BaseException, retry: int, elapsed: float
+    ) -> Tuple[Optional[float], str]:
+        """Delay before the next try, or None and why the job is dead"""
+        if not self.retryable(error):
+            return None, "not_retryable"
+        if retry > self.max_retries:
+            return None, "exhausted"
+        delay = self.delay(retry)
+        if elapsed + delay > self.max_elapsed:
+            return None, "expired"
+        return delay, "retrying"
+
+
+def parse_retry_policies(raw: str) -> Dict[str, Dict[str, object]]:
+    """Parse a JSON object of job type -> RetryPolicy field overrides"""
+    if not raw:
+        return {}
+    known = {field.name for field in fields(RetryPolicy)}
+    try:
+        return {
+            str(job_type): {
+                name: tuple(value) if name == "retry_on" else value
+                for name, value in overrides.items()
+                if name in known
+            }
+            for job_type, overrides in json.loads(raw).items()
+        }
+    except Exception as e:
+        print(f"Invalid job retry policies: {e}")
+        return {}
+
+
+class RetryPolicies:
+    """Retry policies by job type: the @job declaration, then JOB_RETRY_POLICIES"""
+
+    def __init__(self, overrides: Optional[Dict[str, Dict[str, object]]] = None):
+        self.overrides = (
+            overrides
+            if overrides is not None
+            else parse_retry_policies(settings.job_retry_policies)
+        )
+        self.declared: Dict[str, RetryPolicy] = {}
+
+    def register(self, job_type: str, policy: RetryPolicy) -> None:
+        self.declared[job_type] = policy
+
+    def get(self, job_type: str, max_retries: Optional[int] = None) -> RetryPolicy:
+        """Policy for a job type; undeclared types retry ``max_retries`` times"""
+        policy = self.declared.get(job_type)
+        if policy is None:
+            policy = (
+                RetryPolicy()
+                if max_retries is None
+                else RetryPolicy(max_retries=max_retries)
+            )
+        if job_type in self.overrides:
+            policy = replace(policy, **self.overrides[job_type])
+        return policy
+
+
+class RetryScheduler:
+    """Failed jobs waiting out their backoff, in a Redis sorted set by due time
+
+    A retried job fails normally in RQ and lands in its queue's failed
+    registry; once due it is requeued from there, keeping its id, meta and
+    origin queue.
+    """
+
+    def __init__(self, redis, key: str = "job:retry:due"):
+        self.redis = redis
+        self.key = key
+
+    def schedule(self, job_id: str, queue_name: str, delay: float) -> None:
+        try:
+            self.redis.zadd(self.key, {f"{job_id}@{queue_name}": time.time() + delay})
+        except Exception as e:
+            print(f"Redis retry schedule error: {e}")
+
+    def requeue_due(
+        self, limit: int = 500, on_requeue: Optional[Callable[[Queue], None]] = None
+    ) -> int:
+        """Requeue retries that are due; returns jobs requeued"""
+        try:
+            due = self.redis.zrangebyscore(self.key, 0, time.time(), start=0, num=limit)
+        except Exception as e:
+            print(f"Redis retry read error: {e}")
+            return 0
+
+        requeued = 0
+        for member in due:
+            # Whoever removes the entry requeues it
+            if not self.redis.zrem(self.key, member):
+                continue
+            job_id, _, queue_name = (
+                member.decode() if isinstance(member, bytes) else member
+            ).partition("@")
+            try:
+                FailedJobRegistry(queue_name, connection=self.redis).requeue(job_id)
+                requeued += 1
+                if on_requeue:
+                    on_requeue(Queue(queue_name, connection=self.redis))
+            except InvalidJobOperation:
+                # The worker has not finished failing it yet
+                self.schedule(job_id, queue_name, 1)
+            except NoSuchJobError:
+                print(f"Retry for expired job {job_id} dropped")
+            except Exception as e:
+                print(f"Error requeueing job {job_id}: {e}")
+                self.schedule(job_id, queue_name, 5)
+        return requeued
+
+    def start(
+        self,
+        interval: float = settings.job_retry_pump_interval_seconds,
+        on_requeue: Optional[Callable[[Queue], None]] = None,
+    ) -> threading.Thread:
+        """Requeue due retries from a daemon thread every interval"""
+
+        def run():
+            while True:
+                self.requeue_due(on_requeue=on_requeue)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="job-retry-scheduler", daemon=True)
+        thread.start()
+        return thread
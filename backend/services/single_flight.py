@@ -0,0 +1,201 @@
+"""
+Single-flight coalescing of identical in-flight LLM generations
+"""
+
+import asyncio
+import json
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import settings
+from services.llm_transport import StaleContent
+from services.redis_service import get_async_redis
+
+# Release the lock only if we still own it
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlightError(Exception):
+    """Raised to followers when the leading call failed"""
+
+
+class _Flight:
+    """An in-flight call and how many local callers await it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run one upstream call per key; concurrent callers await its result
+
+    Callers in the same process await one shared task. Callers in other
+    processes (API workers, RQ workers) contend for a Redis lock; the winner
+    publishes its result on a channel and keeps it briefly in a result key so
+    late subscribers do not miss it.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "llm:flight",
+        lock_ttl: int = settings.llm_single_flight_lock_ttl_seconds,
+        result_ttl: int = settings.llm_single_flight_result_ttl_seconds,
+        distributed: bool = settings.llm_single_flight_distributed,
+    ):
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.distributed = distributed
+        self._inflight: (
+            "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]"
+        ) = weakref.WeakKeyDictionary()
+        self.stats = {"leaders": 0, "local_followers": 0, "remote_followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return fn()'s result, sharing it with identical concurrent calls
+
+        The shared call runs as its own task, so a caller that goes away,
+        the first one included, does not cancel it for the others. It is
+        cancelled only once every caller has gone.
+        """
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+
+        flight = inflight.get(key)
+        if flight is None:
+            flight = _Flight(loop.create_task(self._lead(key, fn)))
+            inflight[key] = flight
+            flight.task.add_done_callback(
+                lambda task: self._land(inflight, key, flight)
+            )
+        else:
+            self.stats["local_followers"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+                self._land(inflight, key, flight)
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.distributed:
+            return await self._run_distributed(key, fn)
+        self.stats["leaders"] += 1
+        return await fn()
+
+    @staticmethod
+    def _land(inflight: Dict[str, "_Flight"], key: str, flight: "_Flight") -> None:
+        if inflight.get(key) is flight:
+            del inflight[key]
+        # Mark the exception as retrieved when nobody was left waiting on it
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()
+
+    async def _run_distributed(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"{self.prefix}:lock:{key}"
+        result_key = f"{self.prefix}:result:{key}"
+        channel = f"{self.prefix}:channel:{key}"
+        token = str(uuid.uuid4())
+
+        try:
+            client = get_async_redis()
+            acquired = await client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            print(f"Single-flight lock error: {e}")
+            self.stats["leaders"] += 1
+            return await fn()
+
+        if not acquired:
+            outcome = await self._wait_for_leader(client, lock_key, result_key, channel)
+            if outcome is not None:
+                self.stats["remote_followers"] += 1
+                if not outcome.get("ok"):
+                    raise SingleFlightError(outcome.get("error", "Leading call failed"))
+                # Keep the stale marker so callers do not cache a last-known-good reply
+                if outcome.get("stale"):
+                    return StaleContent(outcome["value"])
+                return outcome["value"]
+            # The leader vanished without publishing; run the call ourselves
+
+        self.stats["leaders"] += 1
+        try:
+            result = await fn()
+            stale = isinstance(result, StaleContent)
+            await self._publish(
+                client,
+                result_key,
+                channel,
+                {"ok": True, "value": result, "stale": stale},
+            )
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._publish(
+                client, result_key, channel, {"ok": False, "error": str(e)}
+            )
+            raise
+        finally:
+            if acquired:
+                try:
+                    await client.eval(_RELEASE_LOCK, 1, lock_key, token)
+                except Exception as e:
+                    print(f"Single-flight unlock error: {e}")
+
+    async def _wait_for_leader(
+        self, client, lock_key: str, result_key: str, channel: str
+    ) -> Optional[Dict[str, Any]]:
+        """Wait for the leader's outcome; None if it died or Redis failed"""
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            # The leader may have finished before we subscribed
+            stored = await client.get(result_key)
+            if stored:
+                return json.loads(stored)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.lock_ttl
+            while loop.time() < deadline:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message and message.get("type") == "message":
+                    return json.loads(message["data"])
+                if not await client.exists(lock_key):
+                    stored = await client.get(result_key)
+                    return json.loads(stored) if stored else None
+            return None
+        except Exception as e:
+            print(f"Single-flight wait error: {e}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def _publish(
+        self, client, result_key: str, channel: str, outcome: Dict[str, Any]
+    ) -> None:
+        try:
+            payload = json.dumps(outcome, default=str)
+            await client.set(result_key, payload, ex=self.result_ttl)
+            await client.publish(channel, payload)
+        except Exception as e:
+            print(f"Single-flight publish error: {e}")
+
+
+# Global single-flight instance for LLM calls
+llm_single_flight = SingleFlight()
@@ -0,0 +1,294 @@
+"""
+Bucketed timing wheel for delayed jobs in Redis
+"""
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config import settings
+
+# Pop due ids from a bucket into the processing set in one step, so a pump
+# that dies before firing them cannot lose them
+# KEYS: bucket, processing; ARGV: count, now
+_CLAIM = """
+local job_ids = redis.call("spop", KEYS[1], ARGV[1])
+for _, job_id in ipairs(job_ids) do
+    redis.call("zadd", KEYS[2], ARGV[2], job_id)
+end
+return job_ids
+"""
+
+# Claim again ids whose claim is older than the timeout
+# KEYS: processing; ARGV: claimed before, now, count
+_RECLAIM = """
+local job_ids = redis.call(
+    "zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[3]
+)
+for _, job_id in ipairs(job_ids) do
+    redis.call("zadd", KEYS[1], ARGV[2], job_id)
+end
+return job_ids
+"""
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class TimingWheel:
+    """Delayed jobs grouped into fixed-width time buckets
+
+    Each tick of ``resolution`` seconds is a Redis set of the job ids due
+    in it, and a sorted set holds only the ticks that have jobs. Scheduling
+    is an SADD plus a ZADD of the tick, so with millions of sequence steps
+    pending the sorted set grows with the number of distinct ticks, not of
+    jobs. A pump pops due ticks in batches and hands the ids to a callback
+    that pushes them onto the worker queues.
+
+    Jobs may belong to a group, such as a prospect enrolled in a sequence,
+    so all of its pending steps can be cancelled at once when they reply.
+    An index hash maps each pending job to its tick and group, which makes
+    cancelling a job a couple of set removals.
+
+    Due ids move into a processing sorted set as they are claimed and leave
+    it once the callback has pushed them. Ids whose callback failed fire
+    again after ``retry_delay``; ids left behind by a pump that died are
+    claimed again after ``claim_timeout``. A job may so fire twice, but is
+    never lost.
+    """
+
+    def __init__(
+        self,
+        redis,
+        prefix: str = "job:wheel",
+        resolution: float = settings.job_wheel_resolution_seconds,
+        batch_size: int = settings.job_wheel_fire_batch_size,
+        claim_timeout: float = settings.job_wheel_claim_timeout_seconds,
+        retry_delay: float = settings.job_wheel_retry_delay_seconds,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.resolution = resolution
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        self.retry_delay = retry_delay
+        self.ticks_key = f"{prefix}:ticks"
+        self.index_key = f"{prefix}:index"
+        self.processing_key = f"{prefix}:processing"
+
+    def _bucket_key(self, tick: int) -> str:
+        return f"{self.prefix}:bucket:{tick}"
+
+    def _group_key(self, group: str) -> str:
+        return f"{self.prefix}:group:{group}"
+
+    def tick_for(self, run_at: float) -> int:
+        """Tick a job due at a unix time fires in; never early"""
+        return math.ceil(run_at / self.resolution)
+
+    def schedule(
+        self, jobs: Dict[str, Optional[str]], run_at: float, pipeline=None
+    ) -> None:
+        """Schedule job ids (mapped to their group or None) to fire at a unix time
+
+        Errors surface to the caller, who has not enqueued the jobs otherwise.
+        """
+        if not jobs:
+            return
+        tick = self.tick_for(run_at)
+        pipe = (
+            pipeline if pipeline is not None else self.redis.pipeline(transaction=False)
+        )
+        # The bucket is filled before its tick is listed, so the pump never drops
+        # a listed tick with jobs
+        pipe.sadd(self._bucket_key(tick), *jobs)
+        pipe.zadd(self.ticks_key, {tick: tick})
+        pipe.hset(
+            self.index_key,
+            mapping={job_id: f"{tick}:{group or ''}" for job_id, group in jobs.items()},
+        )
+        for job_id, group in jobs.items():
+            if group:
+                pipe.sadd(self._group_key(group), job_id)
+        if pipeline is None:
+            pipe.execute()
+
+    def cancel(self, job_ids: List[str]) -> List[str]:
+        """Unschedule jobs; returns the ids that were still pending"""
+        if not job_ids:
+            return []
+        try:
+            entries = self.redis.hmget(self.index_key, job_ids)
+            pending = [
+                (job_id, _text(entry))
+                for job_id, entry in zip(job_ids, entries)
+                if entry is not None
+            ]
+            if not pending:
+                return []
+            pipe = self.redis.pipeline(transaction=False)
+            for job_id, entry in pending:
+                tick, _, group = entry.partition(":")
+                pipe.srem(self._bucket_key(int(tick)), job_id)
+                if group:
+                    pipe.srem(self._group_key(group), job_id)
+            pipe.hdel(self.index_key, *[job_id for job_id, _ in pending])
+            removed = pipe.execute()
+        except Exception as e:
+            print(f"Redis timing wheel cancel error: {e}")
+            return []
+
+        # Jobs the pump claimed meanwhile are already on their way
+        cancelled, replies = [], iter(removed)
+        for job_id, entry in pending:
+            if next(replies):
+                cancelled.append(job_id)
+            if entry.partition(":")[2]:
+                next(replies)
+        return cancelled
+
+    def cancel_group(self, group: str) -> List[str]:
+        """Unschedule every pending job of a group"""
+        try:
+            job_ids = [
+                _text(job_id) for job_id in self.redis.smembers(self._group_key(group))
+            ]
+        except Exception as e:
+            print(f"Redis timing wheel read error: {e}")
+            return []
+        return self.cancel(job_ids)
+
+    def take_due(self, now: Optional[float] = None) -> List[str]:
+        """Claim up to a batch of due job ids, each handed out once until it expires"""
+        now = now if now is not None else time.time()
+        current = math.floor(now / self.resolution)
+        try:
+            # Ids a dead pump claimed and never fired go out first
+            job_ids = [
+                _text(job_id)
+                for job_id in self.redis.eval(
+                    _RECLAIM,
+                    1,
+                    self.processing_key,
+                    now - self.claim_timeout,
+                    now,
+                    self.batch_size,
+                )
+            ]
+            if len(job_ids) >= self.batch_size:
+                return job_ids
+            ticks = self.redis.zrangebyscore(
+                self.ticks_key, 0, current, start=0, num=self.batch_size
+            )
+        except Exception as e:
+            print(f"Redis timing wheel read error: {e}")
+            return []
+
+        for tick in (int(_text(tick)) for tick in ticks):
+            bucket = self._bucket_key(tick)
+            claimed = self.redis.eval(
+                _CLAIM,
+                2,
+                bucket,
+                self.processing_key,
+                self.batch_size - len(job_ids),
+                now,
+            )
+            job_ids.extend(_text(job_id) for job_id in claimed or [])
+            if len(job_ids) >= self.batch_size:
+                break
+            # Drained: unlist the tick, then relist it if a late schedule refilled it
+            self.redis.zrem(self.ticks_key, tick)
+            if self.redis.scard(bucket):
+                self.redis.zadd(self.ticks_key, {tick: tick})
+        return job_ids
+
+    def ack(self, job_ids: List[str]) -> None:
+        """Forget fired jobs: their claim, index entry and group membership"""
+        if not job_ids:
+            return
+        try:
+            entries = self.redis.hmget(self.index_key, job_ids)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(self.processing_key, *job_ids)
+            pipe.hdel(self.index_key, *job_ids)
+            for job_id, entry in zip(job_ids, entries):
+                group = _text(entry).partition(":")[2] if entry is not None else ""
+                if group:
+                    pipe.srem(self._group_key(group), job_id)
+            pipe.execute()
+        except Exception as e:
+            # Their claims time out and they fire again
+            print(f"Redis timing wheel ack error: {e}")
+
+    def retry(
+        self, job_ids: List[str], delay: float, now: Optional[float] = None
+    ) -> None:
+        """Schedule claimed jobs that could not be fired again after delay"""
+        entries = self.redis.hmget(self.index_key, job_ids)
+        jobs = {
+            job_id: (_text(entry).partition(":")[2] if entry is not None else "")
+            or None
+            for job_id, entry in zip(job_ids, entries)
+        }
+        pipe = self.redis.pipeline()
+        self.schedule(
+            jobs, (now if now is not None else time.time()) + delay, pipeline=pipe
+        )
+        pipe.zrem(self.processing_key, *job_ids)
+        pipe.execute()
+
+    def fire(
+        self, on_fire: Callable[[List[str]], None], now: Optional[float] = None
+    ) -> int:
+        """Hand every due job to ``on_fire`` in batches; returns jobs fired
+
+        When ``on_fire`` raises, the batch is scheduled to fire again after
+        the retry delay and the pump stops until its next run.
+        """
+        fired = 0
+        while True:
+            try:
+                job_ids = self.take_due(now)
+            except Exception as e:
+                print(f"Redis timing wheel fire error: {e}")
+                return fired
+            if not job_ids:
+                return fired
+            try:
+                on_fire(job_ids)
+            except Exception as e:
+                print(f"Delayed jobs not fired, retrying in {self.retry_delay:g}s: {e}")
+                try:
+                    self.retry(job_ids, self.retry_delay, now)
+                except Exception as e:
+                    print(f"Redis timing wheel retry error: {e}")
+                return fired
+            self.ack(job_ids)
+            fired += len(job_ids)
+
+    def pending(self) -> int:
+        """Jobs scheduled and not yet fired"""
+        try:
+            return self.redis.hlen(self.index_key)
+        except Exception as e:
+            print(f"Redis timing wheel read error: {e}")
+            return 0
+
+    def start(
+        self,
+        on_fire: Callable[[List[str]], None],
+        interval: float = settings.job_wheel_pump_interval_seconds,
+    ) -> threading.Thread:
+        """Fire due jobs from a daemon thread every interval"""
+
+        def run():
+            while True:
+                self.fire(on_fire)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="job-timing-wheel", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,159 @@
+"""
+Preforked pool of warm job worker processes that retire after a while
+"""
+
+import importlib
+import os
+import resource
+import signal
+import time
+from typing import Callable, Dict, Optional
+
+from rq import SimpleWorker, Worker
+from rq.job import Job
+from sqlalchemy.orm import configure_mappers
+
+from config import settings
+from database import engine
+from services.fair_queue import FairWorker
+from services.llm_telemetry import llm_telemetry
+
+# Modules whose @job functions workers run
+JOB_MODULES = (
+    "jobs.email_jobs",
+    "jobs.calendar_jobs",
+    "jobs.call_jobs",
+    "jobs.research_jobs",
+)
+
+
+def warm_up() -> float:
+    """Import and initialize what jobs use so later forks start warm; returns seconds"""
+    started = time.monotonic()
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+    configure_mappers()
+    from services.prompt_budget import prompt_budget
+
+    prompt_budget.count("warm up")
+    # Connections opened so far must not be shared with forked processes
+    engine.dispose()
+    return time.monotonic() - started
+
+
+def memory_mb() -> float:
+    """Resident memory of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Peak rather than current, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WarmWorker(FairWorker, SimpleWorker):
+    """Runs jobs in its own, already warm process instead of forking one per job
+
+    Stops after a job once its memory passes ``max_memory_mb``, so a pool
+    can replace it; ``work(max_jobs=...)`` retires it after a job count.
+    """
+
+    def __init__(
+        self,
+        queues,
+        fair_queues,
+        max_memory_mb: float = settings.worker_max_memory_mb,
+        **kwargs,
+    ):
+        super().__init__(queues, fair_queues, **kwargs)
+        self.max_memory_mb = max_memory_mb
+
+    def execute_job(self, job: Job, queue):
+        super().execute_job(job, queue)
+        if self.max_memory_mb and memory_mb() > self.max_memory_mb:
+            self.log.info(
+                "Worker %s: over %s MB, retiring", self.key, self.max_memory_mb
+            )
+            self._stop_requested = True
+
+
+class WorkerPool:
+    """Keep ``size`` warm worker processes forked from one preloaded parent
+
+    The parent imports and initializes the job code once, then forks the
+    workers, which inherit it instead of paying for it per job. A worker
+    that retires (after ``max_jobs`` jobs or over its memory watermark) or
+    dies is replaced by a fresh fork of the parent. SIGTERM or SIGINT
+    stops the workers warmly and waits for them.
+    """
+
+    def __init__(
+        self,
+        make_worker: Callable[[], Worker],
+        size: int = settings.worker_pool_size,
+        max_jobs: Optional[int] = settings.worker_max_jobs,
+    ):
+        self.make_worker = make_worker
+        self.size = size
+        self.max_jobs = max_jobs or None
+        self.children: Dict[int, float] = {}  # pid -> started
+        self.stopping = False
+
+    def run(self) -> None:
+        print(f"Warmed up in {warm_up():.2f}s")
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.size):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            if status:
+                print(f"Worker {pid} exited with status {status}")
+                # Do not fork in a tight loop when workers cannot start
+                if time.monotonic() - started < 1:
+                    time.sleep(1)
+            if not self.stopping:
+                self._spawn()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        # Child: a fresh worker with its own connections, then exit without the
+        # parent's cleanup
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            engine.dispose(close=False)
+            # Threads are not forked: flush this worker's LLM ledger from its own
+            llm_telemetry.start_flusher()
+            self.make_worker().work(max_jobs=self.max_jobs)
+            llm_telemetry.flush()
+        except BaseException as e:
+            print(f"Worker process error: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        # Ctrl-C already reached the workers through the process group
+        if signum == signal.SIGINT:
+            return
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,83 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from rq import Queue
+from services.async_worker import AsyncWorker, parse_concurrency
+
+
+def test_parse_concurrency():
+    """Test per-queue limits parse from JSON and ignore bad input"""
+    assert parse_concurrency('{"high": 4, "low": "2"}') == {"high": 4, "low": 2}
+    assert parse_concurrency("not json") == {}
+
+
+def test_runs_jobs_concurrently_within_queue_limits(monkeypatch):
+    """Test jobs overlap up to each queue's limit and shutdown drains running jobs"""
+    connection = MagicMock()
+    high, low = Queue("high", connection=connection), Queue(
+        "low", connection=connection
+    )
+    worker = AsyncWorker(
+        [high, low], concurrency={"high": 2, "low": 1}, connection=connection
+    )
+    pending = [("h1", high), ("h2", high), ("h3", high), ("l1", low), ("l2", low)]
+    running = {"high": 0, "low": 0}
+    peak = {"high": 0, "low": 0}
+    done = []
+    lock = threading.Lock()
+
+    def dequeue(queues):
+        names = [queue.name for queue in queues]
+        for item in pending:
+            if item[1].name in names:
+                pending.remove(item)
+                return item
+        if not pending:
+            worker.request_stop_async()
+        time.sleep(0.01)
+        return None
+
+    def perform_job(job, queue):
+        with lock:
+            running[queue.name] += 1
+            peak[queue.name] = max(peak[queue.name], running[queue.name])
+        time.sleep(0.05)
+        with lock:
+            running[queue.name] -= 1
+            done.append(job)
+
+    for name in ("register_birth", "register_death", "heartbeat"):
+        monkeypatch.setattr(worker, name, lambda *args, **kwargs: None)
+    monkeypatch.setattr(worker, "_dequeue", dequeue)
+    monkeypatch.setattr(worker, "perform_job", perform_job)
+    worker.work_async()
+
+    assert sorted(done) == ["h1", "h2", "h3", "l1", "l2"]
+    assert peak == {"high": 2, "low": 1}
+
+
+def test_heartbeats_while_every_slot_is_busy(monkeypatch):
+    """Test the worker keeps its registration alive while waiting for a slot"""
+    connection = MagicMock()
+    queue = Queue("default", connection=connection)
+    worker = AsyncWorker([queue], concurrency={"default": 1}, connection=connection)
+    worker.heartbeat_interval = 0.02
+    pending = [("slow", queue)]
+    beats = []
+
+    def dequeue(queues):
+        if pending:
+            return pending.pop()
+        worker.request_stop_async()
+        return None
+
+    for name in ("register_birth", "register_death"):
+        monkeypatch.setattr(worker, name, lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        worker, "heartbeat", lambda *args, **kwargs: beats.append(time.monotonic())
+    )
+    monkeypatch.setattr(worker, "_dequeue", dequeue)
+    monkeypatch.setattr(worker, "perform_job", lambda job, queue: time.sleep(0.2))
+    worker.work_async()
+
+    assert len(beats) >= 5
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import pytest
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.llm_governor import LLMCapacityError
+from services.llm_transport import LLMTransport, ResilientTransport, StaleContent
+
+
+class MemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+
+class ScriptedTransport(LLMTransport):
+    def __init__(self, delays, fail=False, error=ConnectionError):
+        self.delays = list(delays)
+        self.fail = fail
+        self.error = error
+        self.calls = 0
+
+    async def complete(self, key, template, params):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if self.fail:
+            raise self.error("upstream down")
+        return json.dumps({"answer": self.calls})
+
+
+def transport_for(inner, redis=None, **kwargs):
+    redis = redis or MemoryRedis()
+    return ResilientTransport(inner, redis_client=lambda: redis, **kwargs)
+
+
+PARAMS = {"model": "gpt-4", "temperature": 0.2, "messages": []}
+
+
+def test_breaker_trips_on_errors_and_recovers_after_probe():
+    """Test the breaker opens on error rate and closes after a good probe"""
+    breaker = CircuitBreaker(
+        "test", min_calls=4, error_rate_threshold=0.5, cooldown_seconds=0
+    )
+    for ok in (True, False, False, False):
+        breaker.record(0.1, ok)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is True  # cooldown elapsed: one probe
+    assert breaker.allow() is False
+    breaker.record(0.0, True)  # the probe, started once the circuit half-opened
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_ignores_calls_older_than_the_probe(monkeypatch):
+    """Test a call that started before the trip cannot close or re-trip the circuit"""
+    clock = [100.0]
+    monkeypatch.setattr("services.circuit_breaker.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test", min_calls=1, cooldown_seconds=10)
+    breaker.record(0.1, False)
+    clock[0] = 111.0
+    assert breaker.allow() is True  # the probe
+
+    clock[0] = 112.0
+    breaker.record(5.0, True)  # started at 107, before the probe
+    breaker.abandon(5.0)
+    assert breaker.state == "half_open"
+    assert breaker.allow() is False
+
+    breaker.record(1.0, False)  # the probe
+    assert breaker.state == "open"
+
+
+def test_breaker_trips_on_p95_latency():
+    """Test slow but successful calls also open the circuit"""
+    breaker = CircuitBreaker(
+        "test", min_calls=5, p95_slo_seconds=1.0, cooldown_seconds=60
+    )
+    for _ in range(5):
+        breaker.record(2.0, True)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_when_primary_is_slow():
+    """Test a low-temperature call sends a duplicate and takes the faster answer"""
+    inner = ScriptedTransport([0.5, 0.01])
+    transport = transport_for(inner, hedge_delay=0.05)
+    content = await transport.complete("llm:response:abc", "score_content", PARAMS)
+
+    assert json.loads(content) == {"answer": 2}
+    assert transport.stats["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_serves_stale_or_fails_fast():
+    """Test an unhealthy upstream serves the last good answer marked stale"""
+    redis = MemoryRedis()
+    healthy = transport_for(ScriptedTransport([0]), redis, hedge_delay=0)
+    await healthy.complete("llm:response:abc", "score_content", PARAMS)
+
+    failing = transport_for(ScriptedTransport([0], fail=True), redis, hedge_delay=0)
+    failing.breakers["gpt-4"] = CircuitBreaker(
+        "llm:gpt-4", min_calls=1, cooldown_seconds=3600
+    )
+    failing.breakers["gpt-4"].record(0.1, False)
+    stale = await failing.complete("llm:response:abc", "score_content", PARAMS)
+
+    assert isinstance(stale, StaleContent)
+    assert json.loads(stale) == {"answer": 1, "_stale": True}
+    with pytest.raises(CircuitOpenError):
+        await failing.complete("llm:response:other", "score_content", PARAMS)
+
+
+@pytest.mark.asyncio
+async def test_hedge_needs_a_free_governor_slot(monkeypatch):
+    """Test no duplicate request is sent when the governor has no slot for it"""
+
+    async def no_slot(params):
+        raise LLMCapacityError("full")
+
+    inner = ScriptedTransport([0.1, 0.01])
+    transport = transport_for(inner, hedge_delay=0.02)
+    monkeypatch.setattr(transport, "_hedge_slot", no_slot)
+    content = await transport.complete("llm:response:abc", "score_content", PARAMS)
+
+    assert json.loads(content) == {"answer": 1}
+    assert inner.calls == 1
+    assert transport.stats["hedges_skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_upstream_failures_count_against_the_breaker():
+    """Test our own errors fail the call without tripping the circuit"""
+    transport = transport_for(
+        ScriptedTransport([0], fail=True, error=ValueError), hedge_delay=0
+    )
+    transport.breakers["gpt-4"] = CircuitBreaker(
+        "llm:gpt-4", min_calls=1, cooldown_seconds=3600
+    )
+    with pytest.raises(ValueError):
+        await transport.complete("llm:response:abc", "score_content", PARAMS)
+    assert transport.breakers["gpt-4"].state == "closed"
+
+    transport.inner.error = TimeoutError
+    with pytest.raises(TimeoutError):
+        await transport.complete("llm:response:abc", "score_content", PARAMS)
+    assert transport.breakers["gpt-4"].state == "open"
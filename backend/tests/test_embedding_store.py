@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.embedding_store import EmbeddingStore
+from services.llm_service import LLMService
+
+
+def test_key_is_stable_across_processes():
+    """Test keys use a content hash rather than Python's randomized hash()"""
+    key = EmbeddingStore.make_key("hello", "text-embedding-ada-002")
+
+    assert key == (
+        "embedding:text-embedding-ada-002:"
+        "2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824"
+    )
+    assert key != EmbeddingStore.make_key("hello", "other-model")
+
+
+def test_pack_round_trip_as_float32():
+    """Test vectors are stored as 4 bytes per dimension"""
+    vector = [0.5, -1.25, 3.0]
+    packed = EmbeddingStore.pack(vector)
+
+    assert len(packed) == 12
+    assert EmbeddingStore.unpack(packed) == vector
+
+
+def embedding_response(batch):
+    return MagicMock(
+        data=[
+            MagicMock(index=i, embedding=[float(len(text))])
+            for i, text in enumerate(batch)
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_embed_many_batches_and_reuses_stored_vectors():
+    """Test stored vectors are reused and the rest are embedded in batches"""
+    store = MagicMock()
+    store.get_many.side_effect = lambda texts, model: [
+        [9.0] if text == "stored" else None for text in texts
+    ]
+    mock_client = AsyncMock()
+    mock_client.embeddings.create.side_effect = lambda model, input: embedding_response(
+        input
+    )
+
+    with patch("services.llm_service.embedding_store", store), \
+         patch("services.llm_transport.get_async_client", return_value=mock_client):
+        vectors = await LLMService().embed_many(
+            ["a", "bb", "stored", "ccc", "a", "dddd"], batch_size=2
+        )
+
+    assert vectors == [[1.0], [2.0], [9.0], [3.0], [1.0], [4.0]]
+    batches = [
+        call.kwargs["input"] for call in mock_client.embeddings.create.call_args_list
+    ]
+    assert batches == [["a", "bb"], ["ccc", "dddd"]]
+    assert store.set_many.call_count == 2
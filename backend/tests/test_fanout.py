@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from services.fanout import FanOutLimiter
+from services.ai_agents import AIAgentsService, sequence_plan
+from services.llm_transport import StubTransport, set_transport
+from services.llm_cache import llm_cache
+
+
+@pytest.fixture(autouse=True)
+def stub_transport():
+    llm_cache.clear_local()
+    set_transport(StubTransport(latency_mode="none"))
+    yield
+    set_transport(None)
+    llm_cache.clear_local()
+
+
+def tracked_tasks(count, state):
+    async def task(i):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01 * (count - i))
+        state["active"] -= 1
+        return i
+
+    return [lambda i=i: task(i) for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_fanout_respects_workspace_cap_and_order():
+    """Test fan-out keeps results in order and stays under the workspace cap"""
+    limiter = FanOutLimiter(max_concurrency=8, workspace_concurrency=2)
+    state = {"active": 0, "peak": 0}
+    results = await limiter.run(tracked_tasks(6, state), workspace_id="ws-1")
+
+    assert results == list(range(6))
+    assert state["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_fanout_respects_global_cap():
+    """Test fan-out without a workspace is bounded by the global cap"""
+    limiter = FanOutLimiter(max_concurrency=3, workspace_concurrency=2)
+    state = {"active": 0, "peak": 0}
+    await limiter.run(tracked_tasks(6, state))
+
+    assert state["peak"] == 3
+
+
+@pytest.mark.asyncio
+async def test_fanout_drops_idle_workspace_semaphores():
+    """Test a workspace's semaphore lives only while its runs do"""
+    limiter = FanOutLimiter(max_concurrency=8, workspace_concurrency=2)
+    state = {"active": 0, "peak": 0}
+    await asyncio.gather(
+        limiter.run(tracked_tasks(4, state), workspace_id="ws-1"),
+        limiter.run(tracked_tasks(4, state), workspace_id="ws-1"),
+    )
+
+    assert state["peak"] == 2
+    assert limiter._loops[asyncio.get_running_loop()] == {}
+
+
+def test_sequence_plan_ends_with_breakup():
+    """Test sequence plans schedule days and close with a breakup email"""
+    plan = sequence_plan(5)
+
+    assert [item["day"] for item in plan] == [0, 3, 7, 12, 15]
+    assert plan[-1]["angle"] == "breakup"
+    assert plan[-1]["wait_days"] == 0
+
+
+@pytest.mark.asyncio
+async def test_parallel_email_sequence_and_ad_variants():
+    """Test parallel pipelines assemble every step and angle"""
+    service = AIAgentsService()
+    sequence = await service.generate_email_sequence(
+        {"company": "Acme"}, sequence_length=3, workspace_id="ws-1"
+    )
+    variants = await service.generate_ad_variants(
+        {"name": "Greens"}, "facebook", "athletes", parallel=True
+    )
+
+    assert [step["step"] for step in sequence] == [1, 2, 3]
+    assert all(step["subject"] for step in sequence)
+    assert variants.urgency["headline"] == "Stub headline"
@@ -0,0 +1,125 @@
+import time
+import pytest
+from services.input_normalizer import (
+    InputNormalizer,
+    normalize_experience_level,
+    normalize_role,
+)
+from services.llm_cache import llm_cache
+from services.llm_transport import LLMTransport, set_transport
+
+
+class CountingTransport(LLMTransport):
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, key, template, params):
+        self.calls += 1
+        return (
+            '{"value_proposition": '
+            '"We cut customer acquisition costs by 30% in 90 days"}'
+        )
+
+
+@pytest.fixture
+def transport():
+    llm_cache.clear_local()
+    transport = CountingTransport()
+    set_transport(transport)
+    yield transport
+    set_transport(None)
+    llm_cache.clear_local()
+
+
+@pytest.mark.asyncio
+async def test_clean_prospect_is_local_for_reasonable_input(transport):
+    """Test ordinary input is cleaned without calling the LLM"""
+    cleaned = await InputNormalizer().clean_prospect(
+        {
+            "prospect_name": "  JANE o'brien ",
+            "company": "acme saas inc",
+            "role": "vp marketing",
+            "pain_points": ["high  cac , low retension", "High CAC, low retention"],
+            "value_proposition": "we help brands grow revenu with ai",
+        }
+    )
+
+    assert cleaned == {
+        "prospect_name": "Jane O'Brien",
+        "company": "Acme SaaS Inc.",
+        "role": "VP of Marketing",
+        "pain_points": ["High CAC, low retention"],
+        "value_proposition": "We help brands grow revenue with AI",
+    }
+    assert transport.calls == 0
+
+
+def test_normalize_role_expands_abbreviations():
+    """Test roles outside the canonical table are still tidied"""
+    assert normalize_role("sr director growth") == "Senior Director of Growth"
+    assert normalize_role("it mgr") == "IT Manager"
+
+
+@pytest.mark.asyncio
+async def test_flagged_input_escalates_once_per_workspace(transport):
+    """Test rough input goes to the LLM and the result is cached per workspace"""
+    normalizer = InputNormalizer(escalation_enabled=True)
+    raw = {
+        "prospect_name": "sam",
+        "company": "fitco",
+        "role": "ceo",
+        "pain_points": ["churn"],
+        "value_proposition": "growth",
+    }
+    first = await normalizer.clean_prospect(raw, workspace_id="ws-1")
+    second = await normalizer.clean_prospect(raw, workspace_id="ws-1")
+    await normalizer.clean_prospect(raw, workspace_id="ws-2")
+
+    assert first == second
+    assert first["value_proposition"].startswith("We cut customer acquisition costs")
+    assert first["role"] == "CEO"
+    assert normalizer.stats["cache_hits"] == 1
+    assert normalizer.stats["escalations"] == 2
+
+
+@pytest.mark.asyncio
+async def test_clean_niche_standardizes_experience_level(transport):
+    """Test niche inputs are title-cased and the level is canonical"""
+    cleaned = await InputNormalizer().clean_niche(
+        {
+            "skills": ["seo", "copywriting"],
+            "interests": ["fitness"],
+            "experience_level": "mid level",
+        }
+    )
+
+    assert cleaned == {
+        "skills": ["SEO", "Copywriting"],
+        "interests": ["Fitness"],
+        "experience_level": "Intermediate",
+    }
+    assert transport.calls == 0
+
+
+def test_experience_level_maps_years_to_levels():
+    """Test spans of years or months land on a level instead of a title-cased word"""
+    assert normalize_experience_level("5 years") == "Advanced"
+    assert normalize_experience_level("10+ yrs") == "Advanced"
+    assert normalize_experience_level("2-3 yrs") == "Intermediate"
+    assert normalize_experience_level("1 to 4 years") == "Beginner"
+    assert normalize_experience_level("6 months") == "Beginner"
+    assert normalize_experience_level("Expert") == "Advanced"
+
+
+@pytest.mark.asyncio
+async def test_local_escalation_cache_expires(transport, monkeypatch):
+    """Test a locally cached clean-up is dropped once its TTL passes"""
+    normalizer = InputNormalizer(escalation_enabled=True, cache_ttl=60)
+    normalizer._store_local("key", {"role": "CEO"})
+    assert normalizer._get("key") == {"role": "CEO"}
+
+    monkeypatch.setattr(normalizer.redis, "get", lambda key: None)
+    now = time.monotonic()
+    monkeypatch.setattr("services.input_normalizer.time.monotonic", lambda: now + 61)
+    assert normalizer._get("key") is None
+    assert "key" not in normalizer._local
@@ -0,0 +1,94 @@
+import redis
+from sqlalchemy import create_engine, text
+from services import job_profile
+from services.job_profile import ProfileStats, instrument_redis, profile_job
+from services.llm_telemetry import LLMTelemetry
+
+
+def test_profile_counts_database_redis_and_llm_work(monkeypatch):
+    """Test queries, Redis round trips and LLM waits in the block land in its profile"""
+    engine = create_engine("sqlite://")
+    client = instrument_redis(redis.Redis())
+    connection = client.connection_pool.make_connection()
+    monkeypatch.setattr(
+        redis.connection.AbstractConnection,
+        "send_packed_command",
+        lambda self, command, check_health=True: None,
+    )
+
+    with engine.connect() as db:
+        db.execute(text("select 1"))
+        with profile_job() as profile:
+            db.execute(text("select 1"))
+            db.execute(text("select 2"))
+            connection.send_command("PING")
+            LLMTelemetry(enabled=False).record(
+                "completion", "gpt-4o-mini", "classify", 0.25, 100, 20
+            )
+        db.execute(text("select 3"))
+        connection.send_command("PING")
+
+    assert (profile["db_queries"], profile["redis_calls"]) == (2, 1)
+    assert (profile["llm_calls"], profile["llm_tokens"], profile["llm_ms"]) == (
+        1,
+        120,
+        250,
+    )
+    assert profile["wall_ms"] >= profile["own_ms"]
+    assert all(isinstance(value, int) for value in profile.values())
+
+
+def test_profile_stats_tell_what_bounds_each_job_type():
+    """Test per-type averages and the share of wall time per kind of work"""
+
+    class Redis:
+        def __init__(self):
+            self.values = {}
+
+        def pipeline(self, transaction=False):
+            return Pipeline(self)
+
+    class Pipeline:
+        def __init__(self, redis):
+            self.redis, self.results = redis, []
+
+        def sadd(self, key, member):
+            self.redis.values.setdefault(key, set()).add(member)
+
+        def hincrby(self, key, name, amount):
+            fields = self.redis.values.setdefault(key, {})
+            fields[name] = fields.get(name, 0) + amount
+
+        def hgetall(self, key):
+            self.results.append(dict(self.redis.values.get(key, {})))
+
+        def execute(self):
+            results, self.results = self.results, []
+            return results
+
+    stats = ProfileStats(Redis())
+    stats.redis.smembers = lambda key: stats.redis.values.get(key, set())
+    for _ in range(2):
+        stats.record(
+            "run_niche_research",
+            {
+                "wall_ms": 1000,
+                "llm_ms": 800,
+                "db_ms": 50,
+                "own_ms": 150,
+                "llm_calls": 3,
+            },
+        )
+    stats.record("send_email", {"wall_ms": 100, "db_ms": 70, "own_ms": 30})
+
+    summary = stats.summary()
+    assert summary["run_niche_research"]["jobs"] == 2
+    assert summary["run_niche_research"]["avg"]["llm_calls"] == 3
+    assert summary["run_niche_research"]["bound_by"] == "model"
+    assert summary["send_email"]["share"] == {
+        "model": 0.0,
+        "database": 0.7,
+        "code": 0.3,
+    }
+    assert summary["send_email"]["bound_by"] == "database"
+    assert job_profile._profile.get() is None
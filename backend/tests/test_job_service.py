@@ -0,0 +1,775 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import services.job_service as job_service_module
+import services.job_state as job_state_module
+import services.timing_wheel as timing_wheel_module
+from unittest.mock import MagicMock, patch
+from rq import Queue
+from database import Base, DeadLetterJob, Job as JobModel, JobStatus
+from services.job_service import JobService, execute_job
+from services.retry_policy import RetryPolicy
+from services.timing_wheel import TimingWheel
+
+WORKSPACE = str(uuid.uuid4())
+
+
+def send(workspace_id, prospect_email, email_data):
+    return prospect_email
+
+
+def count_words(workspace_id, text):
+    return {"words": len(text.split()), "tone": "positive"}
+
+
+def double(workspace_id, words):
+    return {"doubled": words * 2}
+
+
+def escalate(workspace_id):
+    return {"escalated": True}
+
+
+def ingest_meeting_request(workspace_id, email_data):
+    intent = {"reply_type": "positive", "book_meeting": True}
+    return {"status": "success", "thread_id": "thread-1", "intent": intent}
+
+
+def failed_reply(workspace_id, thread_id, intent_data):
+    return {"status": "error", "error": "Thread not found"}
+
+
+def book_meeting(workspace_id, prospect_email):
+    return {"booked": True}
+
+
+def flaky(workspace_id, attempt):
+    raise ConnectionError("smtp unreachable")
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        self.redis.log.append("execute")
+        results = [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.log = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def expire(self, key, ttl):
+        return key in self.values
+
+    def hset(self, key, mapping):
+        self.values.setdefault(key, {}).update(
+            {name: str(value).encode() for name, value in mapping.items()}
+        )
+
+    def hincrby(self, key, name, amount):
+        fields = self.values.setdefault(key, {})
+        fields[name] = str(int(fields.get(name, 0)) + amount).encode()
+        return int(fields[name])
+
+    def hsetnx(self, key, name, value):
+        fields = self.values.setdefault(key, {})
+        if name in fields:
+            return 0
+        fields[name] = str(value).encode()
+        return 1
+
+    def hget(self, key, name):
+        return self.values.get(key, {}).get(name)
+
+    def hmget(self, key, names):
+        return [self.values.get(key, {}).get(name) for name in names]
+
+    def hgetall(self, key):
+        return dict(self.values.get(key, {}))
+
+    def sadd(self, key, *members):
+        self.values.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        present = self.values.setdefault(key, set())
+        removed = len(present & set(members))
+        present.difference_update(members)
+        return removed
+
+    def hdel(self, key, *names):
+        for name in names:
+            self.values.get(key, {}).pop(name, None)
+
+    def hlen(self, key):
+        return len(self.values.get(key, {}))
+
+    def smembers(self, key):
+        return set(self.values.get(key, set()))
+
+    def scard(self, key):
+        return len(self.values.get(key, set()))
+
+    def zadd(self, key, mapping):
+        self.values.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.values.get(key, {}).pop(member, None)
+
+    def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted(
+            (score, member)
+            for member, score in self.values.get(key, {}).items()
+            if low <= score <= high
+        )
+        return [member for _, member in members][start : start + num if num else None]
+
+    def spop(self, key, count):
+        members = self.values.setdefault(key, set())
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+    def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == timing_wheel_module._CLAIM:
+            job_ids = self.spop(keys[0], int(argv[0]))
+            self.zadd(keys[1], {job_id: argv[1] for job_id in job_ids})
+            return job_ids
+        if script == timing_wheel_module._RECLAIM:
+            job_ids = self.zrangebyscore(keys[0], float("-inf"), argv[0], num=argv[2])
+            self.zadd(keys[0], {job_id: argv[1] for job_id in job_ids})
+            return job_ids
+        raise NotImplementedError(script)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(job_service_module, "redis_conn", redis)
+    monkeypatch.setattr(job_service_module.job_state, "redis", redis)
+    monkeypatch.setattr(job_service_module.queue_stats, "redis", redis)
+    monkeypatch.setattr(job_service_module.fair_queues, "enabled", False)
+    monkeypatch.setattr(job_service_module.job_pipelines, "redis", redis)
+    monkeypatch.setattr(job_service_module.job_retries, "redis", redis)
+    monkeypatch.setattr(job_service_module.delayed_jobs, "redis", redis)
+    monkeypatch.setattr(job_service_module.job_profiles, "redis", redis)
+    return redis
+
+
+@pytest.fixture
+def jobs_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(
+        bind=engine, tables=[JobModel.__table__, DeadLetterJob.__table__]
+    )
+    factory = sessionmaker(bind=engine)
+
+    def get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(job_service_module, "get_db", get_db)
+    monkeypatch.setattr(job_state_module, "get_db", get_db)
+    return factory
+
+
+def test_enqueue_many_dedupes_and_batches(jobs_db, fake_redis, monkeypatch):
+    """Test bulk enqueue reuses active jobs, collapses repeats and pipelines the rest"""
+    db = jobs_db()
+    db.add(
+        JobModel(
+            id="existing",
+            workspace_id=WORKSPACE,
+            type="send",
+            status=JobStatus.QUEUED,
+            dedupe_key=JobService._dedupe_key(send, (WORKSPACE, "a@x.com", {}), {}),
+        )
+    )
+    db.commit()
+    db.close()
+
+    pushed = []
+    monkeypatch.setattr(job_service_module.settings, "job_enqueue_batch_size", 2)
+    monkeypatch.setattr(
+        job_service_module.low_queue,
+        "enqueue_many",
+        lambda datas, pipeline=None: pushed.append([data.job_id for data in datas]),
+    )
+
+    calls = [
+        ((WORKSPACE, email, {}), {})
+        for email in ("a@x.com", "b@x.com", "c@x.com", "b@x.com", "d@x.com")
+    ]
+    job_ids = JobService().enqueue_many(
+        "send", send, calls, queue_name="low", workspace_id=WORKSPACE
+    )
+
+    assert job_ids[0] == "existing"
+    assert job_ids[1] == job_ids[3]
+    assert len(set(job_ids)) == 4
+    assert [job_id for batch in pushed for job_id in batch] == [
+        job_ids[1],
+        job_ids[2],
+        job_ids[4],
+    ]
+    # the key only the database knew about now points at its job
+    key = JobService._dedupe_key(send, (WORKSPACE, "a@x.com", {}), {})
+    assert fake_redis.get(f"job:dedupe:{WORKSPACE}:{key}") == b"existing"
+
+    db = jobs_db()
+    try:
+        assert db.query(JobModel).count() == 4
+    finally:
+        db.close()
+
+
+def test_enqueue_many_marks_jobs_failed_when_redis_fails(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test rows that never reached Redis are failed and reported as None"""
+
+    def broken(datas, pipeline=None):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(job_service_module.default_queue, "enqueue_many", broken)
+
+    job_ids = JobService().enqueue_many(
+        "send", send, [((WORKSPACE, "a@x.com", {}), {})], workspace_id=WORKSPACE
+    )
+
+    assert job_ids == [None]
+    db = jobs_db()
+    try:
+        job = db.query(JobModel).one()
+        assert job.status == JobStatus.FAILED
+        assert "redis down" in job.last_error
+    finally:
+        db.close()
+
+
+def test_redis_claim_dedupes_without_the_database(jobs_db, fake_redis, monkeypatch):
+    """Test a live claim returns the owning job and a finished job frees its key"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    call = ("send", send, (WORKSPACE, "a@x.com", {}), {})
+
+    job_id = service.enqueue_job(*call, workspace_id=WORKSPACE)
+    get_db = job_service_module.get_db
+    monkeypatch.setattr(job_service_module, "get_db", None)
+    assert service.enqueue_job(*call, workspace_id=WORKSPACE) == job_id
+
+    monkeypatch.setattr(job_service_module, "get_db", get_db)
+    service.update_job_status(job_id, JobStatus.SUCCEEDED)
+    assert service.enqueue_job(*call, workspace_id=WORKSPACE) not in (None, job_id)
+
+
+def test_status_transitions_are_written_behind(jobs_db, fake_redis, monkeypatch):
+    """Test transitions are read from Redis first and reach the table on flush"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    job_id = service.enqueue_job(
+        "send", send, (WORKSPACE, "b@x.com", {}), {}, workspace_id=WORKSPACE
+    )
+
+    service.update_job_status(job_id, JobStatus.RUNNING)
+    service.update_job_status(job_id, JobStatus.FAILED, "bounced")
+    assert service.get_job_status(job_id)["status"] == "failed"
+    db = jobs_db()
+    try:
+        assert db.query(JobModel).one().status == JobStatus.QUEUED
+    finally:
+        db.close()
+
+    assert job_service_module.job_state.flush_all() == 1
+    db = jobs_db()
+    try:
+        job = db.query(JobModel).one()
+        assert (job.status, job.attempts, job.last_error) == (
+            JobStatus.FAILED,
+            1,
+            "bounced",
+        )
+        assert job.started_at <= job.finished_at
+    finally:
+        db.close()
+
+
+def test_results_are_stored_compressed_and_capped(jobs_db, fake_redis, monkeypatch):
+    """Test a finished job's output comes back with its status unless over the cap"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    job_id = service.enqueue_job(
+        "send", send, (WORKSPACE, "c@x.com", {}), {}, workspace_id=WORKSPACE
+    )
+
+    service._execute_job(job_id, lambda: {"draft": "hello " * 1000}, (), {})
+    status = service.get_job_status(job_id)
+    assert status["status"] == "succeeded"
+    assert status["result"] == {"draft": "hello " * 1000}
+    db = jobs_db()
+    try:
+        assert len(db.query(JobModel).one().result) < 200
+    finally:
+        db.close()
+
+    monkeypatch.setattr(job_service_module.settings, "job_result_max_bytes", 10)
+    service.store_result(job_id, {"draft": "hello " * 1000})
+    status = service.get_job_status(job_id)
+    assert (status["result"], status["result_truncated"]) == (None, True)
+
+
+def test_workspace_jobs_are_keyset_paginated(jobs_db, fake_redis):
+    """Test pages follow the cursor newest first without repeats, across ties"""
+    created = datetime(2025, 1, 1)
+    db = jobs_db()
+    db.add_all(
+        [
+            JobModel(
+                id=f"job-{n}",
+                workspace_id=WORKSPACE,
+                type="send",
+                status=JobStatus.SUCCEEDED,
+                created_at=created + timedelta(minutes=n // 2),
+                updated_at=created,
+            )
+            for n in range(5)
+        ]
+    )
+    db.commit()
+    db.close()
+
+    service, seen, cursor = JobService(), [], None
+    while True:
+        page = service.get_workspace_jobs(WORKSPACE, limit=2, cursor=cursor)
+        seen.extend(job["id"] for job in page["jobs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["job-4", "job-3", "job-2", "job-1", "job-0"]
+    with pytest.raises(ValueError):
+        service.get_workspace_jobs(WORKSPACE, cursor="not-a-cursor")
+
+
+def test_queue_stats_follow_job_states(jobs_db, fake_redis, monkeypatch):
+    """Test counters and the minute series move with jobs, without counting queues"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    first, second = (
+        service.enqueue_job(
+            "send", send, (WORKSPACE, email, {}), {}, workspace_id=WORKSPACE
+        )
+        for email in ("d@x.com", "e@x.com")
+    )
+
+    def bounce():
+        raise ValueError("bounced")
+
+    service._execute_job(first, lambda: None, (), {})
+    with pytest.raises(ValueError):
+        service._execute_job(second, bounce, (), {})
+
+    stats = service.get_queue_stats()
+    assert stats["default"] == {
+        "queued": 0,
+        "started": 0,
+        "finished": 1,
+        "failed": 1,
+        "retried": 0,
+    }
+    assert stats["high"]["queued"] == 0
+    points = service.get_queue_throughput(5)["default"]
+    assert sum(point["enqueued"] for point in points["send"]) == 2
+    assert sum(point["finished"] for point in points["<lambda>"]) == 1
+    assert sum(point["failed"] for point in points["bounce"]) == 1
+
+    current = MagicMock(
+        origin="default", enqueued_at=None, dequeued_at=time.monotonic() - 0.25
+    )
+    with patch("services.job_service.get_current_job", return_value=current):
+        service._execute_job(first, escalate, (WORKSPACE,), {})
+    assert (
+        service.get_queue_throughput(5)["default"]["escalate"][-1]["avg_startup_ms"]
+        >= 250
+    )
+
+
+def test_workspace_jobs_go_to_their_own_sub_queue(jobs_db, fake_redis, monkeypatch):
+    """Test fair scheduling routes workspaces to sub-queues, keeping queue priority"""
+    monkeypatch.setattr(job_service_module.fair_queues, "enabled", True)
+    monkeypatch.setattr(
+        job_service_module.fair_queues, "activate", lambda queue, pipeline=None: None
+    )
+    enqueued = []
+    monkeypatch.setattr(
+        Queue, "enqueue", lambda queue, *args, **kwargs: enqueued.append(queue.name)
+    )
+    other = str(uuid.uuid4())
+    service = JobService()
+
+    service.enqueue_job(
+        "send",
+        send,
+        (WORKSPACE, "f@x.com", {}),
+        {},
+        queue_name="low",
+        workspace_id=WORKSPACE,
+    )
+    service.enqueue_job(
+        "send", send, (other, "f@x.com", {}), {}, queue_name="low", workspace_id=other
+    )
+    service.enqueue_job("send", send, (None, "f@x.com", {}), {}, queue_name="high")
+    assert enqueued == [f"low:{WORKSPACE}", f"low:{other}", "high:system"]
+
+    with patch(
+        "services.job_service.get_current_job",
+        return_value=MagicMock(origin=f"high:{WORKSPACE}"),
+    ):
+        assert (
+            JobService._llm_context(send, (WORKSPACE, "f@x.com", {}), {})["priority"]
+            == "interactive"
+        )
+
+
+def test_cancel_reaches_jobs_in_workspace_sub_queues(jobs_db, fake_redis, monkeypatch):
+    """Test cancelling removes a job from its workspace sub-queue, too"""
+    monkeypatch.setattr(job_service_module.fair_queues, "enabled", True)
+    monkeypatch.setattr(
+        job_service_module.fair_queues, "activate", lambda queue, pipeline=None: None
+    )
+    monkeypatch.setattr(Queue, "enqueue", lambda queue, *args, **kwargs: None)
+    service = JobService()
+    job_id = service.enqueue_job(
+        "send", send, (WORKSPACE, "c@x.com", {}), {}, workspace_id=WORKSPACE
+    )
+
+    job = MagicMock(id=job_id, origin=f"default:{WORKSPACE}")
+    monkeypatch.setattr(
+        job_service_module.Job, "fetch", lambda fetched_id, connection: job
+    )
+    assert service.cancel_job(job_id)
+    job.cancel.assert_called_once()
+    assert service.get_job_status(job_id)["status"] == "failed"
+
+
+def test_pipeline_chains_stages_and_skips_unmet_conditions(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test stages run after their parents, read their results and skip on conditions"""
+    monkeypatch.setattr(job_service_module, "job_service", JobService())
+    enqueued = []
+    monkeypatch.setattr(
+        job_service_module.default_queue,
+        "enqueue",
+        lambda func, *args, **kwargs: enqueued.append(args),
+    )
+    pipeline = job_service_module.job_service.pipeline("words", WORKSPACE)
+    pipeline.stage("count", count_words, WORKSPACE, "one two three")
+    pipeline.stage(
+        "double", double, WORKSPACE, pipeline.ref("count", "words"), after=["count"]
+    )
+    pipeline.stage(
+        "escalate",
+        escalate,
+        WORKSPACE,
+        after=["count"],
+        when={"count.tone": "negative"},
+    )
+    pipeline.stage("after_both", escalate, WORKSPACE, after=["double", "escalate"])
+    pipeline_id = pipeline.enqueue()
+
+    results = []
+    while enqueued:
+        results.append(execute_job(*enqueued.pop(0)))
+
+    assert results == [{"words": 3, "tone": "positive"}, {"doubled": 6}]
+    status = job_service_module.job_service.get_pipeline_status(pipeline_id)
+    assert status["status"] == "succeeded"
+    assert {name: stage["status"] for name, stage in status["stages"].items()} == {
+        "count": "succeeded",
+        "double": "succeeded",
+        "escalate": "skipped",
+        "after_both": "skipped",
+    }
+    assert status["latency_seconds"] >= 0
+
+
+def test_inbound_reply_does_not_book_after_a_failed_reply(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test the meeting is only booked once the reply draft succeeded"""
+    import jobs.calendar_jobs
+    import jobs.email_jobs
+
+    monkeypatch.setattr(job_service_module, "job_service", JobService())
+    monkeypatch.setattr(jobs.email_jobs, "job_service", job_service_module.job_service)
+    monkeypatch.setattr(jobs.email_jobs, "ingest_email", ingest_meeting_request)
+    monkeypatch.setattr(jobs.email_jobs, "sdr_reply", failed_reply)
+    monkeypatch.setattr(jobs.calendar_jobs, "auto_book_meeting", book_meeting)
+    enqueued = []
+    monkeypatch.setattr(
+        job_service_module.default_queue,
+        "enqueue",
+        lambda func, *args, **kwargs: enqueued.append(args),
+    )
+    pipeline = jobs.email_jobs.inbound_reply_pipeline(
+        WORKSPACE, {"from_email": "p@x.com"}
+    )
+    pipeline_id = pipeline.enqueue()
+    while enqueued:
+        execute_job(*enqueued.pop(0))
+
+    status = job_service_module.job_service.get_pipeline_status(pipeline_id)
+    assert {name: stage["status"] for name, stage in status["stages"].items()} == {
+        "ingest": "succeeded",
+        "reply": "succeeded",
+        "book": "skipped",
+    }
+
+
+def test_retry_policy_backs_off_with_jitter():
+    """Test delays grow to the cap with jitter and stop for bad errors, count or age"""
+    policy = RetryPolicy(
+        max_retries=3,
+        base_delay=10,
+        max_delay=30,
+        multiplier=2,
+        jitter=0.5,
+        max_elapsed=60,
+    )
+    for retry, ceiling in ((1, 10), (2, 20), (3, 30)):
+        delays = [policy.delay(retry) for _ in range(50)]
+        assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+
+    assert policy.next_delay(ConnectionError(), 1, 0)[1] == "retrying"
+    assert policy.next_delay(ValueError(), 1, 0) == (None, "not_retryable")
+    assert policy.next_delay(ConnectionError(), 4, 0) == (None, "exhausted")
+    assert policy.next_delay(ConnectionError(), 3, 59) == (None, "expired")
+
+
+def test_exhausted_jobs_are_dead_lettered_and_replayed(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test a failing job backs off, then is dead-lettered and replayed in bulk"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    job_id = service.enqueue_job(
+        "flaky", flaky, (WORKSPACE, 1), {}, workspace_id=WORKSPACE, retry=1
+    )
+    current = MagicMock(
+        meta={"max_retries": 1},
+        origin=f"default:{WORKSPACE}",
+        created_at=datetime.utcnow(),
+        enqueued_at=None,
+    )
+
+    with patch("services.job_service.get_current_job", return_value=current):
+        with pytest.raises(ConnectionError):
+            service._execute_job(job_id, flaky, (WORKSPACE, 1), {})
+        assert current.meta["retries"] == 1
+        assert f"{job_id}@default:{WORKSPACE}" in fake_redis.values["job:retry:due"]
+        assert service.get_job_status(job_id)["status"] == "queued"
+
+        with pytest.raises(ConnectionError):
+            service._execute_job(job_id, flaky, (WORKSPACE, 1), {})
+    status = service.get_job_status(job_id)
+    assert (status["status"], status["attempts"]) == ("failed", 2)
+    assert service.get_queue_stats()["default"]["retried"] == 1
+
+    [entry] = service.get_dead_letters(WORKSPACE)
+    assert (entry["job_id"], entry["reason"], entry["attempts"]) == (
+        job_id,
+        "exhausted",
+        2,
+    )
+
+    pushed = []
+    monkeypatch.setattr(
+        job_service_module.default_queue,
+        "enqueue_many",
+        lambda datas, pipeline=None: pushed.extend(data.job_id for data in datas),
+    )
+    replay = service.replay_dead_letters(WORKSPACE)
+    assert list(replay["replayed"]) == [entry["id"]] and replay["skipped"] == []
+    assert pushed == list(replay["replayed"].values())
+    assert service.get_dead_letters(WORKSPACE) == []
+    assert (
+        service.get_dead_letters(WORKSPACE, include_replayed=True)[0]["replay_job_id"]
+        == pushed[0]
+    )
+
+
+def test_timing_wheel_fires_due_buckets_and_cancels_groups():
+    """Test jobs fire by tick in batches, and a group's pending jobs cancel together"""
+    wheel = TimingWheel(FakeRedis(), resolution=10, batch_size=2)
+    wheel.schedule({"a": "p1", "b": "p2"}, run_at=100)
+    wheel.schedule({"d": None}, run_at=105)
+    wheel.schedule({"c": "p1", "e": "p2"}, run_at=200)
+    assert len(wheel.redis.values["job:wheel:ticks"]) == 3
+
+    assert sorted(wheel.cancel_group("p1")) == ["a", "c"]
+    assert wheel.cancel(["a"]) == []
+
+    fired = []
+    assert wheel.fire(fired.append, now=150) == 2
+    assert sorted(fired[0]) == ["b", "d"]
+    assert wheel.pending() == 1
+    assert list(wheel.redis.values["job:wheel:ticks"]) == [20]
+    assert wheel.take_due(now=200) == ["e"]
+    wheel.ack(["e"])
+    assert wheel.redis.smembers("job:wheel:group:p2") == set()
+    assert wheel.pending() == 0
+
+
+def test_timing_wheel_does_not_lose_jobs_it_could_not_fire():
+    """Test a failed batch fires again after a delay and a dead pump's claims expire"""
+    wheel = TimingWheel(
+        FakeRedis(), resolution=10, batch_size=10, claim_timeout=60, retry_delay=30
+    )
+    wheel.schedule({"a": "p1"}, run_at=100)
+
+    def redis_down(job_ids):
+        raise ConnectionError("redis down")
+
+    assert wheel.fire(redis_down, now=100) == 0
+    assert wheel.take_due(now=110) == []
+    assert wheel.take_due(now=130) == ["a"]
+    assert wheel.cancel_group("p1") == []  # claimed: already on its way
+
+    # The pump died before firing "a"; another one claims it once the claim is stale
+    assert wheel.take_due(now=150) == []
+    fired = []
+    assert wheel.fire(fired.extend, now=200) == 1
+    assert fired == ["a"]
+    assert wheel.take_due(now=1000) == []
+
+
+def test_delayed_jobs_wait_in_the_wheel_until_fired_or_cancelled(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test delayed sends are scheduled, cancelled on reply and pushed when due"""
+    monkeypatch.setattr(
+        job_service_module.Job, "save", lambda job, pipeline=None, **kwargs: None
+    )
+    service = JobService()
+    calls = [((WORKSPACE, email, {"step": 2}), {}) for email in ("g@x.com", "h@x.com")]
+    job_ids = service.enqueue_many(
+        "send",
+        send,
+        calls,
+        workspace_id=WORKSPACE,
+        delay=timedelta(hours=24),
+        cancel_keys=["g@x.com", "h@x.com"],
+    )
+    assert job_service_module.delayed_jobs.pending() == 2
+    assert service.get_queue_stats()["default"]["queued"] == 0
+
+    assert service.cancel_delayed(WORKSPACE, "G@x.com", reason="Prospect replied") == [
+        job_ids[0]
+    ]
+    assert service.get_job_status(job_ids[0])["status"] == "failed"
+    assert service.cancel_delayed(WORKSPACE, "g@x.com") == []
+
+    enqueued = []
+    job = MagicMock(
+        id=job_ids[1], origin="default", args=(job_ids[1], "tests.send", (), {}, None)
+    )
+    monkeypatch.setattr(
+        job_service_module.Job,
+        "fetch_many",
+        lambda ids, connection: [job if i == job.id else None for i in ids],
+    )
+    monkeypatch.setattr(
+        Queue,
+        "enqueue_job",
+        lambda queue, job, pipeline=None: enqueued.append((queue.name, job.id)),
+    )
+    assert (
+        job_service_module.delayed_jobs.fire(
+            service.fire_delayed, now=time.time() + 86400 + 10
+        )
+        == 1
+    )
+    assert enqueued == [("default", job_ids[1])]
+    assert service.get_queue_stats()["default"]["queued"] == 1
+
+
+def test_execution_profile_is_written_behind_and_aggregated(
+    jobs_db, fake_redis, monkeypatch
+):
+    """Test a job's profile reaches its row on flush and adds to its type's totals"""
+    monkeypatch.setattr(
+        job_service_module.default_queue, "enqueue", lambda *args, **kwargs: None
+    )
+    service = JobService()
+    job_id = service.enqueue_job(
+        "send", send, (WORKSPACE, "i@x.com", {}), {}, workspace_id=WORKSPACE
+    )
+
+    def count_jobs():
+        db = jobs_db()
+        try:
+            return db.query(JobModel).count()
+        finally:
+            db.close()
+
+    service._execute_job(job_id, count_jobs, (), {})
+    assert service.get_job_status(job_id)["profile"]["db_queries"] == 1
+
+    job_service_module.job_state.flush_all()
+    db = jobs_db()
+    try:
+        profile = db.query(JobModel).one().profile
+    finally:
+        db.close()
+    assert profile["db_queries"] == 1 and profile["wall_ms"] >= profile["db_ms"]
+    assert service.get_job_profiles()["count_jobs"]["jobs"] == 1
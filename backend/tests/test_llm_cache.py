@@ -0,0 +1,133 @@
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.llm_cache import LLMResponseCache
+from services.llm_service import LLMService
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "hi"}]
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def set(self, key, value, ex=None):
+        self.values[key], self.ttls[key] = value, ex
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.results = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, key):
+        self.results.append(self.redis.values.get(key))
+        return self
+
+    def ttl(self, key):
+        self.results.append(self.redis.ttls.get(key) or -2)
+        return self
+
+    async def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+@pytest.fixture
+def redis_cache():
+    return FakeAsyncRedis()
+
+
+@pytest.fixture
+def response_cache(redis_cache):
+    return LLMResponseCache(
+        redis_client=lambda: redis_cache,
+        max_entries=2,
+        default_ttl=60,
+        max_temperature=0.7,
+    )
+
+
+def test_key_is_stable_and_content_addressed():
+    """Test keys depend only on request content"""
+    key = LLMResponseCache.make_key("gpt-4", MESSAGES, 0.3, 100)
+
+    assert key == LLMResponseCache.make_key("gpt-4", list(MESSAGES), 0.3, 100)
+    assert key != LLMResponseCache.make_key("gpt-4", MESSAGES, 0.4, 100)
+    assert key != LLMResponseCache.make_key("gpt-3.5-turbo", MESSAGES, 0.3, 100)
+
+
+@pytest.mark.asyncio
+async def test_local_tier_is_lru(response_cache, redis_cache):
+    """Test the in-process tier evicts the least recently used entry"""
+    await response_cache.set("a", "1")
+    await response_cache.set("b", "2")
+    assert await response_cache.get("a") == "1"
+    await response_cache.set("c", "3")
+    redis_cache.values.clear()
+
+    assert await response_cache.get("a") == "1"
+    assert await response_cache.get("b") is None
+    assert response_cache.stats()["local_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_is_promoted(response_cache, redis_cache):
+    """Test Redis hits are copied into the local tier with their remaining TTL"""
+    await redis_cache.set("k", json.dumps("cached"), ex=30)
+
+    assert await response_cache.get("k") == "cached"
+    redis_cache.values.clear()
+    assert await response_cache.get("k") == "cached"
+    assert response_cache._local["k"][0] - time.monotonic() <= 30
+
+    stats = response_cache.stats()
+    assert stats["redis_hits"] == 1
+    assert stats["local_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_per_template_ttl(response_cache, redis_cache):
+    """Test stores use the template TTL"""
+    await response_cache.set("k", "v", template="check_compliance")
+
+    assert redis_cache.ttls["k"] == 7 * 24 * 3600
+
+
+def test_high_temperature_bypasses_cache(response_cache):
+    """Test creative calls opt out of caching"""
+    assert response_cache.is_cacheable(0.3)
+    assert not response_cache.is_cacheable(0.9)
+    assert not response_cache.is_cacheable(0.3, use_cache=False)
+    assert response_cache.stats()["bypassed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_serves_repeats_from_cache(response_cache):
+    """Test a repeated low-temperature call reaches upstream once"""
+    mock_client = AsyncMock()
+    mock_client.chat.completions.create.return_value.choices = [
+        MagicMock(message=MagicMock(content="answer"))
+    ]
+
+    with patch("services.llm_service.llm_cache", response_cache), \
+         patch("services.llm_transport.get_async_client", return_value=mock_client):
+        llm_service = LLMService()
+        first = await llm_service.chat(
+            MESSAGES, temperature=0.2, template="score_content"
+        )
+        second = await llm_service.chat(
+            MESSAGES, temperature=0.2, template="score_content"
+        )
+
+    assert first == second == "answer"
+    assert mock_client.chat.completions.create.await_count == 1
@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.llm_governor import LLMGovernor
+from services.job_service import JobService
+
+
+def test_context_sets_and_restores_workspace_and_priority():
+    """Test governor context attributes calls and unwinds cleanly"""
+    governor = LLMGovernor(default_priority="interactive", workspace_weights={})
+    with governor.context(workspace_id="ws-1", priority="batch"):
+        assert governor.current_workspace() == "ws-1"
+        assert governor.current_priority() == "batch"
+        with governor.context(workspace_id="ws-2"):
+            assert governor.current_workspace() == "ws-2"
+            assert governor.current_priority() == "batch"
+
+    assert governor.current_workspace() == "anonymous"
+    assert governor.current_priority() == "interactive"
+
+
+@pytest.mark.asyncio
+async def test_slot_fails_open_when_redis_is_down():
+    """Test LLM calls still run when the shared governor state is unreachable"""
+    governor = LLMGovernor(workspace_weights={})
+    client = MagicMock()
+    client.eval = AsyncMock(side_effect=ConnectionError("redis down"))
+    with patch("services.llm_governor.get_async_redis", return_value=client):
+        async with governor.slot(100) as lease:
+            assert lease is None
+
+    assert governor.stats["fail_open"] == 1
+
+
+def test_job_llm_context_uses_workspace_argument_and_queue():
+    """Test jobs attribute LLM calls to their workspace and queue priority"""
+
+    def run_niche_research(workspace_id, research_inputs):
+        pass
+
+    with patch(
+        "services.job_service.get_current_job", return_value=MagicMock(origin="low")
+    ):
+        context = JobService._llm_context(run_niche_research, ("ws-9", {}), {})
+
+    assert context == {"workspace_id": "ws-9", "priority": "batch"}
@@ -74,3 +74,42 @@ async def test_check_compliance(llm_service):
         assert result["risk_score"] == 0.8
         assert len(result["findings"]) == 1
         assert "weight management" in result["suggested_rewrite"].lower()
+
+
+@pytest.mark.asyncio
+async def test_generate_completion_uses_async_client(llm_service):
+    """Test completions are awaited on the shared async client with per-call options"""
+    mock_client = AsyncMock()
+    mock_client.chat.completions.create.return_value.choices = [
+        AsyncMock(message=AsyncMock(content="ok"))
+    ]
+
+    with patch("services.llm_transport.get_async_client", return_value=mock_client):
+        result = await llm_service.generate_completion("system", "user", timeout=5)
+
+    assert result == "ok"
+    kwargs = mock_client.chat.completions.create.await_args.kwargs
+    assert kwargs["timeout"] == 5
+    assert kwargs["max_tokens"] == 2000
+    assert kwargs["messages"][0] == {"role": "system", "content": "system"}
+
+
+@pytest.mark.asyncio
+async def test_async_client_is_shared_per_loop():
+    """Test the pooled client is reused within an event loop"""
+    from services.llm_client import get_async_client, close_async_client
+
+    with patch("services.llm_client.settings") as mock_settings:
+        mock_settings.openai_api_key = "test-key"
+        mock_settings.llm_request_timeout_seconds = 10
+        mock_settings.llm_connect_timeout_seconds = 1
+        mock_settings.llm_max_connections = 5
+        mock_settings.llm_max_keepalive_connections = 2
+        mock_settings.llm_keepalive_expiry_seconds = 5
+        mock_settings.llm_max_retries = 0
+
+        first = get_async_client()
+        assert get_async_client() is first
+        await close_async_client()
+        assert get_async_client() is not first
+        await close_async_client()
@@ -0,0 +1,95 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from main import app
+from services.llm_streaming import IncrementalJSONParser
+
+client = TestClient(app)
+
+SEQUENCE_JSON = json.dumps(
+    {
+        "subject": "Quick question, {company}?",
+        "sequence": [
+            {"step": 1, "subject": "Hi"},
+            {"step": 2, "subject": "Following up"},
+        ],
+        "success_metrics": {"expected_open_rate": "30%"},
+    }
+)
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i : i + size]))
+    return events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_parser_emits_fields_and_items(chunk_size):
+    """Test fields and array items are emitted as they complete"""
+    parser = IncrementalJSONParser()
+    events = feed_in_chunks(parser, "```json\n" + SEQUENCE_JSON + "\n```", chunk_size)
+
+    assert [(e["type"], e["field"]) for e in events] == [
+        ("field", "subject"),
+        ("item", "sequence"),
+        ("item", "sequence"),
+        ("field", "sequence"),
+        ("field", "success_metrics"),
+    ]
+    assert events[0]["value"] == "Quick question, {company}?"
+    assert events[2]["index"] == 1
+    assert parser.result == json.loads(SEQUENCE_JSON)
+
+
+def test_parser_emits_step_before_sequence_finishes():
+    """Test a sequence step is available before the array closes"""
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"sequence": [{"step": 1, "body": "a, b]"}, {"step"')
+
+    assert events == [
+        {
+            "type": "item",
+            "field": "sequence",
+            "index": 0,
+            "value": {"step": 1, "body": "a, b]"},
+        }
+    ]
+    assert parser.result is None
+
+
+def test_workflow_stream_endpoint():
+    """Test the workflow stream relays tokens and field events"""
+
+    async def fake_stream(description):
+        for chunk in [
+            '{"summary": "Test',
+            ' workflow", "nodes": [',
+            '{"id": "1"}], "connections": {}}',
+        ]:
+            yield chunk
+
+    with patch(
+        "services.llm_service.LLMService.stream_workflow", side_effect=fake_stream
+    ):
+        response = client.post(
+            "/api/workflows/generate/stream", json={"description": "Send email"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    body = response.text
+    assert body.startswith("event: start")
+    assert (
+        'event: field\n'
+        'data: {"type": "field", "field": "summary", "value": "Test workflow"}'
+        in body
+    )
+    assert (
+        'event: item\n'
+        'data: {"type": "item", "field": "nodes", "index": 0, "value": {"id": "1"}}'
+        in body
+    )
+    assert "event: done" in body
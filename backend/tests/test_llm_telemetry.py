@@ -0,0 +1,132 @@
+import uuid
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, MetricDaily
+from services.llm_cache import llm_cache
+from services.llm_governor import llm_governor
+from services.llm_service import LLMService
+from services.llm_telemetry import LLMTelemetry, llm_telemetry
+from services.llm_transport import StubTransport, set_transport
+
+WORKSPACE = str(uuid.uuid4())
+
+
+def make_telemetry(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    Base.metadata.create_all(bind=engine, tables=[MetricDaily.__table__])
+    factory = sessionmaker(bind=engine)
+    return (
+        LLMTelemetry(
+            enabled=True,
+            flush_interval=3600,
+            flush_batch_size=10000,
+            session_factory=factory,
+        ),
+        factory,
+    )
+
+
+def test_histogram_buckets_and_percentiles(tmp_path):
+    """Test latencies land in fixed buckets with estimated percentiles"""
+    telemetry, _ = make_telemetry(tmp_path)
+    for latency in (0.03, 0.08, 0.3, 0.4, 6.0):
+        telemetry.record(
+            "completion", "gpt-4", "score_content", latency, workspace_id="anonymous"
+        )
+
+    route = telemetry.histograms()["completion:score_content:gpt-4"]
+    assert route["calls"] == 5
+    assert route["buckets"][:4] == [1, 1, 0, 2]
+    assert route["latency_ms_p50"] == 500
+    assert route["latency_ms_p99"] == 10000
+
+
+def test_ledger_flush_adds_onto_daily_rows(tmp_path):
+    """Test flushes write one row per workspace, day and metric and add to it later"""
+    telemetry, factory = make_telemetry(tmp_path)
+    telemetry.record(
+        "completion", "gpt-4", "draft", 1.0, 1000, 500, workspace_id=WORKSPACE
+    )
+    telemetry.record(
+        "completion", "gpt-4", "draft", 0.01, cache_status="hit", workspace_id=WORKSPACE
+    )
+    telemetry.record(
+        "completion", "gpt-4", "draft", 1.0, 1000, 0, workspace_id="anonymous"
+    )
+    telemetry.flush()
+    telemetry.record(
+        "completion", "gpt-4", "draft", 1.0, 1000, 500, workspace_id=WORKSPACE
+    )
+    telemetry.flush()
+
+    db = factory()
+    try:
+        rows = {row.metric_name: row.value for row in db.query(MetricDaily).all()}
+        assert (
+            db.query(MetricDaily)
+            .filter(MetricDaily.metric_name == "llm.cost_usd")
+            .count()
+            == 1
+        )
+    finally:
+        db.close()
+    assert rows["llm.calls"] == 3
+    assert rows["llm.draft.cache_hits"] == 1
+    assert rows["llm.draft.prompt_tokens"] == 2000
+    assert rows["llm.cost_usd"] == pytest.approx(2 * (0.03 + 0.03))
+
+
+def test_flushes_from_several_processes_share_one_row(tmp_path):
+    """Test ledgers flushed by separate processes add onto the same daily row"""
+    api, factory = make_telemetry(tmp_path)
+    worker = LLMTelemetry(
+        enabled=True,
+        flush_interval=3600,
+        flush_batch_size=10000,
+        session_factory=factory,
+    )
+    api.record("completion", "gpt-4", "draft", 1.0, 1000, 0, workspace_id=WORKSPACE)
+    worker.record("completion", "gpt-4", "draft", 1.0, 500, 0, workspace_id=WORKSPACE)
+    worker.flush()
+    api.flush()
+
+    db = factory()
+    try:
+        rows = (
+            db.query(MetricDaily)
+            .filter(MetricDaily.metric_name == "llm.prompt_tokens")
+            .all()
+        )
+    finally:
+        db.close()
+    assert [row.value for row in rows] == [1500]
+
+
+@pytest.mark.asyncio
+async def test_chat_records_cache_status_and_workspace():
+    """Test chat calls report misses, hits and tokens under the current workspace"""
+    llm_cache.clear_local()
+    llm_telemetry.reset()
+    set_transport(StubTransport(latency_mode="none"))
+    messages = [{"role": "user", "content": "Score this copy"}]
+    try:
+        with llm_governor.context(workspace_id=WORKSPACE):
+            await LLMService().chat(
+                messages, model="gpt-4", temperature=0, template="score_content"
+            )
+            await LLMService().chat(
+                messages, model="gpt-4", temperature=0, template="score_content"
+            )
+    finally:
+        set_transport(None)
+        llm_cache.clear_local()
+
+    route = llm_telemetry.histograms()["completion:score_content:gpt-4"]
+    assert route["calls"] == 2
+    assert route["cache"]["miss"] == 1
+    assert route["cache"]["hit"] == 1
+    assert route["outcomes"]["ok"] == 2
+    assert route["prompt_tokens"] > 0
+    assert llm_telemetry.snapshot()["pending_ledger_entries"] > 0
+    llm_telemetry.reset()
@@ -0,0 +1,51 @@
+import pytest
+from agents.tool_registry import tool_registry
+from services.model_router import ModelRouter, model_router
+from services.llm_cache import llm_cache
+from services.llm_service import LLMService
+from services.llm_transport import StubTransport, set_transport
+
+TIER_MODELS = {"fast": "small-model", "balanced": "mid-model", "quality": "big-model"}
+
+
+def test_resolve_precedence():
+    """Test explicit model, routing table, call tier, declared tier, then default"""
+    router = ModelRouter(
+        tier_models=TIER_MODELS,
+        routes={"score_content": "balanced", "draft": "custom-model"},
+    )
+    router.declare("classify_intent", "fast")
+
+    assert router.resolve("classify_intent") == "small-model"
+    assert router.resolve("classify_intent", model="pinned") == "pinned"
+    assert router.resolve("score_content", tier="fast") == "mid-model"
+    assert router.resolve("draft") == "custom-model"
+    assert router.resolve("other", tier="balanced") == "mid-model"
+    assert router.resolve("other") == "big-model"
+
+
+def test_tools_declare_their_tier():
+    """Test registered tools keep their callable and declare a model tier"""
+    from agents.tools import classify_intent
+
+    assert callable(classify_intent)
+    assert tool_registry.get_schema("classify_intent").tier == "fast"
+    assert model_router.declared["classify_intent"] == "fast"
+    assert tool_registry.get_schema("draft_email").tier == "quality"
+
+
+@pytest.mark.asyncio
+async def test_score_content_runs_on_fast_tier():
+    """Test classification-style templates are routed to the fast model with stats"""
+    llm_cache.clear_local()
+    set_transport(StubTransport(latency_mode="none"))
+    try:
+        await LLMService().score_content("Our greens powder tastes great.")
+    finally:
+        set_transport(None)
+        llm_cache.clear_local()
+
+    fast_model = model_router.tier_models["fast"]
+    stats = model_router.stats()[f"score_content:{fast_model}"]
+    assert stats["calls"] >= 1
+    assert stats["prompt_tokens"] > 0
@@ -0,0 +1,90 @@
+import json
+import pytest
+from services.prompt_budget import PromptBudget
+from services.ai_agents import AIAgentsService
+from services.llm_cache import llm_cache
+from services.llm_transport import LLMTransport, set_transport
+
+
+class CapturingTransport(LLMTransport):
+    def __init__(self):
+        self.params = None
+
+    async def complete(self, key, template, params):
+        self.params = params
+        return json.dumps({"response_text": "Thanks!", "qualification_score": 60})
+
+
+def test_fit_history_keeps_latest_and_summarizes_the_rest():
+    """Test long threads keep recent messages within budget and condense older ones"""
+    budget = PromptBudget()
+    history = [
+        {"role": "prospect", "content": f"Message {i}. " + "filler " * 50}
+        for i in range(40)
+    ]
+    kept, summary = budget.fit_history(history, 600)
+
+    assert kept[-1] == history[-1]
+    assert len(kept) < len(history)
+    assert (
+        sum(
+            budget.count(json.dumps(message, separators=(",", ":"))) for message in kept
+        )
+        <= 600
+    )
+    assert summary.startswith(f"{len(history) - len(kept)} earlier messages")
+
+
+def test_fit_history_shortens_an_oversized_latest_message():
+    """Test a newest message over the whole budget is cut down rather than sent as is"""
+    budget = PromptBudget()
+    history = [{"role": "prospect", "content": "Long hello. " + "words " * 4000}]
+    kept, summary = budget.fit_history(history, 100)
+
+    assert kept[0]["content"].startswith("Long hello. words")
+    assert budget.count(json.dumps(kept[0], separators=(",", ":"))) <= 100
+    assert summary is None
+
+    kept, summary = budget.fit_history(
+        [{"role": "prospect", "content": "words " * 4000}], 5
+    )
+    assert kept == [] and summary.startswith("1 earlier messages")
+
+
+def test_compact_transcript_keeps_signal_turns():
+    """Test transcripts keep the opening, the close and turns about pricing"""
+    budget = PromptBudget()
+    turns = ["Rep: Hi, thanks for joining."]
+    turns += [f"Prospect: small talk number {i} about the weather" for i in range(200)]
+    turns.insert(100, "Prospect: Honestly the price is above our budget this quarter.")
+    turns.append("Rep: Great, I'll send the contract as the next step.")
+    compacted = budget.compact_transcript("\n".join(turns), 400)
+
+    assert budget.count(compacted) <= 450
+    assert compacted.startswith("Rep: Hi, thanks for joining.")
+    assert "price is above our budget" in compacted
+    assert compacted.splitlines()[-1] == turns[-1]
+    assert "turns omitted" in compacted
+
+
+@pytest.mark.asyncio
+async def test_handle_reply_prompt_stays_within_budget():
+    """Test handle_reply compacts a long thread before calling the LLM"""
+    llm_cache.clear_local()
+    transport = CapturingTransport()
+    set_transport(transport)
+    try:
+        history = [
+            {"role": "rep", "content": "Following up on pricing. " * 40}
+            for _ in range(100)
+        ]
+        await AIAgentsService().handle_reply(
+            "Can we talk next week?", history, {"bio": "x" * 20000}
+        )
+    finally:
+        set_transport(None)
+        llm_cache.clear_local()
+
+    prompt = transport.params["messages"][0]["content"]
+    assert PromptBudget().count(prompt) < 3500
+    assert "earlier messages, condensed" in prompt
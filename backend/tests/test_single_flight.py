@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from services.single_flight import SingleFlight
+
+
+@pytest.fixture
+def flight():
+    return SingleFlight(distributed=False)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call(flight):
+    """Test identical concurrent calls run the function once"""
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*[flight.do("key", fn) for _ in range(5)])
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats["local_followers"] == 4
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_independently(flight):
+    """Test calls with different keys are not coalesced"""
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    await asyncio.gather(flight.do("a", fn), flight.do("b", fn))
+
+    assert flight.stats["leaders"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_propagates_to_followers(flight):
+    """Test followers receive the leader's error and the key is released"""
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def ok():
+        return "recovered"
+
+    assert await flight.do("key", ok) == "recovered"
+
+
+@pytest.mark.asyncio
+async def test_distributed_mode_fails_open_without_redis():
+    """Test the call still runs when Redis is unavailable"""
+    flight = SingleFlight(distributed=True)
+
+    async def fn():
+        return "result"
+
+    with patch(
+        "services.single_flight.get_async_redis",
+        side_effect=ConnectionError("no redis"),
+    ):
+        assert await flight.do("key", fn) == "result"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers(flight):
+    """Test followers still get the result when the first caller goes away"""
+
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    leader = asyncio.create_task(flight.do("key", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", fn))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "result"
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_every_caller_leaves(flight):
+    """Test the shared call stops once nobody awaits it"""
+    stopped = asyncio.Event()
+
+    async def fn():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            stopped.set()
+
+    callers = [asyncio.create_task(flight.do("key", fn)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.wait_for(stopped.wait(), 1)
+    assert flight._inflight[asyncio.get_running_loop()] == {}
@@ -0,0 +1,58 @@
+import os
+import signal
+from unittest.mock import MagicMock
+from rq import Queue, SimpleWorker
+import services.worker_pool as worker_pool_module
+from services.worker_pool import WarmWorker, WorkerPool
+
+
+def test_warm_worker_retires_over_its_memory_watermark(monkeypatch):
+    """Test a warm worker keeps taking jobs until its memory passes the limit"""
+    connection = MagicMock()
+    worker = WarmWorker(
+        [Queue("default", connection=connection)],
+        fair_queues=MagicMock(),
+        max_memory_mb=100,
+        connection=connection,
+    )
+    monkeypatch.setattr(SimpleWorker, "execute_job", lambda self, job, queue: None)
+
+    monkeypatch.setattr(worker_pool_module, "memory_mb", lambda: 80)
+    worker.execute_job(MagicMock(), MagicMock())
+    assert not worker._stop_requested
+
+    monkeypatch.setattr(worker_pool_module, "memory_mb", lambda: 120)
+    worker.execute_job(MagicMock(), MagicMock())
+    assert worker._stop_requested
+
+
+def test_pool_replaces_retired_workers(monkeypatch):
+    """Test each retired worker process is replaced by a fork until the pool stops"""
+    read_fd, write_fd = os.pipe()
+
+    class Worker:
+        def work(self, max_jobs=None):
+            os.write(write_fd, str(max_jobs).encode())
+
+    monkeypatch.setattr(worker_pool_module, "warm_up", lambda: 0.0)
+    pool = WorkerPool(Worker, size=2, max_jobs=3)
+    spawn = pool._spawn
+    spawned = []
+
+    def counting_spawn():
+        spawned.append(1)
+        if len(spawned) == 5:
+            pool.stopping = True
+        spawn()
+
+    monkeypatch.setattr(pool, "_spawn", counting_spawn)
+    handlers = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    try:
+        pool.run()
+    finally:
+        signal.signal(signal.SIGTERM, handlers[0])
+        signal.signal(signal.SIGINT, handlers[1])
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        assert f.read() == "3" * 5
+    assert pool.children == {}
@@ -7,7 +7,21 @@ import os
 import sys
 from rq import Worker, Connection
 from config import settings
-from services.job_service import default_queue, high_queue, low_queue
+from services.job_service import (
+    default_queue,
+    high_queue,
+    low_queue,
+    job_service,
+    job_state,
+    queue_stats,
+    fair_queues,
+    job_retries,
+    delayed_jobs,
+)
+from services.llm_telemetry import llm_telemetry
+from services.async_worker import AsyncWorker
+from services.fair_queue import FairWorker
+from services.worker_pool import WarmWorker, WorkerPool
 
 def main():
     """Start RQ worker"""
@@ -17,13 +31,60 @@ def main():
     # Import all job modules to register them
     from jobs import email_jobs, calendar_jobs, call_jobs, research_jobs
     
-    # Create worker
+    # Create worker: forking, a pool of warm processes, or many jobs per process
+    # on an event loop
+    async_mode = "--async" in sys.argv or settings.worker_mode == "async"
+    pool_mode = "--pool" in sys.argv or settings.worker_mode == "pool"
+    queues = [default_queue, high_queue, low_queue]
     with Connection():
-        worker = Worker([default_queue, high_queue, low_queue])
-        print(f"Starting worker for queues: default, high, low")
+        if pool_mode:
+            worker = WorkerPool(lambda: WarmWorker(queues, fair_queues=fair_queues))
+            print(f"Starting {worker.size} warm workers for queues: default, high, low")
+        elif async_mode:
+            worker = AsyncWorker(
+                [default_queue, high_queue, low_queue], fair_queues=fair_queues
+            )
+            print(
+                "Starting async worker for queues: default, high, low "
+                f"({worker.concurrency})"
+            )
+        elif fair_queues.enabled:
+            worker = FairWorker(
+                [default_queue, high_queue, low_queue], fair_queues=fair_queues
+            )
+            print("Starting fair worker for queues: default, high, low")
+        else:
+            worker = Worker([default_queue, high_queue, low_queue])
+            print(f"Starting worker for queues: default, high, low")
         print(f"Redis URL: {settings.redis_url}")
         print(f"Mock mode: {settings.mock_mode}")
-        worker.work()
+
+        # Expired results are ignored on read; clear their storage at startup
+        print(f"Purged {job_service.purge_expired_results()} expired job results")
+
+        # Job status transitions are written to Redis; copy them to the jobs table
+        job_state.start_flusher()
+        # Add LLM usage onto the daily ledger every interval rather than per job
+        llm_telemetry.start_flusher()
+        # Correct queue gauges for jobs lost with killed work horses
+        queue_stats.start_reconciler([default_queue, high_queue, low_queue])
+        # Push delayed jobs, such as sequence steps, onto the queues when due
+        delayed_jobs.start(on_fire=job_service.fire_delayed)
+        # Requeue failed jobs once their backoff has passed
+        job_retries.start(on_requeue=fair_queues.activate)
+        # Put retried and scheduled jobs' workspaces back in turn
+        if fair_queues.enabled:
+            fair_queues.start_reconciler([default_queue, high_queue, low_queue])
+        try:
+            if pool_mode:
+                worker.run()
+            elif async_mode:
+                worker.work_async()
+            else:
+                worker.work()
+        finally:
+            job_state.flush_all()
+            llm_telemetry.flush()
 
 if __name__ == "__main__":
     main()